@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -139,4 +140,40 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # For storing uploaded CSV files and trained models
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Per-process LRU cache for single predictions (entries, seconds). Set the size to 0 to disable.
+PREDICTION_CACHE_MAXSIZE = 4096
+PREDICTION_CACHE_TTL = 300
+
+# Model versions kept under MEDIA_ROOT/trained_models/versions/ for rollback (the active one included).
+MODEL_VERSIONS_KEPT = 5
+
+# Per-town model shards with a global fallback (predictor_app/model_shards.py). Towns with fewer
+# training rows than MODEL_SHARD_MIN_ROWS get no shard; at most MODEL_SHARD_CACHE_SIZE shards are
+# kept loaded per process.
+MODEL_SHARDS_ENABLED = False
+MODEL_SHARD_MIN_ROWS = 50
+MODEL_SHARD_CACHE_SIZE = 64
+
+# Import rental and land CSV files through COPY and set-based SQL on PostgreSQL
+# (predictor_app/copy_import.py) instead of batched ORM inserts.
+CSV_IMPORT_USE_COPY = True
+
+# Threads the async prediction views use for model inference (per process).
+PREDICTION_EXECUTOR_WORKERS = 4
+
+# Preload models, lookup state and templates in each WSGI/ASGI worker before it serves traffic.
+# Opt in per deployment with PREDICTOR_WARMUP=1.
+PREDICTOR_WARMUP = os.environ.get('PREDICTOR_WARMUP') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'predictor_app': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
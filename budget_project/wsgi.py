@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "budget_project.settings")
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402 (settings are only usable once the application is set up)
+
+if settings.PREDICTOR_WARMUP:
+    from predictor_app.warmup import warm_up
+    warm_up()
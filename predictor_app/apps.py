@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class PredictorAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'predictor_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registers the receivers)
@@ -0,0 +1,100 @@
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+
+from .models import Town, PaperType, AccessType
+from .ml_utils import predict_land_prices_per_sqm
+
+LAND_SCORING_CHUNK_SIZE = 5000
+TRUE_VALUES = {'true', '1', 'yes', 'oui'}  # Same boolean spellings as the CSV import
+
+# Each lookup can be given by name (as in the import CSV format) or directly by ID
+LAND_LOOKUPS = [
+    ('town_id', 'town_name', Town),
+    ('paper_type_id', 'paper_type_name', PaperType),
+    ('access_type_id', 'access_type_name', AccessType),
+]
+OUTPUT_COLUMNS = ['predicted_price_per_sqm', 'predicted_total_price', 'error']
+
+
+class LandScoringError(Exception):
+    pass
+
+
+def _resolve_lookup(chunk, id_column, name_column, ids_by_name, valid_ids):
+    """Map one lookup column of a chunk to an int64 array of IDs, -1 where unknown or missing."""
+    if id_column in chunk.columns:
+        ids = pd.to_numeric(chunk[id_column].str.strip(), errors='coerce')
+        ids = ids.where(ids.isin(valid_ids))
+    elif name_column in chunk.columns:
+        ids = chunk[name_column].str.strip().map(ids_by_name)
+    else:
+        raise LandScoringError(f"CSV must have a '{name_column}' or '{id_column}' column.")
+    return ids.fillna(-1).astype(np.int64).to_numpy()
+
+
+def _parse_flags(chunk, column):
+    if column not in chunk.columns:
+        return np.zeros(len(chunk), dtype=np.int8)
+    return chunk[column].str.strip().str.lower().isin(TRUE_VALUES).to_numpy(dtype=np.int8)
+
+
+def iter_scored_land_csv(csv_file, chunk_size=LAND_SCORING_CHUNK_SIZE):
+    """
+    Read an uploaded land CSV in chunks of `chunk_size` rows, score every chunk with one
+    vectorized call to the land model, and yield the output CSV piece by piece.
+
+    The input columns are echoed back followed by predicted_price_per_sqm,
+    predicted_total_price (only when area_sqm is given) and error. Memory stays bounded
+    by the chunk size, whatever the size of the upload.
+    """
+    lookups = []
+    for id_column, name_column, model in LAND_LOOKUPS:
+        ids_by_name = dict(model.objects.values_list('name', 'id'))
+        lookups.append((id_column, name_column, ids_by_name, set(ids_by_name.values())))
+
+    reader = pd.read_csv(csv_file, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                         encoding='utf-8-sig', skipinitialspace=True)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+
+    for chunk in reader:
+        if not header_written:
+            writer.writerow(list(chunk.columns) + OUTPUT_COLUMNS)
+            header_written = True
+
+        n_rows = len(chunk)
+        columns = {}
+        errors = np.full(n_rows, '', dtype=object)
+        for id_column, name_column, ids_by_name, valid_ids in lookups:
+            ids = _resolve_lookup(chunk, id_column, name_column, ids_by_name, valid_ids)
+            errors[(ids < 0) & (errors == '')] = f"Unknown or missing {name_column.replace('_name', '').replace('_', ' ')}"
+            columns[id_column] = ids.tolist()
+        columns['is_fenced'] = _parse_flags(chunk, 'is_fenced')
+        columns['is_ready_to_build'] = _parse_flags(chunk, 'is_ready_to_build')
+
+        predictions = predict_land_prices_per_sqm(columns, n_rows)
+        if isinstance(predictions, str):
+            raise LandScoringError(predictions)
+        ok = errors == ''
+        price_per_sqm = np.where(ok, predictions, np.nan)
+
+        if 'area_sqm' in chunk.columns:
+            area = pd.to_numeric(chunk['area_sqm'].str.replace(',', ''), errors='coerce').to_numpy()
+            total_price = price_per_sqm * area
+        else:
+            total_price = np.full(n_rows, np.nan)
+
+        for values, per_sqm, total, error in zip(chunk.itertuples(index=False, name=None),
+                                                price_per_sqm, total_price, errors):
+            writer.writerow(list(values) + [
+                '' if np.isnan(per_sqm) else f"{per_sqm:.2f}",
+                '' if np.isnan(total) else f"{total:.2f}",
+                error,
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
@@ -0,0 +1,189 @@
+from functools import cached_property
+
+import numpy as np
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+MISSING_CATEGORY = 'None_CAT'  # Must match the fillna value used during training
+CONVENIENCE_PREFIX = 'convenience_'
+
+
+def _python_value(value):
+    # Encoder categories come back as numpy scalars; dict lookups need plain Python values
+    return value.item() if hasattr(value, 'item') else value
+
+
+class CompiledLinearModel:
+    """
+    Coefficient table extracted from a OneHotEncoder + passthrough + LinearRegression pipeline.
+
+    Every one-hot column of the pipeline becomes one weight per category value, every
+    passthrough column one weight per numeric feature. Scoring a row is then a handful
+    of dict lookups and a short sum, with no pandas or ColumnTransformer involved.
+    Category values the encoder never saw contribute nothing, exactly like
+    OneHotEncoder(handle_unknown='ignore').
+    """
+
+    def __init__(self, intercept, categorical, numeric, coef):
+        self.intercept = float(intercept)
+        self.categorical = categorical  # [(feature, {value: column index}), ...]
+        self.numeric = numeric  # [(feature, column index), ...]
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self._weights = self.coef.tolist()
+
+    @property
+    def n_columns(self):
+        return len(self.coef)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        preprocessor = pipeline.named_steps['preprocessor']
+        regressor = pipeline.named_steps['regressor']
+        coef = np.ravel(regressor.coef_)
+
+        categorical = []
+        numeric = []
+        for name, transformer, columns in preprocessor.transformers_:
+            if name == 'remainder' or transformer == 'drop':
+                continue
+            offset = preprocessor.output_indices_[name].start
+            if isinstance(transformer, OneHotEncoder):
+                if transformer.drop_idx_ is not None:
+                    raise ValueError("Compiling a OneHotEncoder with drop= is not supported.")
+                for feature, categories in zip(columns, transformer.categories_):
+                    categorical.append((feature, {_python_value(v): offset + i for i, v in enumerate(categories)}))
+                    offset += len(categories)
+            elif transformer == 'passthrough' or (isinstance(transformer, FunctionTransformer)
+                                                  and transformer.func is None):
+                # Fitted 'passthrough' steps are stored as an identity FunctionTransformer
+                for i, feature in enumerate(columns):
+                    numeric.append((feature, offset + i))
+            else:
+                raise ValueError(f"Cannot compile transformer '{name}' ({transformer!r}).")
+
+        if len(coef) != sum(len(values) for _, values in categorical) + len(numeric):
+            raise ValueError("Coefficient count does not match the preprocessor output.")
+        return cls(regressor.intercept_, categorical, numeric, coef)
+
+    def predict_one(self, features):
+        """Score a single row given as {feature: value}. Missing numeric features count as 0."""
+        weights = self._weights
+        total = self.intercept
+        for feature, index in self.categorical:
+            value = features.get(feature)
+            column = index.get(MISSING_CATEGORY if value is None else value)
+            if column is not None:
+                total += weights[column]
+        for feature, column in self.numeric:
+            value = features.get(feature)
+            if value:
+                total += weights[column] * value
+        return total
+
+    def design_matrix(self, columns, n_rows):
+        """
+        Build the encoded (n_rows x n_columns) matrix from column-oriented input,
+        {feature: sequence of values}. Features absent from `columns` are left at 0.
+        """
+        X = np.zeros((n_rows, self.n_columns), dtype=np.float64)
+        rows = np.arange(n_rows)
+        for feature, index in self.categorical:
+            values = columns.get(feature)
+            if values is None:
+                continue
+            codes = np.fromiter((index.get(MISSING_CATEGORY if v is None else v, -1) for v in values),
+                                dtype=np.int64, count=n_rows)
+            known = codes >= 0
+            X[rows[known], codes[known]] = 1.0
+        for feature, column in self.numeric:
+            values = columns.get(feature)
+            if values is not None:
+                X[:, column] = np.asarray(values, dtype=np.float64)
+        return X
+
+    def predict_columns(self, columns, n_rows):
+        return self.design_matrix(columns, n_rows) @ self.coef + self.intercept
+
+    def predict_many(self, rows):
+        """Score a list of {feature: value} rows with a single matrix product."""
+        columns = {feature: [row.get(feature) for row in rows] for feature, _ in self.categorical}
+        columns.update({feature: [row.get(feature) or 0 for row in rows] for feature, _ in self.numeric})
+        return self.predict_columns(columns, len(rows))
+
+    def check_parity(self, pipeline, X, atol=1e-6, rtol=1e-9):
+        """Compare against the sklearn pipeline on a DataFrame; raises ValueError on mismatch."""
+        columns = {col: [_python_value(v) for v in X[col].tolist()] for col in X.columns}
+        expected = pipeline.predict(X)
+        actual = self.predict_columns(columns, len(X))
+        if not np.allclose(actual, expected, atol=atol, rtol=rtol):
+            worst = float(np.max(np.abs(actual - expected)))
+            raise ValueError(f"Compiled model disagrees with the sklearn pipeline (max abs diff {worst}).")
+        return True
+
+
+class FeatureVocabulary:
+    """
+    The category values and convenience IDs a model was trained on, frozen into its artifact
+    so serving never has to ask the database which columns exist.
+    """
+
+    def __init__(self, categories, convenience_ids=()):
+        self.categories = {feature: list(values) for feature, values in categories.items()}
+        self.convenience_ids = sorted(convenience_ids)
+        self._category_sets = {feature: set(values) for feature, values in self.categories.items()}
+        self._convenience_set = set(self.convenience_ids)
+
+    @classmethod
+    def from_compiled(cls, compiled):
+        """Recover the vocabulary of an artifact trained before vocabularies were stored."""
+        categories = {feature: [v for v in index if v != MISSING_CATEGORY] for feature, index in compiled.categorical}
+        convenience_ids = [int(feature[len(CONVENIENCE_PREFIX):]) for feature, _ in compiled.numeric
+                           if feature.startswith(CONVENIENCE_PREFIX)]
+        return cls(categories, convenience_ids)
+
+    @cached_property
+    def conveniences(self):
+        """The ConvenienceEncoder for this vocabulary's convenience IDs."""
+        from .featurizers import ConvenienceEncoder
+
+        return ConvenienceEncoder(self.convenience_ids)
+
+    def is_known_convenience(self, convenience_id):
+        return convenience_id in self._convenience_set
+
+    def unseen(self, input_data_dict):
+        """
+        Return {feature: [values]} for inputs the model never saw during training. Such values
+        carry no weight in the prediction. Missing values (None) are not reported.
+        """
+        unseen = {}
+        for feature, known in self._category_sets.items():
+            value = input_data_dict.get(feature)
+            if value is not None and value != MISSING_CATEGORY and value not in known:
+                unseen[feature] = [value]
+        convenience_ids = [cid for cid in input_data_dict.get('convenience_ids') or []
+                           if cid not in self._convenience_set]
+        if convenience_ids:
+            unseen['convenience_ids'] = convenience_ids
+        return unseen
+
+    def unseen_many(self, input_data_dicts):
+        """
+        unseen() for a batch, as {row index: {feature: [values]}} for the rows that have unseen inputs.
+        The batch's distinct values are checked once per feature, not row by row.
+        """
+        unseen = {}
+        for feature, known in self._category_sets.items():
+            values = [d.get(feature) for d in input_data_dicts]
+            new = set(values) - known - {None, MISSING_CATEGORY}
+            if new:
+                for i, value in enumerate(values):
+                    if value in new:
+                        unseen.setdefault(i, {})[feature] = [value]
+        convenience_lists = [d.get('convenience_ids') or [] for d in input_data_dicts]
+        new = set().union(*convenience_lists) - self._convenience_set
+        if new:
+            for i, convenience_ids in enumerate(convenience_lists):
+                convenience_ids = [cid for cid in convenience_ids if cid in new]
+                if convenience_ids:
+                    unseen.setdefault(i, {})['convenience_ids'] = convenience_ids
+        return unseen
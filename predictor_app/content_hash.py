@@ -0,0 +1,41 @@
+"""
+Content hashes of rental and land listings, the key that makes CSV imports idempotent.
+
+The hash covers what an import row determines: the lookup names, the field values as the
+database stores them (floats rounded to the DecimalField's precision and decimal places) and
+the convenience names. The same row therefore hashes the same however it is formatted in the
+file ("1,200,000" or "1200000"), and a listing read back from the database hashes the same as
+the row it was imported from until someone edits it.
+
+Only model fields are used, no model imports, so migrations can hash with historical models.
+"""
+import hashlib
+import json
+from decimal import Decimal, ROUND_HALF_UP
+
+HASH_LENGTH = 32  # Hex digits of a 128-bit BLAKE2b digest
+
+
+def _normalize(field, value):
+    value = field.to_python(value)  # Floats go through the DecimalField's context, as when saved
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        # Decimal places as stored; PostgreSQL's numeric rounds halves away from zero
+        value = value.quantize(Decimal(1).scaleb(-field.decimal_places), rounding=ROUND_HALF_UP)
+    return str(value)
+
+
+def listing_content_hash(model, lookups, values, convenience_names=()):
+    """
+    Hex digest of a listing of `model` with `lookups` ({field: name}, e.g. {'town': 'Antsirabe'}),
+    field `values` ({field: value}) and `convenience_names`.
+    """
+    payload = [
+        model._meta.model_name,
+        sorted(lookups.items()),
+        sorted((name, _normalize(model._meta.get_field(name), value)) for name, value in values.items()),
+        sorted(set(convenience_names)),
+    ]
+    digest = hashlib.blake2b(json.dumps(payload, separators=(',', ':')).encode(), digest_size=HASH_LENGTH // 2)
+    return digest.hexdigest()
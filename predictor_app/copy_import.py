@@ -0,0 +1,235 @@
+"""
+PostgreSQL COPY path for large listing imports.
+
+The batched ORM import (importers.py) still sends every listing through bulk_create, i.e. an
+INSERT with one parameter tuple per row. For files of millions of rows the COPY importers
+below stage each batch instead:
+
+1. Rows are parsed in Python by the same parse_row() as the ORM path, so the per-row error
+   messages, the number parsing and the price_per_sqm of LandForSale.save() stay identical.
+   Field values are converted with the model fields' get_db_prep_save(), exactly as
+   bulk_create and save() would before sending them.
+2. The parsed rows, with the town / access type / paper type names still as text, are
+   streamed into a temporary table with COPY FROM STDIN, and the convenience names into a
+   second one.
+3. Missing lookups are created (a handful of names per file), then one INSERT ... SELECT
+   resolves the names with joins and upserts the listings on their content hash (see
+   ListingImporter): ON CONFLICT, a listing imported from the same row is left alone, or gets
+   the file's values back if it was edited since. Two more statements bring the convenience
+   rows of the M2M table in line with the file, writing only the differences.
+
+A batch the database rejects (e.g. a value out of range for its column) is rolled back, with
+the lookups it created, and written again by the ORM path, which reports the failing rows one
+by one.
+"""
+import io
+import logging
+
+from django.db import DatabaseError, connection, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.utils import timezone
+
+from .importers import RentalImporter, LandImporter
+from .models import RentalProperty, Convenience
+from .signals import schedule_land_table_rebuild
+
+logger = logging.getLogger(__name__)
+
+COPY_BATCH_SIZE = 50000
+COPY_BUFFER_SIZE = 1 << 20  # Characters sent to COPY at a time
+
+
+def _copy_text(value):
+    # One field in COPY's text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Stream `rows` (tuples of Python values) into `table` with COPY FROM STDIN."""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    lines = ('\t'.join(_copy_text(value) for value in row) + '\n' for row in rows)
+    with cursor.db.wrap_database_errors:  # COPY goes to the driver's cursor, past Django's error wrapping
+        _copy_lines(cursor, sql, lines)
+
+
+def _copy_lines(cursor, sql, lines):
+    if is_psycopg3:
+        with cursor.copy(sql) as copy:
+            buffer, size = [], 0
+            for line in lines:
+                buffer.append(line)
+                size += len(line)
+                if size >= COPY_BUFFER_SIZE:
+                    copy.write(''.join(buffer))
+                    buffer, size = [], 0
+            if buffer:
+                copy.write(''.join(buffer))
+    else:
+        cursor.copy_expert(sql, io.StringIO(''.join(lines)))
+
+
+class CopyListingImporter:
+    """COPY-based write_batch() for a ListingImporter subclass; mixed in before it."""
+    staging_table = None
+    batch_size = COPY_BATCH_SIZE
+
+    def write_batch(self, records):
+        # ON CONFLICT DO UPDATE may not meet the same key twice in one statement; repeats are skipped
+        unique = {}
+        for row_number, record in records:
+            unique.setdefault(record.content_hash, (row_number, record))
+        unique = list(unique.values())
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                if self.ensure_lookups(unique):
+                    schedule_land_table_rebuild()
+                created, updated, snapshot = self._copy_batch(cursor, unique)
+        except DatabaseError:
+            logger.info("COPY of %d %s rows failed; writing them through the ORM",
+                        len(unique), self.model_type, exc_info=True)
+            for cache in self.lookup_caches:
+                cache.forget()  # Lookups created in the rolled-back savepoint are gone
+            self.result.skipped += len(records) - len(unique)
+            super().write_batch(unique)
+            return
+        self.result.created += len(created)
+        self.result.updated += len(updated)
+        self.result.skipped += len(records) - len(created) - len(updated)
+        self._update_statistics(created)
+        if snapshot is not None and updated:
+            snapshot.apply()
+
+    # --- Staging ---
+    def _create_staging(self, cursor, table, columns):
+        # Dropped and recreated per batch: the batch may run in a savepoint of a longer transaction
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {table} ({', '.join(columns)})")
+
+    def _copy_batch(self, cursor, records):
+        """(IDs created, IDs updated, ListingSnapshot of the listings already imported or None)."""
+        from .incremental import ListingSnapshot
+
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        lookup_fields = [opts.get_field(name) for name in self.lookup_fields]
+        value_fields = [opts.get_field(name) for name in self.value_fields]
+        hash_field = opts.get_field('content_hash')
+        staging = qn(self.staging_table)
+        table = qn(opts.db_table)
+
+        self._create_staging(cursor, staging, [
+            'row_number integer',
+            *(f'{qn(field.name + "_name")} text' for field in lookup_fields),
+            *(f'{qn(field.column)} {field.db_type(connection)}' for field in value_fields),
+            f'{qn(hash_field.column)} {hash_field.db_type(connection)}',
+        ])
+        # get_db_prep_save() is what bulk_create and save() send, e.g. the rounding of floats to the
+        # DecimalField's precision, so the database ends up with the same values as on the ORM path
+        copy_rows(cursor, staging, [
+            'row_number', *(qn(field.name + '_name') for field in lookup_fields),
+            *(qn(field.column) for field in value_fields), qn(hash_field.column),
+        ], (
+            (row_number,
+             *(record.lookups[field.name] for field in lookup_fields),
+             *(field.get_db_prep_save(record.values[field.name], connection) for field in value_fields),
+             record.content_hash)
+            for row_number, record in records
+        ))
+
+        # Training rows of the listings imported before, in case the upsert changes some of them
+        cursor.execute(f"SELECT t.{qn(opts.pk.column)} FROM {table} t "
+                       f"JOIN {staging} s ON s.{qn(hash_field.column)} = t.{qn(hash_field.column)}")
+        snapshot = ListingSnapshot.capture(self.statistics_name, [row[0] for row in cursor.fetchall()])
+
+        joins = ' '.join(
+            f"JOIN {qn(field.related_model._meta.db_table)} l{i} ON l{i}.{qn('name')} = s.{qn(field.name + '_name')}"
+            for i, field in enumerate(lookup_fields)
+        )
+        compared = [field.column for field in lookup_fields] + [field.column for field in value_fields]
+        updated_at = opts.get_field('updated_at').column
+        now = timezone.now()
+        # xmax is 0 for a row version created by this insert, and set for one updated ON CONFLICT
+        cursor.execute(
+            f"INSERT INTO {table} AS t "
+            f"({', '.join(qn(column) for column in compared)}, {qn(hash_field.column)}, "
+            f"{qn(opts.get_field('created_at').column)}, {qn(updated_at)}) "
+            f"SELECT {', '.join(f'l{i}.{qn(field.target_field.column)}' for i, field in enumerate(lookup_fields))}, "
+            f"{', '.join(f's.{qn(field.column)}' for field in value_fields)}, s.{qn(hash_field.column)}, %s, %s "
+            f"FROM {staging} s {joins} ORDER BY s.row_number "
+            f"ON CONFLICT ({qn(hash_field.column)}) DO UPDATE SET "
+            f"{', '.join(f'{qn(column)} = EXCLUDED.{qn(column)}' for column in [*compared, updated_at])} "
+            f"WHERE ({', '.join(f't.{qn(column)}' for column in compared)}) "
+            f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{qn(column)}' for column in compared)}) "
+            f"RETURNING t.{qn(opts.pk.column)}, t.xmax = 0",
+            [now, now],
+        )
+        created, updated = [], set()
+        for pk, inserted in cursor.fetchall():
+            if inserted:
+                created.append(pk)
+            else:
+                updated.add(pk)
+        updated |= self._copy_related(cursor, records) - set(created)
+        cursor.execute(f"DROP TABLE {staging}")
+        return created, updated, snapshot
+
+    def _copy_related(self, cursor, records):
+        """IDs of the listings whose related rows changed."""
+        return set()
+
+
+class RentalCopyImporter(CopyListingImporter, RentalImporter):
+    staging_table = 'import_rental_staging'
+    conveniences_staging_table = 'import_rental_convenience_staging'
+
+    def _copy_related(self, cursor, records):
+        qn = connection.ops.quote_name
+        through = RentalProperty.conveniences.through
+        listing_column = qn(through._meta.get_field('rentalproperty').column)
+        convenience_column = qn(through._meta.get_field('convenience').column)
+        hash_column = qn(RentalProperty._meta.get_field('content_hash').column)
+        pk_column = qn(RentalProperty._meta.pk.column)
+        rentals = qn(RentalProperty._meta.db_table)
+        conveniences = qn(Convenience._meta.db_table)
+        staging = qn(self.conveniences_staging_table)
+
+        self._create_staging(cursor, staging, ['row_number integer', 'name text'])
+        copy_rows(cursor, staging, ['row_number', 'name'], (
+            (row_number, name)
+            for row_number, record in records
+            for name in record.convenience_names
+        ))
+        # Only the differences are written: conveniences the file no longer names are removed from the
+        # listings imported from these rows, and the missing ones are added (ON CONFLICT: already there)
+        cursor.execute(
+            f"DELETE FROM {qn(through._meta.db_table)} x USING {rentals} t, {qn(self.staging_table)} s "
+            f"WHERE x.{listing_column} = t.{pk_column} AND t.{hash_column} = s.{hash_column} "
+            f"AND NOT EXISTS (SELECT 1 FROM {staging} cs JOIN {conveniences} c ON c.{qn('name')} = cs.name "
+            f"WHERE cs.row_number = s.row_number AND c.{qn('id')} = x.{convenience_column}) "
+            f"RETURNING x.{listing_column}"
+        )
+        changed = {row[0] for row in cursor.fetchall()}
+        cursor.execute(
+            f"INSERT INTO {qn(through._meta.db_table)} ({listing_column}, {convenience_column}) "
+            f"SELECT DISTINCT t.{pk_column}, c.{qn('id')} "
+            f"FROM {staging} cs "
+            f"JOIN {qn(self.staging_table)} s ON s.row_number = cs.row_number "
+            f"JOIN {rentals} t ON t.{hash_column} = s.{hash_column} "
+            f"JOIN {conveniences} c ON c.{qn('name')} = cs.name "
+            f"ON CONFLICT DO NOTHING RETURNING {listing_column}"
+        )
+        changed.update(row[0] for row in cursor.fetchall())
+        cursor.execute(f"DROP TABLE {staging}")
+        return changed
+
+
+class LandCopyImporter(CopyListingImporter, LandImporter):
+    staging_table = 'import_land_staging'
+
+
+COPY_IMPORTERS = {importer.model_type: importer for importer in (RentalCopyImporter, LandCopyImporter)}
@@ -0,0 +1,75 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .compiled_model import CONVENIENCE_PREFIX
+
+
+class ConvenienceEncoder:
+    """
+    Multi-hot encoding of convenience ID lists, shared by training and serving.
+
+    Column j is `convenience_<id>` for the j-th smallest known ID. A whole column of ID lists
+    is encoded in one vectorized pass: the lists are flattened once, IDs are mapped to columns
+    with a binary search and the ones are scattered into the matrix, so the cost is
+    O(total IDs) instead of O(rows x conveniences). IDs outside the vocabulary are ignored,
+    like an unseen category in OneHotEncoder(handle_unknown='ignore').
+    """
+
+    SPARSE_MIN_COLUMNS = 64  # transform() returns a CSR matrix from this many conveniences on
+
+    def __init__(self, convenience_ids):
+        self.convenience_ids = np.array(sorted(convenience_ids), dtype=np.int64)
+        self.feature_names = [f'{CONVENIENCE_PREFIX}{cid}' for cid in self.convenience_ids.tolist()]
+        self._known = set(self.convenience_ids.tolist())
+
+    def __len__(self):
+        return len(self.convenience_ids)
+
+    def is_known(self, convenience_id):
+        return convenience_id in self._known
+
+    def encode_one(self, convenience_ids):
+        """{feature name: 1} for the known IDs of a single row; the serving-side sparse form."""
+        return {f'{CONVENIENCE_PREFIX}{cid}': 1 for cid in convenience_ids or () if cid in self._known}
+
+    def _coordinates(self, id_lists):
+        # Missing values (None/NaN from pandas) count as an empty list
+        lists = [ids if isinstance(ids, (list, tuple, set)) else () for ids in id_lists]
+        lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+        flat = np.fromiter(itertools.chain.from_iterable(lists), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(lists)), lengths)
+        columns = np.searchsorted(self.convenience_ids, flat)
+        known = columns < len(self.convenience_ids)
+        known[known] = self.convenience_ids[columns[known]] == flat[known]
+        return len(lists), rows[known], columns[known]
+
+    def transform(self, id_lists, sparse_output=None):
+        """
+        Encode a sequence of ID lists into an (n_rows x n_conveniences) 0/1 uint8 matrix.
+        sparse_output=None picks CSR when the vocabulary has SPARSE_MIN_COLUMNS or more IDs.
+        """
+        n_rows, rows, columns = self._coordinates(id_lists)
+        shape = (n_rows, len(self.convenience_ids))
+        if sparse_output is None:
+            sparse_output = shape[1] >= self.SPARSE_MIN_COLUMNS
+        if sparse_output:
+            matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, columns)), shape=shape)
+            matrix.sum_duplicates()
+            matrix.data[:] = 1  # A convenience listed twice is still just present
+            return matrix
+        matrix = np.zeros(shape, dtype=np.uint8)
+        matrix[rows, columns] = 1
+        return matrix
+
+    def to_frame(self, id_lists, index=None):
+        """The encoded matrix as a DataFrame with one column per feature name (sparse columns when wide)."""
+        matrix = self.transform(id_lists)
+        if sparse.issparse(matrix):
+            frame = pd.DataFrame.sparse.from_spmatrix(matrix, columns=self.feature_names)
+            if index is not None:
+                frame.index = index
+            return frame
+        return pd.DataFrame(matrix, columns=self.feature_names, index=index)
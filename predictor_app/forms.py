@@ -151,4 +151,9 @@ class CSVImportForm(forms.Form):
             ('land', 'Land For Sale'),
         ],
         widget=forms.Select(attrs={'class': 'w-full p-2 border border-gray-300 rounded mt-1'})
-    )
\ No newline at end of file
+    )
+
+
+# --- Bulk Land Scoring Form ---
+class LandBulkScoreForm(forms.Form):
+    csv_file = forms.FileField(label="Upload Parcels CSV")
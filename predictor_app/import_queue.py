@@ -0,0 +1,127 @@
+"""
+Database-backed queue of background CSV imports. ImportCSVView saves the upload under
+MEDIA_ROOT/csv_uploads/ and queues an ImportJob; the run_import_worker command (a plain local
+process, like run_training_worker) picks it up.
+
+A job is imported in chunks of `chunk_size` CSV rows. Each chunk is written in one transaction
+that also saves the job's progress, so after a crash the job's rows_done is exactly what was
+committed. Jobs interrupted that way are queued again and resume after their last committed
+chunk: the rows before it are read and skipped, not imported twice.
+
+A chunk is one importer batch by default. The first batch that folds its listings into the
+model statistics locks their ModelStatistics row until the chunk commits, and that lock is
+what every listing saved in the admin, and any other import, waits for.
+
+A chunk can take minutes, and its progress is only visible once it commits, so while a job is
+being imported a heartbeat thread also touches its updated_at every HEARTBEAT_INTERVAL seconds.
+A running job is only stale, and requeued, once that heartbeat has stopped.
+"""
+import itertools
+import logging
+import threading
+from contextlib import closing, contextmanager
+from datetime import timedelta
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .importers import ImportResult, get_importer, iter_csv_rows
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 60  # Seconds; well below run_import_worker's --stale-after
+
+
+def enqueue_import_job(csv_file, model_type):
+    return ImportJob.objects.create(csv_file=csv_file, file_name=csv_file.name, model_type=model_type)
+
+
+def claim_next_job():
+    """Move the oldest queued job to running and return it, or None. Safe with several workers."""
+    for job in ImportJob.objects.filter(status=ImportJob.QUEUED).order_by('created_at')[:5]:
+        started_at = timezone.now()
+        claimed = ImportJob.objects.filter(pk=job.pk, status=ImportJob.QUEUED).update(
+            status=ImportJob.RUNNING, started_at=started_at, updated_at=started_at)
+        if claimed:
+            job.status, job.started_at = ImportJob.RUNNING, started_at
+            return job
+    return None
+
+
+def requeue_stale_jobs(older_than):
+    """Queue again the running jobs without a heartbeat for `older_than` seconds; they resume where they stopped."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return ImportJob.objects.filter(status=ImportJob.RUNNING, updated_at__lt=cutoff).update(
+        status=ImportJob.QUEUED, updated_at=timezone.now())
+
+
+@contextmanager
+def _heartbeat(job, interval):
+    # The thread has its own database connection: the chunk being imported holds the worker's
+    # connection in a transaction, and nothing written there is visible before it commits
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    ImportJob.objects.filter(pk=job.pk, status=ImportJob.RUNNING).update(updated_at=timezone.now())
+                except DatabaseError:
+                    logger.warning("Heartbeat of import job #%s failed", job.pk, exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'import-job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _record_chunk(job, result):
+    job.rows_done += result.rows
+    job.created_count += result.created
+    job.updated_count += result.updated
+    job.skipped_count += result.skipped
+    job.error_count += result.error_count
+    job.errors.extend(result.errors[:ImportJob.ERRORS_KEPT - len(job.errors)])
+    job.save(update_fields=['rows_done', 'created_count', 'updated_count', 'skipped_count', 'error_count', 'errors',
+                            'updated_at'])
+
+
+def process_job(job, chunk_size=None):
+    """Import a claimed job chunk by chunk, starting after its last committed chunk."""
+    importer = get_importer(job.model_type)
+    chunk_size = chunk_size or importer.batch_size
+    try:
+        with _heartbeat(job, HEARTBEAT_INTERVAL), job.csv_file.open('rb') as f, closing(iter_csv_rows(f)) as rows:
+            if job.rows_done:
+                logger.info("Import job #%s resumes after row %s", job.pk, job.rows_done)
+                next(itertools.islice(rows, job.rows_done, job.rows_done), None)  # Skip the committed rows
+            while True:
+                importer.result = ImportResult()
+                with transaction.atomic():
+                    result = importer.import_rows(itertools.islice(rows, chunk_size), start=job.rows_done)
+                    if not result.rows:
+                        break
+                    _record_chunk(job, result)
+                logger.info("Import job #%s: %s rows done", job.pk, job.rows_done)
+    except KeyboardInterrupt:
+        # The current chunk was rolled back; the next worker resumes after the last committed one
+        ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.QUEUED)
+        raise
+    except UnicodeDecodeError:
+        job.status, job.error = ImportJob.FAILED, "Invalid file encoding. Please use UTF-8."
+    except Exception as e:
+        logger.exception("Import job #%s crashed", job.pk)
+        job.status, job.error = ImportJob.FAILED, str(e)
+    else:
+        job.status = ImportJob.SUCCEEDED
+        job.csv_file.delete(save=False)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'csv_file', 'finished_at', 'updated_at'])
+    logger.info("Import job #%s %s", job.pk, job.status)
+    return job
@@ -0,0 +1,575 @@
+"""
+Batched CSV import engine behind ImportCSVView.
+
+Every model type has an importer with two halves:
+
+- parse_row() turns one CSV row into a plain record, or raises RowError with the message shown
+  to the user. It never touches the database.
+- write_batch() writes a batch of parsed records with a constant number of queries: lookup
+  tables are preloaded into name -> id dicts, missing lookups are created in one bulk_create,
+  listings are inserted with bulk_create and their conveniences with one bulk_create of
+  through rows.
+
+If the database rejects a batch (e.g. a value out of range for its column), the batch is
+rolled back and retried in halves until the failing rows are isolated, so they are reported
+exactly as the former one-row-at-a-time import reported them and the other rows are still
+imported. Lookups are written in bulk without that retry, so their names and descriptions are
+checked against the column lengths in parse_row() already.
+
+bulk_create sends no model signals, so the importers do themselves what the signals would
+have done: fold new listings into the incremental model statistics and rebuild the land price
+table when towns, paper types or access types were added.
+
+On PostgreSQL, rental and land files take the COPY path of copy_import.py instead, which
+shares parse_row() and falls back to write_batch() below for batches the database rejects.
+"""
+import csv
+import io
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .content_hash import listing_content_hash
+from .models import Town, AccessType, PaperType, Convenience, RentalProperty, LandForSale
+from .signals import schedule_land_table_rebuild
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+TRUE_VALUES = ['true', '1', 'yes', 'oui']
+
+
+class RowError(Exception):
+    """A CSV row that cannot be imported; the message is reported as is."""
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0  # CSV rows read, imported or not
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0  # Listings already imported from an identical row
+        self._errors = []  # (row number, message)
+
+    def add_error(self, row_number, message):
+        self._errors.append((row_number, message))
+
+    @property
+    def errors(self):
+        # Rows rejected by the database are only known when their batch is written; report in file order
+        return [message for _, message in sorted(self._errors, key=lambda error: error[0])]
+
+    @property
+    def error_count(self):
+        return len(self._errors)
+
+
+def iter_csv_rows(binary_file, encoding='utf-8-sig'):
+    """
+    Row dicts of a binary CSV file such as an upload, decoded and parsed as they are read, so
+    memory does not grow with the file. utf-8-sig drops a leading BOM; a UnicodeDecodeError is
+    raised when the iteration reaches the undecodable bytes.
+    """
+    text = io.TextIOWrapper(binary_file, encoding=encoding, newline='')
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()  # Leave the file itself open; Django closes uploads
+
+
+def _number(row, column):
+    # Same parsing as the former row-by-row import: thousands separators dropped, blank means 0
+    value = str(row.get(column, '0')).replace(',', '')
+    return float(value) if value else 0.0
+
+
+def _flag(row, column):
+    return row.get(column, 'False').lower() in TRUE_VALUES
+
+
+def _check_length(model, field_name, value):
+    # PostgreSQL would reject the whole bulk write; SQLite does not enforce max_length at all
+    max_length = model._meta.get_field(field_name).max_length
+    if value and len(value) > max_length:
+        raise ValueError(f"{model.__name__} {field_name} '{value}' is longer than {max_length} characters")
+
+
+class BaseImporter:
+    model_type = None
+    batch_size = IMPORT_BATCH_SIZE
+
+    def __init__(self):
+        self.result = ImportResult()
+
+    def parse_row(self, row_number, row):
+        """A record for write_batch(), None for a row to skip silently, or RowError."""
+        raise NotImplementedError
+
+    def write_batch(self, records):
+        """Write [(row_number, record), ...] and count them in self.result."""
+        raise NotImplementedError
+
+    def parse_rows(self, rows, start=0):
+        """
+        (row_number, record, error message) for each CSV row dict. Row numbers count the header
+        as line 1; `start` is the number of data rows before `rows` in the file, for files read in
+        several parts. Needs no database, so it can run in another process.
+        """
+        for index, row in enumerate(rows, start):
+            row_number = index + 2
+            try:
+                yield row_number, self.parse_row(row_number, row), None
+            except RowError as e:
+                yield row_number, None, str(e)
+
+    def write_parsed(self, parsed, batch_size=None):
+        """Write parse_rows() output in batches of `batch_size` records and return the ImportResult."""
+        batch_size = batch_size or self.batch_size
+        batch = []
+        for row_number, record, error in parsed:
+            self.result.rows += 1
+            if error is not None:
+                self.result.add_error(row_number, error)
+                continue
+            if record is None:
+                continue
+            batch.append((row_number, record))
+            if len(batch) >= batch_size:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+        return self.result
+
+    def import_rows(self, rows, batch_size=None, start=0):
+        """Import an iterable of CSV row dicts; see parse_rows() for `start`."""
+        return self.write_parsed(self.parse_rows(rows, start), batch_size)
+
+
+# --- Lookup tables ---
+class TownImporter(BaseImporter):
+    model_type = 'town'
+
+    def parse_row(self, row_number, row):
+        try:
+            name = row.get('name', '').strip()
+            if not name:
+                return None  # Skip empty rows
+            _check_length(Town, 'name', name)
+            latitude = float(row['latitude']) if row.get('latitude') else None
+            longitude = float(row['longitude']) if row.get('longitude') else None
+        except Exception as e:
+            raise RowError(f"Town '{row.get('name', 'N/A')}': {str(e)}")
+        return name, latitude, longitude
+
+    def write_batch(self, records):
+        # update_or_create semantics: a name already imported counts as updated, the last row wins
+        towns = Town.objects.in_bulk({name for _, (name, _, _) in records}, field_name='name')
+        new_towns = {}
+        for _, (name, latitude, longitude) in records:
+            town = towns.get(name) or new_towns.get(name)
+            if town is None:
+                town = new_towns[name] = Town(name=name)
+                self.result.created += 1
+            else:
+                self.result.updated += 1
+            town.latitude, town.longitude = latitude, longitude
+        Town.objects.bulk_create(new_towns.values())
+        Town.objects.bulk_update(towns.values(), ['latitude', 'longitude'])
+        if new_towns:
+            schedule_land_table_rebuild()
+
+
+class DescribedLookupImporter(BaseImporter):
+    """Access types, paper types and conveniences: a name plus an optional description."""
+    model = None
+    label = None
+
+    def parse_row(self, row_number, row):
+        try:
+            name = row.get('name', '').strip()
+            if name:
+                _check_length(self.model, 'name', name)
+                _check_length(self.model, 'description', row.get('description'))
+        except Exception as e:
+            raise RowError(f"{self.label} '{row.get('name', 'N/A')}': {str(e)}")
+        if not name:
+            return None
+        return name, row.get('description')  # None when the file has no description column
+
+    def write_batch(self, records):
+        objects = self.model.objects.in_bulk({name for _, (name, _) in records}, field_name='name')
+        new_objects = {}
+        changed = {}
+        for _, (name, description) in records:
+            obj = objects.get(name) or new_objects.get(name)
+            if obj is None:
+                obj = new_objects[name] = self.model(name=name, description=description or '')
+                obj.description = obj.description or obj.default_description()  # As save() does
+                self.result.created += 1
+            elif description is not None and description != obj.description:
+                obj.description = description or obj.default_description()
+                if obj.pk is not None:
+                    changed[name] = obj
+                self.result.updated += 1
+        self.model.objects.bulk_create(new_objects.values())
+        self.model.objects.bulk_update(changed.values(), ['description'])
+        if new_objects and self.model in (AccessType, PaperType):
+            schedule_land_table_rebuild()
+
+
+class AccessTypeImporter(DescribedLookupImporter):
+    model_type = 'access_type'
+    model = AccessType
+    label = 'AccessType'
+
+
+class PaperTypeImporter(DescribedLookupImporter):
+    model_type = 'paper_type'
+    model = PaperType
+    label = 'PaperType'
+
+
+class ConvenienceImporter(DescribedLookupImporter):
+    model_type = 'convenience'
+    model = Convenience
+    label = 'Convenience'
+
+
+# --- Listings ---
+class LookupCache:
+    """name -> id of one lookup table, loaded once; missing names are created in bulk."""
+
+    def __init__(self, model):
+        self.model = model
+        self._ids = None
+
+    @property
+    def ids(self):
+        # Loaded on first use: importers that only parse rows (in worker processes) never query
+        if self._ids is None:
+            self._ids = dict(self.model.objects.values_list('name', 'id'))
+        return self._ids
+
+    def ensure(self, names):
+        """Create the lookups among `names` that do not exist yet. Returns True if any were created."""
+        missing = {name for name in names if name not in self.ids}
+        if not missing:
+            return False
+        new_objects = []
+        for name in sorted(missing):
+            obj = self.model(name=name)
+            if hasattr(obj, 'default_description'):
+                obj.description = obj.default_description()  # As save() does
+            new_objects.append(obj)
+        # Another import may create the same names concurrently; keep theirs
+        self.model.objects.bulk_create(new_objects, ignore_conflicts=True)
+        self.ids.update(self.model.objects.filter(name__in=missing).values_list('name', 'id'))
+        return True
+
+    def forget(self):
+        """Reload the IDs on next use, e.g. after a rollback undid lookups created by ensure()."""
+        self._ids = None
+
+
+class ListingImporter(BaseImporter):
+    """
+    Shared batching of RentalImporter and LandImporter.
+
+    Imports are idempotent: every listing stores the content hash of the row it was imported
+    from (content_hash.py), under a unique index. A row whose hash is already in the table is
+    skipped, unless that listing was edited since, in which case it gets the file's values back
+    and counts as updated. Re-importing an unchanged file thus reads each batch's listings once
+    and writes nothing.
+    """
+    model = None
+    statistics_name = None
+    label = None
+    lookup_fields = ('town', 'access_type')
+    value_fields = ()  # Model fields set from the row, other than the lookups
+
+    def __init__(self):
+        super().__init__()
+        self.towns = LookupCache(Town)
+        self.access_types = LookupCache(AccessType)
+        self.lookup_caches = [self.towns, self.access_types]
+
+    def error_message(self, row_number, row, error):
+        return f"{self.label} Row {row_number} (Town: {row.get('town_name', 'N/A')}): {str(error)}"
+
+    def parse_row(self, row_number, row):
+        try:
+            record = self.parse_listing(row_number, row)
+            for field, name in record.lookups.items():
+                _check_length(self.model._meta.get_field(field).related_model, 'name', name)
+            for name in record.convenience_names:
+                _check_length(Convenience, 'name', name)
+            record.content_hash = listing_content_hash(self.model, record.lookups, record.values,
+                                                       record.convenience_names)
+        except RowError:
+            raise
+        except Exception as e:
+            raise RowError(self.error_message(row_number, row, e))
+        return record
+
+    def parse_listing(self, row_number, row):
+        raise NotImplementedError
+
+    def ensure_lookups(self, records):
+        """Create the lookups the records name that do not exist yet. Returns True if any were created."""
+        raise NotImplementedError
+
+    def build(self, record):
+        """The unsaved listing and the IDs of its conveniences."""
+        raise NotImplementedError
+
+    def current_convenience_names(self, ids):
+        """{listing id: convenience names} of saved listings."""
+        return {}
+
+    def replace_conveniences(self, listings):
+        """Set the conveniences of saved [(listing, convenience IDs), ...]."""
+
+    def write_batch(self, records):
+        if self.ensure_lookups(records):
+            schedule_land_table_rebuild()
+        new, changed = self._classify(records)
+        ids = self._insert_or_split([(row_number, record, self.build(record)) for row_number, record in new])
+        self.result.created += len(ids)
+        self._update_statistics(ids)
+        if changed:
+            self._update_changed(changed)
+
+    def _classify(self, records):
+        # New rows, and (row_number, record, pk) of the listings imported from the same row and edited since;
+        # the other rows, and rows repeated within the batch, are skipped
+        unique = {}
+        for row_number, record in records:
+            unique.setdefault(record.content_hash, (row_number, record))
+        current = self.current_hashes(list(unique))
+        new, changed = [], []
+        for content_hash, (row_number, record) in unique.items():
+            if content_hash not in current:
+                new.append((row_number, record))
+            elif current[content_hash][1] != content_hash:
+                changed.append((row_number, record, current[content_hash][0]))
+        self.result.skipped += len(records) - len(new) - len(changed)
+        return new, changed
+
+    def current_hashes(self, content_hashes):
+        """{content hash: (listing id, hash of its current content)} of the listings imported with those hashes."""
+        listings = list(self.model.objects.filter(content_hash__in=content_hashes).values(
+            'id', 'content_hash', *(f'{field}__name' for field in self.lookup_fields), *self.value_fields))
+        convenience_names = self.current_convenience_names([listing['id'] for listing in listings])
+        return {
+            listing['content_hash']: (listing['id'], listing_content_hash(
+                self.model, {field: listing[f'{field}__name'] for field in self.lookup_fields},
+                {field: listing[field] for field in self.value_fields}, convenience_names.get(listing['id'], ())))
+            for listing in listings
+        }
+
+    def _update_changed(self, changed):
+        from .incremental import ListingSnapshot
+
+        snapshot = ListingSnapshot.capture(self.statistics_name, [pk for _, _, pk in changed])
+        now = timezone.now()
+        listings = []
+        for _, record, pk in changed:
+            listing, convenience_ids = self.build(record)
+            listing.pk, listing.updated_at = pk, now  # bulk_update does not touch auto_now fields
+            listings.append((listing, convenience_ids))
+        with transaction.atomic():
+            self.model.objects.bulk_update([listing for listing, _ in listings],
+                                           [*self.lookup_fields, *self.value_fields, 'updated_at'])
+            self.replace_conveniences(listings)
+        self.result.updated += len(changed)
+        if snapshot is not None:
+            snapshot.apply()
+
+    def _insert_or_split(self, items):
+        # A part the database rejects is rolled back and halved until the failing rows are alone, so a
+        # batch with a few bad rows costs a few inserts per bad row instead of one insert per row
+        try:
+            with transaction.atomic():
+                return self._insert([listing for _, _, listing in items])
+        except Exception as e:
+            for _, _, (listing, _) in items:
+                listing.pk = None  # Set by the insert that was rolled back
+            if len(items) == 1:
+                row_number, record, _ = items[0]
+                logger.debug("%s row %s rejected by the database: %s", self.model_type, row_number, e)
+                self.result.add_error(row_number, self.error_message(row_number, record.row, e))
+                return []
+        middle = len(items) // 2
+        return self._insert_or_split(items[:middle]) + self._insert_or_split(items[middle:])
+
+    def _insert(self, listings):
+        created = self.model.objects.bulk_create([listing for listing, _ in listings])
+        through = RentalProperty.conveniences.through
+        through_rows = [through(rentalproperty_id=listing.pk, convenience_id=convenience_id)
+                        for listing, (_, convenience_ids) in zip(created, listings)
+                        for convenience_id in convenience_ids]
+        if through_rows:
+            through.objects.bulk_create(through_rows)
+        return [listing.pk for listing in created]
+
+    def _update_statistics(self, ids):
+        from .incremental import ListingSnapshot
+
+        snapshot = ListingSnapshot.capture(self.statistics_name, ids, new=True)
+        if snapshot is not None:
+            snapshot.apply()
+
+
+class ListingRecord:
+    """A parsed listing row; `row` is the raw CSV row, kept for error messages."""
+    __slots__ = ('row', 'values', 'lookups', 'convenience_names', 'content_hash')
+
+    def __init__(self, row, values, lookups, convenience_names=()):
+        self.row = row
+        self.values = values  # Model field values other than the lookups
+        self.lookups = lookups  # {field: name} for the town, access type and paper type
+        self.convenience_names = convenience_names
+        self.content_hash = None  # Set by ListingImporter.parse_row()
+
+
+class RentalImporter(ListingImporter):
+    model_type = 'rental'
+    model = RentalProperty
+    statistics_name = 'rental'
+    label = 'Rental'
+    value_fields = ('property_type', 'num_rooms', 'price', 'apartment_type', 'house_type', 'has_house_basement')
+
+    def __init__(self):
+        super().__init__()
+        self.conveniences = LookupCache(Convenience)
+        self.lookup_caches.append(self.conveniences)
+
+    def parse_listing(self, row_number, row):
+        town_name = row.get('town_name', '').strip()
+        if not town_name:
+            raise RowError(f"Rental Row {row_number}: Missing town_name")
+        access_type_name = row.get('access_type_name', '').strip()
+        if not access_type_name:
+            raise RowError(f"Rental Row {row_number} (Town: {town_name}): Missing access_type_name")
+
+        convenience_names = []
+        convenience_names_str = row.get('conveniences_names', '')
+        if convenience_names_str:
+            for conv_name_raw in convenience_names_str.split(','):
+                conv_name = conv_name_raw.strip()
+                if conv_name:
+                    convenience_names.append(conv_name)
+
+        values = {
+            'property_type': row.get('property_type', '').strip(),
+            'num_rooms': int(row.get('num_rooms', 1)),
+            'price': _number(row, 'price'),
+            'apartment_type': row.get('apartment_type') if row.get('property_type') == 'apartment' else None,
+            'house_type': row.get('house_type') if row.get('property_type') == 'house' else None,
+            'has_house_basement': _flag(row, 'has_house_basement'),
+        }
+        return ListingRecord(row, values, {'town': town_name, 'access_type': access_type_name}, convenience_names)
+
+    def ensure_lookups(self, records):
+        self.conveniences.ensure({name for _, record in records for name in record.convenience_names})
+        new_towns = self.towns.ensure({record.lookups['town'] for _, record in records})
+        new_access_types = self.access_types.ensure({record.lookups['access_type'] for _, record in records})
+        return new_towns or new_access_types
+
+    def build(self, record):
+        rental = RentalProperty(town_id=self.towns.ids[record.lookups['town']],
+                                access_type_id=self.access_types.ids[record.lookups['access_type']],
+                                content_hash=record.content_hash, **record.values)
+        return rental, sorted({self.conveniences.ids[name] for name in record.convenience_names})
+
+    def current_convenience_names(self, ids):
+        names = {}
+        through = RentalProperty.conveniences.through
+        for rental_id, name in through.objects.filter(rentalproperty_id__in=ids).values_list(
+                'rentalproperty_id', 'convenience__name'):
+            names.setdefault(rental_id, []).append(name)
+        return names
+
+    def replace_conveniences(self, listings):
+        through = RentalProperty.conveniences.through
+        through.objects.filter(rentalproperty_id__in=[rental.pk for rental, _ in listings]).delete()
+        through.objects.bulk_create([through(rentalproperty_id=rental.pk, convenience_id=convenience_id)
+                                     for rental, convenience_ids in listings
+                                     for convenience_id in convenience_ids])
+
+
+class LandImporter(ListingImporter):
+    model_type = 'land'
+    model = LandForSale
+    statistics_name = 'land'
+    label = 'Land'
+    lookup_fields = ('town', 'access_type', 'paper_type')
+    value_fields = ('is_fenced', 'is_ready_to_build', 'area_sqm', 'price', 'price_per_sqm')
+
+    def __init__(self):
+        super().__init__()
+        self.paper_types = LookupCache(PaperType)
+        self.lookup_caches.append(self.paper_types)
+
+    def parse_listing(self, row_number, row):
+        town_name = row.get('town_name', '').strip()
+        if not town_name:
+            raise RowError(f"Land Row {row_number}: Missing town_name")
+        access_type_name = row.get('access_type_name', '').strip()
+        paper_type_name = row.get('paper_type_name', '').strip()
+        if not access_type_name:
+            raise RowError(f"Land Row {row_number} (Town: {town_name}): Missing access_type_name")
+        if not paper_type_name:
+            raise RowError(f"Land Row {row_number} (Town: {town_name}): Missing paper_type_name")
+
+        area_sqm = _number(row, 'area_sqm')
+        price = _number(row, 'price')
+        values = {
+            'is_fenced': _flag(row, 'is_fenced'),
+            'is_ready_to_build': _flag(row, 'is_ready_to_build'),
+            'area_sqm': area_sqm,
+            'price': price,
+            'price_per_sqm': LandForSale.compute_price_per_sqm(price, area_sqm),  # bulk_create skips save()
+        }
+        lookups = {'town': town_name, 'access_type': access_type_name, 'paper_type': paper_type_name}
+        return ListingRecord(row, values, lookups)
+
+    def ensure_lookups(self, records):
+        new_towns = self.towns.ensure({record.lookups['town'] for _, record in records})
+        new_access_types = self.access_types.ensure({record.lookups['access_type'] for _, record in records})
+        new_paper_types = self.paper_types.ensure({record.lookups['paper_type'] for _, record in records})
+        return new_towns or new_access_types or new_paper_types
+
+    def build(self, record):
+        land = LandForSale(town_id=self.towns.ids[record.lookups['town']],
+                           access_type_id=self.access_types.ids[record.lookups['access_type']],
+                           paper_type_id=self.paper_types.ids[record.lookups['paper_type']],
+                           content_hash=record.content_hash, **record.values)
+        return land, ()
+
+
+IMPORTERS = {
+    importer.model_type: importer
+    for importer in (TownImporter, AccessTypeImporter, PaperTypeImporter, ConvenienceImporter,
+                     RentalImporter, LandImporter)
+}
+
+
+def get_importer(model_type, use_copy=None):
+    """
+    A fresh importer for `model_type`. Listings go through the PostgreSQL COPY path
+    (copy_import.py) when `use_copy`, by default settings.CSV_IMPORT_USE_COPY, is set and the
+    database is PostgreSQL; everything else uses the batched ORM path.
+    """
+    if model_type not in IMPORTERS:
+        raise ValueError(f"Unknown import type '{model_type}'.")
+    if use_copy is None:
+        use_copy = getattr(settings, 'CSV_IMPORT_USE_COPY', True)
+    if use_copy and connection.vendor == 'postgresql':
+        from .copy_import import COPY_IMPORTERS
+        if model_type in COPY_IMPORTERS:
+            return COPY_IMPORTERS[model_type]()
+    return IMPORTERS[model_type]()
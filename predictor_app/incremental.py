@@ -0,0 +1,169 @@
+"""
+Incremental model updates from sufficient statistics.
+
+train_models stores XᵀX, Xᵀy and Σy² of each linear model's training rows in ModelStatistics.
+From then on the signals in signals.py retract a listing's old row and add its new one whenever
+it is created, edited or deleted, so the statistics always describe the current tables.
+refresh_model() re-solves the normal equations from them, which costs O(columns²) memory and
+O(columns³) time whatever the number of listings, and publishes the result like a full retrain.
+
+Writes that bypass model signals (queryset.update(), raw SQL) are not seen; check_drift()
+compares the incremental solution with an exact one computed from the tables.
+"""
+import logging
+
+import numpy as np
+from django.db import transaction
+
+from .models import ModelStatistics, Convenience
+from .ml_utils import (
+    RENTAL_FEATURE_SPEC, LAND_FEATURE_SPEC, MODEL_VERSIONS, model_registry, rebuild_land_price_table,
+)
+from .sufficient_stats import SufficientStatistics
+from .training_data import iter_rental_training_rows, iter_land_training_rows
+
+logger = logging.getLogger(__name__)
+
+STATISTICS_SOURCES = {
+    # name: (feature spec, training row extractor)
+    'rental': (RENTAL_FEATURE_SPEC, iter_rental_training_rows),
+    'land': (LAND_FEATURE_SPEC, iter_land_training_rows),
+}
+
+
+def compute_statistics(name, rows=None):
+    """Exact statistics over `rows`, or over every training row in the database."""
+    spec, iter_rows = STATISTICS_SOURCES[name]
+    stats = SufficientStatistics(spec)
+    stats.update(iter_rows() if rows is None else rows)
+    return stats
+
+
+def load_statistics(name, for_update=False):
+    """The stored statistics for `name`, or None if train_models has not initialised them yet."""
+    records = ModelStatistics.objects.filter(name=name)
+    if for_update:
+        records = records.select_for_update()
+    record = records.first()
+    if record is None:
+        return None
+    spec = STATISTICS_SOURCES[name][0]
+    return SufficientStatistics.from_record(spec, record.columns, record.gram, record.moment,
+                                            record.target_sq_sum)
+
+
+def save_statistics(name, stats):
+    ModelStatistics.objects.update_or_create(name=name, defaults=stats.to_record())
+
+
+def reset_statistics(name, rows=None):
+    """Replace the stored statistics with exact ones; called after every full training run."""
+    stats = compute_statistics(name, rows)
+    save_statistics(name, stats)
+    return stats
+
+
+def apply_changes(name, rows_before, rows_after):
+    """Retract `rows_before` and add `rows_after` to the stored statistics, atomically."""
+    if not rows_before and not rows_after:
+        return
+    with transaction.atomic():
+        stats = load_statistics(name, for_update=True)  # Serializes concurrent listing edits
+        if stats is None:
+            return
+        stats.update(rows_before, sign=-1)
+        stats.update(rows_after)
+        save_statistics(name, stats)
+    logger.debug("Statistics of model '%s': -%d/+%d rows", name, len(rows_before), len(rows_after))
+
+
+class ListingSnapshot:
+    """The training rows of some listings before a change; apply() folds the change into the statistics."""
+
+    def __init__(self, name, ids, rows_before):
+        self.name = name
+        self.ids = list(ids)
+        self.rows_before = rows_before
+
+    @classmethod
+    def capture(cls, name, ids, new=False):
+        """None when there is nothing to track. `new` listings are not in the database yet."""
+        ids = [pk for pk in ids if pk is not None]
+        if not ids or not ModelStatistics.objects.filter(name=name).exists():
+            return None
+        return cls(name, ids, [] if new else list(STATISTICS_SOURCES[name][1](ids=ids)))
+
+    def apply(self):
+        rows_after = list(STATISTICS_SOURCES[self.name][1](ids=self.ids))
+        apply_changes(self.name, self.rows_before, rows_after)
+
+
+def _feature_rows(name, rows):
+    # Training rows -> {feature: value} dicts for CompiledLinearModel.predict_many
+    spec = STATISTICS_SOURCES[name][0]
+    feature_rows = []
+    for row in rows:
+        features = dict(row)
+        if spec.multi_hot:
+            key, prefix = spec.multi_hot
+            features.update({f'{prefix}{item}': 1 for item in row.get(key) or ()})
+        feature_rows.append(features)
+    return feature_rows
+
+
+def solve(name, stats):
+    """(CompiledLinearModel, FeatureVocabulary) fitted from `stats`."""
+    if name == 'rental':
+        # Like a full retrain, know every convenience in the database even if no listing has it yet
+        stats.ensure_numeric_columns(f'{RENTAL_FEATURE_SPEC.multi_hot[1]}{cid}'
+                                     for cid in Convenience.objects.values_list('id', flat=True))
+    return stats.solve()
+
+
+def publish_solution(name, stats, source, fingerprint=None):
+    """Solve `stats` and publish the model as a new version of `name`. Returns the version name."""
+    compiled, vocabulary = solve(name, stats)
+    # The joblib bundle has no sklearn pipeline here (only train_models --engine pandas fits one), but
+    # every version keeps one so benchmark_artifacts and tools reading bundles still find it
+    version = MODEL_VERSIONS[name].publish(compiled, vocabulary, fingerprint=fingerprint, source=source,
+                                           bundle={'compiled': compiled, 'vocabulary': vocabulary})
+    model_registry.invalidate(name)
+    if name == 'land':
+        rebuild_land_price_table()
+    return version
+
+
+def refresh_model(name):
+    """Re-solve model `name` from its stored statistics and publish it. Returns the number of rows it covers."""
+    stats = load_statistics(name)
+    if stats is None:
+        raise ValueError(f"No statistics for the {name} model yet; run train_models first.")
+    publish_solution(name, stats, source='incremental')
+    logger.info("Model '%s' refreshed from statistics over %d rows", name, stats.n_rows)
+    return stats.n_rows
+
+
+def check_drift(name):
+    """
+    Compare the incremental model with an exact least-squares fit over the current tables.
+    Returns a dict with both row counts and the largest prediction difference over those rows.
+    """
+    stats = load_statistics(name)
+    if stats is None:
+        raise ValueError(f"No statistics for the {name} model yet; run train_models first.")
+    rows = list(STATISTICS_SOURCES[name][1]())
+    exact = compute_statistics(name, rows)
+    if not rows:
+        return {'incremental_rows': stats.n_rows, 'exact_rows': 0, 'max_abs_diff': None, 'mean_abs_target': None,
+                'exact_statistics': exact}
+    feature_rows = _feature_rows(name, rows)
+    incremental_predictions = solve(name, stats)[0].predict_many(feature_rows)
+    exact_predictions = solve(name, exact)[0].predict_many(feature_rows)
+    targets = np.array([float(row[exact.spec.target]) for row in rows])
+    return {
+        'incremental_rows': stats.n_rows,
+        'exact_rows': exact.n_rows,
+        'max_abs_diff': float(np.max(np.abs(incremental_predictions - exact_predictions))),
+        'mean_abs_target': float(np.mean(np.abs(targets))),
+        'exact_statistics': exact,
+    }
@@ -0,0 +1,29 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    The process-wide bounded pool that runs model inference for the async views. It is sized
+    by PREDICTION_EXECUTOR_WORKERS so a burst of requests queues for CPU instead of
+    starting one thread per request, and so inference never runs on the event loop.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'PREDICTION_EXECUTOR_WORKERS', 4),
+                                               thread_name_prefix='inference')
+    return _executor
+
+
+async def run_inference(func, *args):
+    """Await `func(*args)` on the inference pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), func, *args)
@@ -0,0 +1,64 @@
+import numpy as np
+
+MISSING_ID = -1  # Axis slot used for a missing (None) paper type / access type / town
+
+
+class LandPriceTable:
+    """
+    Every price-per-sqm prediction of the land model, materialized over
+    towns x paper types x access types x is_fenced x is_ready_to_build.
+
+    The table is a dense float64 array indexed by category codes; serving a
+    prediction is one dict lookup per axis plus an array read. `model_version`
+    ties the table to the model it was computed from so a stale table is never used.
+    """
+
+    AXES = ('town_id', 'paper_type_id', 'access_type_id')
+
+    def __init__(self, axis_ids, values, model_version):
+        self.axis_ids = [np.asarray(ids, dtype=np.int64) for ids in axis_ids]
+        self.values = values
+        self.model_version = model_version
+        self._codes = [{int(v): i for i, v in enumerate(ids)} for ids in self.axis_ids]
+
+    @classmethod
+    def build(cls, compiled, town_ids, paper_type_ids, access_type_ids, model_version):
+        """Compute the full table from a CompiledLinearModel by broadcasting its per-axis weights."""
+        from .compiled_model import MISSING_CATEGORY
+
+        axis_ids = [[MISSING_ID] + sorted(ids) for ids in (town_ids, paper_type_ids, access_type_ids)]
+        category_index = dict(compiled.categorical)
+        numeric_index = dict(compiled.numeric)
+
+        axis_weights = []
+        for feature, ids in zip(cls.AXES, axis_ids):
+            index = category_index[feature]
+            keys = [MISSING_CATEGORY if v == MISSING_ID else v for v in ids]
+            axis_weights.append(np.array([compiled.coef[index[k]] if k in index else 0.0 for k in keys]))
+        flag_weights = [compiled.coef[numeric_index[f]] * np.array([0.0, 1.0])
+                        for f in ('is_fenced', 'is_ready_to_build')]
+
+        values = (compiled.intercept
+                  + axis_weights[0][:, None, None, None, None]
+                  + axis_weights[1][None, :, None, None, None]
+                  + axis_weights[2][None, None, :, None, None]
+                  + flag_weights[0][None, None, None, :, None]
+                  + flag_weights[1][None, None, None, None, :])
+        return cls(axis_ids, values, model_version)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def lookup(self, features):
+        """O(1) prediction for a land feature dict, or None if an ID is not in the table."""
+        index = []
+        for feature, codes in zip(self.AXES, self._codes):
+            value = features.get(feature)
+            code = codes.get(MISSING_ID if value is None else value)
+            if code is None:
+                return None
+            index.append(code)
+        index.append(1 if features.get('is_fenced') else 0)
+        index.append(1 if features.get('is_ready_to_build') else 0)
+        return float(self.values[tuple(index)])
@@ -0,0 +1,43 @@
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from predictor_app import mapped_artifacts
+from predictor_app.ml_utils import (
+    load_model_artifact, MODEL_VERSIONS, RENTAL_MODEL_HEADER_PATH, LAND_MODEL_HEADER_PATH, LAND_TABLE_HEADER_PATH,
+)
+
+
+class Command(BaseCommand):
+    help = 'Compares loading the joblib model artifacts with loading the memory-mapped ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Number of loads per artifact (default 50)')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        candidates = [
+            ('rental (joblib)', MODEL_VERSIONS['rental'].bundle_path(), load_model_artifact),
+            ('rental (mmap)', RENTAL_MODEL_HEADER_PATH, mapped_artifacts.read_linear_model),
+            ('land (joblib)', MODEL_VERSIONS['land'].bundle_path(), load_model_artifact),
+            ('land (mmap)', LAND_MODEL_HEADER_PATH, mapped_artifacts.read_linear_model),
+            ('land table (mmap)', LAND_TABLE_HEADER_PATH, mapped_artifacts.read_land_table),
+        ]
+
+        self.stdout.write(f"{'artifact':<20} {'median ms':>10} {'min ms':>10} {'max ms':>10}")
+        for label, path, loader in candidates:
+            if path is None or not os.path.exists(path):
+                self.stdout.write(self.style.WARNING(f"{label:<20} missing ({path}); run train_models first"))
+                continue
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                loader(path)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f"{label:<20} {statistics.median(timings):>10.3f} "
+                              f"{min(timings):>10.3f} {max(timings):>10.3f}")
+        self.stdout.write(self.style.NOTICE(
+            "Loads after the first are served from the OS page cache; mmap artifacts also share "
+            "those pages between worker processes instead of holding one unpickled copy each."))
@@ -0,0 +1,93 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from predictor_app.models import Town, AccessType, PaperType
+
+HEADERS = {'host': 'localhost'}
+
+
+class Command(BaseCommand):
+    help = ('Compares prediction-view throughput through the WSGI handler (sync views, one thread per '
+            'concurrent request) and the ASGI handler (async views on a single event loop)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['rental', 'land'], default='rental')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per run (default 500)')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight (default 32)')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        total = options['requests']
+        concurrency = options['concurrency']
+        payload = self._payload(kind)
+
+        sync_url = reverse(f'predict_{kind}')
+        async_url = reverse(f'predict_{kind}_async')
+
+        self.stdout.write(f"{total} POST requests to the {kind} prediction view, {concurrency} in flight")
+        self.stdout.write(f"{'stack':<8} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10}")
+        self._report('WSGI', *self._run_sync(sync_url, payload, total, concurrency))
+        self._report('ASGI', *asyncio.run(self._run_async(async_url, payload, total, concurrency)))
+
+    def _payload(self, kind):
+        town = Town.objects.order_by('id').first()
+        access_type = AccessType.objects.order_by('id').first()
+        if town is None or access_type is None:
+            raise CommandError("Import towns and access types before benchmarking.")
+        if kind == 'rental':
+            return {'town': town.id, 'access_type': access_type.id, 'property_type': 'apartment',
+                    'num_rooms': 2, 'apartment_type': 'T2'}
+        paper_type = PaperType.objects.order_by('id').first()
+        if paper_type is None:
+            raise CommandError("Import paper types before benchmarking.")
+        return {'town': town.id, 'paper_type': paper_type.id, 'access_type': access_type.id, 'is_fenced': 'on'}
+
+    def _run_sync(self, url, payload, total, concurrency):
+        def worker(n):
+            client = Client(headers=HEADERS)
+            latencies = []
+            for _ in range(n):
+                started = time.perf_counter()
+                response = client.post(url, payload)
+                latencies.append(time.perf_counter() - started)
+                self._check(response)
+            connections.close_all()
+            return latencies
+
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = [lat for result in pool.map(worker, shares) for lat in result]
+        return latencies, time.perf_counter() - started
+
+    async def _run_async(self, url, payload, total, concurrency):
+        client = AsyncClient(headers=HEADERS)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, payload)
+                self._check(response)
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(total)))
+        return latencies, time.perf_counter() - started
+
+    def _check(self, response):
+        if response.status_code != 200:
+            raise CommandError(f"Prediction view returned HTTP {response.status_code}.")
+
+    def _report(self, label, latencies, elapsed):
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(f"{label:<8} {len(latencies) / elapsed:>10.1f} "
+                          f"{statistics.median(latencies) * 1000:>10.2f} {p95 * 1000:>10.2f}")
@@ -0,0 +1,178 @@
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import sklearn
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from predictor_app.incremental import STATISTICS_SOURCES, reset_statistics, solve
+from predictor_app.ml_utils import (
+    rental_design_matrix, rental_pipeline, land_design_matrix, land_pipeline, publish_model,
+    RENTAL_FEATURE_SPEC, LAND_FEATURE_SPEC,
+)
+from predictor_app.model_versions import ModelVersionStore
+from predictor_app.models import ModelStatistics, RentalProperty, LandForSale
+from predictor_app.synthetic_data import SyntheticListingGenerator
+from predictor_app.training_arrays import TrainingArrays
+from predictor_app.training_data import (
+    iter_rental_training_rows, iter_land_training_rows, rental_training_queryset, land_training_queryset,
+)
+from predictor_app.training_jobs import TRAINING_ENGINES
+
+MIB = 1024 * 1024
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Times the training pipeline (extraction, featurization, fit, dump) on synthetic listings generated '
+            'from the reference CSV files, at increasing table sizes, and writes wall time and peak memory per '
+            'stage to JSON. The generated listings are rolled back afterwards unless --keep-data is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                            help='Synthetic listings per model at each step (default 10000 100000)')
+        parser.add_argument('--model', choices=['rental', 'land', 'all'], default='all')
+        parser.add_argument('--engine', choices=TRAINING_ENGINES, default='streaming',
+                            help='Training path to measure, as in train_models --engine (default streaming)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the generator (default 0)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert (default 5000)')
+        parser.add_argument('--reference-dir', default=os.path.join(settings.BASE_DIR, 'data', 'csv'),
+                            help='Directory with the madagascar_*.csv reference files (default data/csv)')
+        parser.add_argument('--output', default='training_benchmark.json', help='JSON report path')
+        parser.add_argument('--no-trace-memory', action='store_true',
+                            help='Skip tracemalloc, which slows down Python-heavy stages such as extraction')
+        parser.add_argument('--keep-data', action='store_true', help='Commit the generated listings')
+
+    def handle(self, *args, **options):
+        self.trace_memory = not options['no_trace_memory']
+        models = ['rental', 'land'] if options['model'] == 'all' else [options['model']]
+        sizes = sorted(options['sizes'])
+        report = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'scikit-learn': sklearn.__version__,
+                'cpus': os.cpu_count(),
+                'trace_memory': self.trace_memory,
+            },
+            'engine': options['engine'],
+            'seed': options['seed'],
+            'results': [],
+        }
+
+        generator = SyntheticListingGenerator(options['reference_dir'], seed=options['seed'])
+        if self.trace_memory:
+            tracemalloc.start()
+        try:
+            with tempfile.TemporaryDirectory() as artifact_dir, transaction.atomic():
+                generator.ensure_lookups()
+                for name in models:
+                    generated = 0
+                    for size in sizes:
+                        result = self._benchmark(name, generator, size - generated, artifact_dir,
+                                                 options['batch_size'], options['engine'])
+                        generated = max(size, generated)
+                        result['synthetic_listings'] = generated
+                        report['results'].append(result)
+                        self._print_result(result)
+                if options['keep_data']:
+                    # bulk_create bypasses the signals that keep the incremental statistics current
+                    for name in models:
+                        if ModelStatistics.objects.filter(name=name).exists():
+                            reset_statistics(name)
+                else:
+                    raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            if self.trace_memory:
+                tracemalloc.stop()
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        kept = 'kept' if options['keep_data'] else 'rolled back'
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']} (synthetic listings {kept})."))
+
+    @contextmanager
+    def _stage(self, stages, name):
+        # Peak memory is what the stage allocated on top of what was already held when it started
+        baseline = 0
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        yield
+        stage = {'seconds': round(time.perf_counter() - started, 4)}
+        if self.trace_memory:
+            stage['peak_mb'] = round((tracemalloc.get_traced_memory()[1] - baseline) / MIB, 2)
+        stages[name] = stage
+
+    def _benchmark(self, name, generator, to_generate, artifact_dir, batch_size, engine):
+        stages = {}
+        store = ModelVersionStore(name, os.path.join(artifact_dir, f'{name}.json'),
+                                  os.path.join(artifact_dir, 'versions', name), keep=1)
+        with self._stage(stages, 'load'):
+            if name == 'rental':
+                generator.bulk_create_rentals(max(to_generate, 0), batch_size)
+            else:
+                generator.bulk_create_lands(max(to_generate, 0), batch_size)
+
+        if engine == 'streaming':
+            spec, iter_rows = STATISTICS_SOURCES[name]
+            queryset = rental_training_queryset() if name == 'rental' else land_training_queryset()
+            with self._stage(stages, 'extract'):
+                arrays = TrainingArrays.from_rows(spec, iter_rows(), capacity=queryset.count())
+            with self._stage(stages, 'featurize'):
+                stats = arrays.sufficient_statistics()
+            with self._stage(stages, 'fit'):
+                compiled, vocabulary = solve(name, stats)
+            with self._stage(stages, 'dump'):
+                store.publish(compiled, vocabulary)
+            n_rows = arrays.n_rows
+            n_columns = len(spec.categorical) + len(spec.numeric) + len(vocabulary.convenience_ids)
+        else:
+            with self._stage(stages, 'extract'):
+                rows = list(iter_rental_training_rows() if name == 'rental' else iter_land_training_rows())
+            with self._stage(stages, 'featurize'):
+                if name == 'rental':
+                    X, y, convenience_ids = rental_design_matrix(rows)
+                else:
+                    X, y = land_design_matrix(rows)
+            with self._stage(stages, 'fit'):
+                pipeline = rental_pipeline(convenience_ids) if name == 'rental' else land_pipeline()
+                pipeline.fit(X, y)
+            with self._stage(stages, 'dump'):
+                if name == 'rental':
+                    publish_model(store, pipeline, X, RENTAL_FEATURE_SPEC.categorical, convenience_ids)
+                else:
+                    publish_model(store, pipeline, X, LAND_FEATURE_SPEC.categorical)
+            n_rows, n_columns = len(rows), X.shape[1]
+
+        table = RentalProperty if name == 'rental' else LandForSale
+        return {
+            'model': name,
+            'table_rows': table.objects.count(),
+            'training_rows': n_rows,
+            'design_columns': n_columns,
+            'stages': stages,
+        }
+
+    def _print_result(self, result):
+        self.stdout.write(self.style.NOTICE(
+            f"{result['model']}: {result['training_rows']} training rows, {result['design_columns']} input columns"))
+        for stage, values in result['stages'].items():
+            memory = f"{values['peak_mb']:>10.1f} MB peak" if 'peak_mb' in values else ''
+            self.stdout.write(f"  {stage:<10} {values['seconds']:>10.3f} s {memory}")
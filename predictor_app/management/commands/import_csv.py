@@ -0,0 +1,74 @@
+import argparse
+import os
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from predictor_app.importers import IMPORTERS, get_importer
+from predictor_app.parallel_import import RANGE_BYTES, iter_parsed_file
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Imports a CSV file from the server\'s disk with the same parsing, lookup creation and error '
+            'reporting as the upload form. Large files are parsed by a pool of worker processes, byte range '
+            'by byte range, and written in batches by this process.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument('--type', dest='model_type', required=True, choices=list(IMPORTERS),
+                            help='What the file contains, as in the upload form')
+        parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 4),
+                            help='Parser processes for files larger than one range (default: CPUs, at most 4). '
+                                 'Files with line breaks inside quoted values are parsed by one process.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Records per database write (default 1000, 50000 with --copy)')
+        parser.add_argument('--copy', action=argparse.BooleanOptionalAction, default=None,
+                            help='Write listings with PostgreSQL COPY (default: settings.CSV_IMPORT_USE_COPY)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Import inside a transaction and roll it back, reporting what would change')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f"No such file: {path}")
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        workers = options['workers'] if os.path.getsize(path) > RANGE_BYTES else 1
+        importer = get_importer(options['model_type'], use_copy=options['copy'])
+        self.stdout.write(self.style.NOTICE(
+            f"Importing {path} as {options['model_type']} ({type(importer).__name__}, "
+            f"{workers} parser process{'es' if workers > 1 else ''})..."))
+
+        started = time.perf_counter()
+        try:
+            # Otherwise every batch commits on its own, as in the upload form
+            with transaction.atomic() if options['dry_run'] else nullcontext():
+                result = importer.write_parsed(iter_parsed_file(path, options['model_type'], workers),
+                                               options['batch_size'])
+                if options['dry_run']:
+                    raise _Rollback
+        except _Rollback:
+            pass
+        except UnicodeDecodeError:
+            raise CommandError("Invalid file encoding. Please use UTF-8.")
+        seconds = time.perf_counter() - started
+
+        for message in result.errors[:10]:
+            self.stdout.write(self.style.WARNING(message))
+        if result.error_count > 10:
+            self.stdout.write(self.style.WARNING(f"... and {result.error_count - 10} more errors."))
+
+        verb = 'would be' if options['dry_run'] else 'were'
+        rate = result.rows / seconds if seconds > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.rows} rows in {seconds:.2f} s ({rate:,.0f} rows/s): {result.created} records {verb} created, "
+            f"{result.updated} updated, {result.skipped} unchanged, {result.error_count} errors."))
+        if options['dry_run']:
+            self.stdout.write(self.style.NOTICE("Dry run: the import was rolled back."))
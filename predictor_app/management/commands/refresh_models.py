@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from predictor_app.incremental import STATISTICS_SOURCES, refresh_model, check_drift, save_statistics
+
+
+class Command(BaseCommand):
+    help = ('Refreshes the prediction models from their incrementally maintained sufficient statistics, '
+            'without re-reading the listings (run train_models once first)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(STATISTICS_SOURCES) + ['all'], default='all')
+        parser.add_argument('--check-drift', action='store_true',
+                            help='Also fit exactly from the database and report how far the incremental model is')
+        parser.add_argument('--tolerance', type=float, default=1e-6,
+                            help='Largest acceptable prediction difference, relative to the mean target (default 1e-6)')
+        parser.add_argument('--resync', action='store_true',
+                            help='With --check-drift, replace drifted statistics with the exact ones before refreshing')
+
+    def handle(self, *args, **options):
+        names = sorted(STATISTICS_SOURCES) if options['model'] == 'all' else [options['model']]
+        for name in names:
+            if options['check_drift']:
+                self._check_drift(name, options['tolerance'], options['resync'])
+            try:
+                n_rows = refresh_model(name)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f"{name.capitalize()} model refreshed from statistics over {n_rows} rows."))
+
+    def _check_drift(self, name, tolerance, resync):
+        try:
+            report = check_drift(name)
+        except ValueError as e:
+            raise CommandError(str(e))
+        drifted = report['incremental_rows'] != report['exact_rows']
+        if report['max_abs_diff'] is not None:
+            relative = report['max_abs_diff'] / max(report['mean_abs_target'], 1e-12)
+            drifted = drifted or relative > tolerance
+            self.stdout.write(f"{name}: {report['incremental_rows']} incremental rows, {report['exact_rows']} rows "
+                              f"in the database, max prediction difference {report['max_abs_diff']:.6g} "
+                              f"({relative:.3g} of the mean target)")
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f"{name}: no drift."))
+        elif resync:
+            save_statistics(name, report['exact_statistics'])
+            self.stdout.write(self.style.WARNING(f"{name}: drift above tolerance; statistics resynced from the database."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{name}: drift above tolerance; rerun with --resync or train_models."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from predictor_app.ml_utils import MODEL_VERSIONS, model_registry, rebuild_land_price_table
+
+
+class Command(BaseCommand):
+    help = 'Lists the kept versions of a model or switches serving back to one of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(MODEL_VERSIONS))
+        parser.add_argument('--to', dest='version', help='Version to activate (default: the one before the active version)')
+        parser.add_argument('--list', action='store_true', help='Only list the kept versions')
+
+    def handle(self, *args, **options):
+        name = options['model']
+        store = MODEL_VERSIONS[name]
+
+        if options['list']:
+            active = store.active_version()
+            for version in store.versions():
+                metadata = store.metadata(version)
+                fingerprint = metadata.get('fingerprint') or {}
+                rows = fingerprint.get('rows', '-')
+                marker = '*' if version == active else ' '
+                self.stdout.write(f"{marker} {version}  {metadata.get('source', ''):<12} {rows!s:>8} rows  "
+                                  f"{metadata.get('created_at', '')}")
+            return
+
+        previous = store.active_version()
+        try:
+            version = store.rollback(options['version'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        model_registry.invalidate(name)
+        if name == 'land':
+            rebuild_land_price_table()  # The table is tied to the model version it was built from
+        self.stdout.write(self.style.SUCCESS(f"{name.capitalize()} model switched from version {previous} to {version}."))
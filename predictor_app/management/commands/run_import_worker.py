@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from predictor_app.import_queue import claim_next_job, process_job, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Processes CSV imports queued from the web UI (keep one running next to the web server)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the queued jobs, then exit')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds between queue checks when idle (default 5)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='CSV rows committed per transaction (default: one importer batch). Larger chunks '
+                                 'keep the model statistics locked, and listing saves waiting, until they commit')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='At startup, resume jobs still running without a heartbeat for this many seconds '
+                                 '(default 10 min; running jobs beat every minute)')
+
+    def handle(self, *args, **options):
+        stale = requeue_stale_jobs(options['stale_after'])
+        if stale:
+            self.stdout.write(self.style.WARNING(f"Queued {stale} interrupted import job(s) to resume."))
+
+        self.stdout.write(self.style.NOTICE("Waiting for import jobs..."))
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                self.stdout.write(f"Starting import job #{job.pk} ({job.model_type}, {job.file_name})...")
+                job = process_job(job, chunk_size=options['chunk_size'])
+                style = self.style.SUCCESS if job.status == job.SUCCEEDED else self.style.ERROR
+                self.stdout.write(style(
+                    f"Import job #{job.pk} {job.status}: {job.rows_done} rows, {job.created_count} created, "
+                    f"{job.updated_count} updated, {job.skipped_count} unchanged, {job.error_count} errors. "
+                    f"{job.error}".strip()))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Worker stopped; the current import job resumes on the next start."))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from predictor_app.training_queue import claim_next_run, fail_stale_runs, process_run
+
+
+class Command(BaseCommand):
+    help = 'Processes retrain requests queued from the web UI (keep one running next to the web server)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the queued runs, then exit')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds between queue checks when idle (default 5)')
+        parser.add_argument('--jobs', type=int, default=1, help='Worker processes per run, as in train_models --jobs')
+        parser.add_argument('--stale-after', type=int, default=6 * 3600,
+                            help='Mark runs still running after this many seconds as failed at startup (default 6 h)')
+
+    def handle(self, *args, **options):
+        stale = fail_stale_runs(options['stale_after'])
+        if stale:
+            self.stdout.write(self.style.WARNING(f"Marked {stale} stale training run(s) as failed."))
+
+        self.stdout.write(self.style.NOTICE("Waiting for training runs..."))
+        try:
+            while True:
+                run = claim_next_run()
+                if run is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                self.stdout.write(f"Starting training run #{run.pk} ({run.request_count} request(s))...")
+                run = process_run(run, n_jobs=options['jobs'])
+                style = self.style.SUCCESS if run.status == run.SUCCEEDED else self.style.ERROR
+                self.stdout.write(style(f"Training run #{run.pk} {run.status}. {run.error}".strip()))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Worker stopped."))
@@ -0,0 +1,136 @@
+"""
+Memory-mapped artifact format for serving.
+
+An artifact is a small JSON header plus one raw .npy file per numeric array. Workers open
+the arrays with np.load(mmap_mode='r'), so every process on the host shares the same
+physical pages and loading is a header parse plus an mmap() call, with no unpickling.
+
+Array files carry a content digest in their name and the header references them by
+name. The header is published last with an atomic rename, so a reader always sees a
+header together with the exact arrays it was written with.
+"""
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .compiled_model import CompiledLinearModel, FeatureVocabulary
+from .land_table import LandPriceTable
+from .model_registry import save_artifact
+
+FORMAT_VERSION = 1
+
+
+def _dump_json(header, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(header, f, indent=1)
+
+
+def _dump_npy(array, path):
+    with open(path, 'wb') as f:  # A file object keeps np.save from appending '.npy'
+        np.save(f, array, allow_pickle=False)
+
+
+def _array_filename(header_path, name, array):
+    stem = os.path.splitext(os.path.basename(header_path))[0]
+    digest = hashlib.sha1(np.ascontiguousarray(array).tobytes()).hexdigest()[:12]
+    return f"{stem}.{name}-{digest}.npy"
+
+
+def publish(header_path, header, arrays):
+    """Write `arrays` ({name: ndarray}) as .npy files, then atomically publish the JSON header."""
+    directory = os.path.dirname(header_path)
+    header = dict(header, format=FORMAT_VERSION, arrays={})
+    for name, array in arrays.items():
+        filename = _array_filename(header_path, name, array)
+        if not os.path.exists(os.path.join(directory, filename)):  # Same content, same file
+            save_artifact(np.ascontiguousarray(array), os.path.join(directory, filename), dump=_dump_npy)
+        header['arrays'][name] = filename
+    save_artifact(header, header_path, dump=_dump_json)
+    _remove_unreferenced_arrays(header_path, set(header['arrays'].values()))
+
+
+def _remove_unreferenced_arrays(header_path, keep):
+    stem = os.path.splitext(header_path)[0]
+    for path in glob.glob(f"{glob.escape(stem)}.*-*.npy"):
+        if os.path.basename(path) not in keep:
+            try:
+                os.remove(path)  # Processes that still map the old file keep their pages on POSIX
+            except OSError:
+                pass  # e.g. still mapped on Windows; it will be cleaned up by the next publish
+
+
+def point_to(pointer_path, header_path):
+    """
+    Atomically make `pointer_path` serve the artifact published at `header_path`: it becomes a copy
+    of that header whose array names are relative to the pointer's directory.
+    """
+    header = read_header(header_path)
+    source_dir = os.path.relpath(os.path.dirname(header_path), os.path.dirname(pointer_path))
+    header['arrays'] = {name: os.path.join(source_dir, filename).replace(os.sep, '/')
+                        for name, filename in header['arrays'].items()}
+    save_artifact(header, pointer_path, dump=_dump_json)
+    _remove_unreferenced_arrays(pointer_path, set())  # Arrays of the unversioned layout, if any
+
+
+def read_header(header_path):
+    with open(header_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read(header_path):
+    """Return (header, {name: read-only memory-mapped ndarray})."""
+    header = read_header(header_path)
+    if header.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {header.get('format')!r} in {header_path}")
+    directory = os.path.dirname(header_path)
+    arrays = {name: np.load(os.path.join(directory, filename), mmap_mode='r', allow_pickle=False)
+              for name, filename in header['arrays'].items()}
+    return header, arrays
+
+
+# --- Linear models ---
+def write_linear_model(header_path, compiled, vocabulary, metadata=None):
+    """`metadata` (JSON-able dict) is stored in the header as-is, e.g. the version and data fingerprint."""
+    header = {
+        'kind': 'linear_model',
+        'intercept': compiled.intercept,
+        'categorical': [[feature, list(index.keys()), list(index.values())] for feature, index in compiled.categorical],
+        'numeric': [[feature, column] for feature, column in compiled.numeric],
+        'vocabulary': {'categories': vocabulary.categories, 'convenience_ids': vocabulary.convenience_ids},
+        'metadata': metadata or {},
+    }
+    publish(header_path, header, {'coef': compiled.coef})
+
+
+def read_linear_model(header_path):
+    """
+    Load a linear model artifact in the same {'compiled', 'vocabulary'} shape as the joblib bundle,
+    plus the 'metadata' it was published with.
+    """
+    header, arrays = read(header_path)
+    categorical = [(feature, dict(zip(values, columns))) for feature, values, columns in header['categorical']]
+    numeric = [(feature, column) for feature, column in header['numeric']]
+    vocabulary = header['vocabulary']
+    return {
+        'compiled': CompiledLinearModel(header['intercept'], categorical, numeric, arrays['coef']),
+        'vocabulary': FeatureVocabulary(vocabulary['categories'], vocabulary['convenience_ids']),
+        'metadata': header.get('metadata', {}),
+    }
+
+
+# --- Land price table ---
+def write_land_table(header_path, table):
+    header = {
+        'kind': 'land_price_table',
+        'model_version': table.model_version,
+        'axis_ids': [ids.tolist() for ids in table.axis_ids],
+    }
+    publish(header_path, header, {'values': table.values})
+
+
+def read_land_table(header_path):
+    header, arrays = read(header_path)
+    return LandPriceTable(header['axis_ids'], arrays['values'], header['model_version'])
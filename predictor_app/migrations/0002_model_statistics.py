@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('columns', models.JSONField(help_text='Design-matrix column layout')),
+                ('gram', models.BinaryField(help_text='XᵀX as raw float64')),
+                ('moment', models.BinaryField(help_text='Xᵀy as raw float64')),
+                ('target_sq_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Model Statistics',
+                'verbose_name_plural': 'Model Statistics',
+            },
+        ),
+    ]
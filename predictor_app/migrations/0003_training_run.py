@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor_app', '0002_model_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('request_count', models.PositiveIntegerField(default=1, help_text='Retrain requests collapsed into this run')),
+                ('jobs_total', models.PositiveIntegerField(default=0)),
+                ('jobs_done', models.PositiveIntegerField(default=0)),
+                ('results', models.JSONField(blank=True, default=dict, help_text='Per-model status, duration and error')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('status',), name='unique_queued_training_run')],
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:14
+
+import hashlib
+import itertools
+import json
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# The fields ListingImporter sets from a CSV row, as of this migration
+LISTINGS = {
+    'rentalproperty': (('town', 'access_type'),
+                       ('property_type', 'num_rooms', 'price', 'apartment_type', 'house_type', 'has_house_basement')),
+    'landforsale': (('town', 'access_type', 'paper_type'),
+                    ('is_fenced', 'is_ready_to_build', 'area_sqm', 'price', 'price_per_sqm')),
+}
+
+
+# Frozen copy of predictor_app.content_hash as of this migration: later changes to the live hash
+# must not change what this backfill computed
+def _normalize(field, value):
+    value = field.to_python(value)
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        value = value.quantize(Decimal(1).scaleb(-field.decimal_places), rounding=ROUND_HALF_UP)
+    return str(value)
+
+
+def _content_hash(model, lookups, values, convenience_names=()):
+    payload = [
+        model._meta.model_name,
+        sorted(lookups.items()),
+        sorted((name, _normalize(model._meta.get_field(name), value)) for name, value in values.items()),
+        sorted(set(convenience_names)),
+    ]
+    return hashlib.blake2b(json.dumps(payload, separators=(',', ':')).encode(), digest_size=16).hexdigest()
+
+
+def _convenience_names(model, ids):
+    names = {}
+    through = model.conveniences.through
+    for rental_id, name in through.objects.filter(rentalproperty_id__in=ids).values_list(
+            'rentalproperty_id', 'convenience__name'):
+        names.setdefault(rental_id, []).append(name)
+    return names
+
+
+def hash_existing_listings(apps, schema_editor):
+    """Give saved listings the hash of their content, so importing their rows again does not duplicate them."""
+    for model_name, (lookup_fields, value_fields) in LISTINGS.items():
+        model = apps.get_model('predictor_app', model_name)
+        rows = (model.objects.order_by('id')
+                .values('id', *(f'{field}__name' for field in lookup_fields), *value_fields)
+                .iterator(chunk_size=BATCH_SIZE))
+        while batch := list(itertools.islice(rows, BATCH_SIZE)):
+            ids = [row['id'] for row in batch]
+            convenience_names = _convenience_names(model, ids) if model_name == 'rentalproperty' else {}
+            hashes = {}
+            for row in batch:
+                content_hash = _content_hash(
+                    model, {field: row[f'{field}__name'] for field in lookup_fields},
+                    {field: row[field] for field in value_fields}, convenience_names.get(row['id'], ()))
+                hashes.setdefault(content_hash, row['id'])
+            # Duplicates already in the table keep no hash; the oldest listing is the imported one.
+            # Batches go in ID order, so a hash given out by an earlier batch went to an older listing.
+            taken = set(model.objects.filter(content_hash__in=list(hashes)).values_list('content_hash', flat=True))
+            model.objects.bulk_update([model(id=pk, content_hash=content_hash) for content_hash, pk in hashes.items()
+                                       if content_hash not in taken], ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor_app', '0004_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='skipped_count',
+            field=models.PositiveIntegerField(default=0, help_text='Rows already imported unchanged'),
+        ),
+        migrations.AddField(
+            model_name='landforsale',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the CSV row the listing was imported from; re-importing that row updates this listing', max_length=32, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='rentalproperty',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the CSV row the listing was imported from; re-importing that row updates this listing', max_length=32, null=True, unique=True),
+        ),
+        migrations.RunPython(hash_existing_listings, migrations.RunPython.noop),
+    ]
@@ -5,79 +5,289 @@ from sklearn.preprocessing import OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_squared_error, r2_score
-import joblib
 import numpy as np
 from django.conf import settings
+import joblib
+import logging
 import os
 
-from .models import Convenience  # Needed for feature engineering
+from .models import Convenience, Town, PaperType, AccessType  # Needed for feature engineering
+from .model_registry import model_registry
+from .model_versions import ModelVersionStore
+from .model_shards import ModelShards, ShardCache
+from .compiled_model import CompiledLinearModel, FeatureVocabulary, MISSING_CATEGORY, CONVENIENCE_PREFIX
+from .featurizers import ConvenienceEncoder
+from .sufficient_stats import LinearFeatureSpec
+from .prediction_cache import PredictionCache
+from .land_table import LandPriceTable
+from . import mapped_artifacts
+
+logger = logging.getLogger(__name__)
 
 # Define paths for saved models
+# Each training run publishes a version under versions/<model>/ (see model_versions.py); serving reads the
+# memory-mapped .json header of the active version. The top-level .joblib files are only read by
+# deployments that have not trained since versioning was introduced.
 BASE_MODEL_DIR = os.path.join(settings.MEDIA_ROOT, 'trained_models')
 RENTAL_MODEL_PATH = os.path.join(BASE_MODEL_DIR, 'rental_model.joblib')
 LAND_MODEL_PATH = os.path.join(BASE_MODEL_DIR, 'land_price_per_sqm_model.joblib')
+RENTAL_MODEL_HEADER_PATH = os.path.join(BASE_MODEL_DIR, 'rental_model.json')
+LAND_MODEL_HEADER_PATH = os.path.join(BASE_MODEL_DIR, 'land_price_per_sqm_model.json')
+LAND_TABLE_HEADER_PATH = os.path.join(BASE_MODEL_DIR, 'land_price_per_sqm_table.json')
 
 # Ensure directories exist
 os.makedirs(BASE_MODEL_DIR, exist_ok=True)
 
+MODEL_VERSIONS = {
+    'rental': ModelVersionStore('rental', RENTAL_MODEL_HEADER_PATH, os.path.join(BASE_MODEL_DIR, 'versions', 'rental'),
+                                keep=getattr(settings, 'MODEL_VERSIONS_KEPT', 5)),
+    'land': ModelVersionStore('land', LAND_MODEL_HEADER_PATH, os.path.join(BASE_MODEL_DIR, 'versions', 'land'),
+                              keep=getattr(settings, 'MODEL_VERSIONS_KEPT', 5)),
+}
+
+# Per-town shards, trained and served only with MODEL_SHARDS_ENABLED (see model_shards.py)
+MODEL_SHARDS = {
+    name: ModelShards(name, os.path.join(BASE_MODEL_DIR, 'shards', name)) for name in ('rental', 'land')
+}
+shard_cache = ShardCache(max_entries=getattr(settings, 'MODEL_SHARD_CACHE_SIZE', 64))
+
+# Feature layout of each model; also used to keep their sufficient statistics up to date (see incremental.py)
+RENTAL_FEATURE_SPEC = LinearFeatureSpec(
+    categorical=['town_id', 'access_type_id', 'property_type', 'apartment_type', 'house_type'],
+    numeric=['num_rooms', 'has_house_basement'],
+    target='price',
+    multi_hot=('convenience_ids', CONVENIENCE_PREFIX),
+)
+LAND_FEATURE_SPEC = LinearFeatureSpec(
+    categorical=['town_id', 'paper_type_id', 'access_type_id'],
+    numeric=['is_fenced', 'is_ready_to_build'],
+    target='price_per_sqm',
+)
+
+
+def load_model_artifact(path):
+    """
+    Load a trained artifact as a dict with its 'compiled' coefficient table and the frozen 'vocabulary',
+    plus the sklearn 'pipeline' for models fitted by train_models --engine pandas. Older artifacts are
+    completed on load.
+    """
+    artifact = joblib.load(path)
+    if not isinstance(artifact, dict):
+        artifact = {'pipeline': artifact, 'compiled': CompiledLinearModel.from_pipeline(artifact)}
+    if 'vocabulary' not in artifact:
+        artifact['vocabulary'] = FeatureVocabulary.from_compiled(artifact['compiled'])
+    return artifact
+
+
+def _compile_and_check(model_pipeline, X):
+    compiled = CompiledLinearModel.from_pipeline(model_pipeline)
+    compiled.check_parity(model_pipeline, X)  # Never publish a table that disagrees with sklearn
+    return compiled
+
+
+def _freeze_vocabulary(model_pipeline, categorical_features, convenience_ids=()):
+    encoder = model_pipeline.named_steps['preprocessor'].named_transformers_['cat']
+    categories = {
+        feature: [v for v in values.tolist() if v != MISSING_CATEGORY]
+        for feature, values in zip(categorical_features, encoder.categories_)
+    }
+    return FeatureVocabulary(categories, convenience_ids)
 
-def train_rental_model(rental_data_list_of_dicts):
-    if not rental_data_list_of_dicts:
-        print("No data provided to train rental model.")
+
+def find_unseen_inputs(model_name, input_data_dict):
+    """
+    Return {feature: [values]} for inputs the trained model has no weight for (e.g. a town or
+    convenience added after the last training run). Empty when everything is known or no model exists.
+    """
+    try:
+        vocabulary = model_registry.get(model_name).model['vocabulary']
+    except Exception:
+        return {}
+    return vocabulary.unseen(input_data_dict)
+
+
+def find_unseen_inputs_many(model_name, input_data_dicts):
+    """find_unseen_inputs() for a batch: {row index: {feature: [values]}}, only for rows with unseen inputs."""
+    try:
+        vocabulary = model_registry.get(model_name).model['vocabulary']
+    except Exception:
+        return {}
+    return vocabulary.unseen_many(input_data_dicts)
+
+
+def _log_unseen(model_name, loaded_model, input_data_dict):
+    unseen = loaded_model.model['vocabulary'].unseen(input_data_dict)
+    if unseen:
+        logger.warning("%s model version %s has no weights for %s; they were ignored.",
+                       model_name.capitalize(), loaded_model.version, unseen)
+
+
+# Models are loaded once per process and hot-reloaded when train_models writes a new file.
+# Deployments that only have the older joblib artifacts fall back to unpickling them.
+model_registry.register('rental', RENTAL_MODEL_HEADER_PATH, loader=mapped_artifacts.read_linear_model,
+                        fallbacks=[(RENTAL_MODEL_PATH, load_model_artifact)])
+model_registry.register('land', LAND_MODEL_HEADER_PATH, loader=mapped_artifacts.read_linear_model,
+                        fallbacks=[(LAND_MODEL_PATH, load_model_artifact)])
+model_registry.register('land_table', LAND_TABLE_HEADER_PATH, loader=mapped_artifacts.read_land_table)
+
+
+# Popular towns/access types/room counts repeat a lot; cache single-row predictions per model.
+# Set PREDICTION_CACHE_MAXSIZE = 0 to disable.
+PREDICTION_CACHES = {
+    name: PredictionCache(maxsize=getattr(settings, 'PREDICTION_CACHE_MAXSIZE', 4096),
+                          ttl=getattr(settings, 'PREDICTION_CACHE_TTL', 300))
+    for name in ('rental', 'land')
+}
+
+
+def _cache_key(loaded_model, features):
+    # Canonical form of a feature dict: sorted items (so convenience order doesn't matter),
+    # missing categories collapsed to the training placeholder, tagged with the model version.
+    items = tuple(sorted((k, MISSING_CATEGORY if v is None else v) for k, v in features.items()))
+    return loaded_model.version, items
+
+
+def _predict_one_cached(model_name, loaded_model, features):
+    compiled = loaded_model.model['compiled']
+    cache = PREDICTION_CACHES[model_name]
+    if not cache.enabled:
+        return compiled.predict_one(features)
+    cache.bind_version(loaded_model.version)  # A retrained model drops every cached result
+    key = _cache_key(loaded_model, features)
+    hit, prediction = cache.get(key)
+    if not hit:
+        prediction = compiled.predict_one(features)
+        cache.set(key, prediction)
+    return prediction
+
+
+def prediction_cache_stats():
+    return {name: cache.stats() for name, cache in PREDICTION_CACHES.items()}
+
+
+def _shard_for(model_name, features):
+    """The town shard that should answer for `features`, or None when the global model should."""
+    if not getattr(settings, 'MODEL_SHARDS_ENABLED', False) or features.get('town_id') is None:
+        return None
+    try:
+        shard = shard_cache.get(MODEL_SHARDS[model_name], features['town_id'])
+    except Exception:
+        logger.exception("Loading the %s shard of town %s failed; using the global model",
+                         model_name, features['town_id'])
+        return None
+    # A shard only answers inputs it has weights for; a category it never saw goes to the global model
+    if shard is None or shard.model['vocabulary'].unseen(features):
         return None
+    return shard
+
 
+def _assign_shards(model_name, feature_rows):
+    """Split row indexes by the model that answers them: [(shard or None for the global model, [indexes])]."""
+    if not getattr(settings, 'MODEL_SHARDS_ENABLED', False):
+        return [(None, list(range(len(feature_rows))))]
+    groups = {}
+    for i, features in enumerate(feature_rows):
+        shard = _shard_for(model_name, features)
+        groups.setdefault(shard.name if shard else None, (shard, []))[1].append(i)
+    return list(groups.values())
+
+
+def _with_version(result, loaded_model, return_version):
+    if not return_version:
+        return result
+    return result, loaded_model.version if loaded_model is not None else None
+
+
+def rental_design_matrix(rental_data_list_of_dicts):
+    """
+    Featurize rental training rows. Returns (X, y, convenience_ids), or None when there is nothing
+    to train on. `convenience_ids` are all conveniences in the database, frozen into the vocabulary.
+    """
     df = pd.DataFrame(rental_data_list_of_dicts)
 
     # Define feature columns
-    categorical_features = ['town_id', 'access_type_id', 'property_type', 'apartment_type', 'house_type']
+    categorical_features = RENTAL_FEATURE_SPEC.categorical
     numerical_direct_features = ['num_rooms']  # Features that are already numeric
     boolean_direct_features = ['has_house_basement']  # Booleans that become 0/1
 
-    # One-hot encode convenience_ids:
+    # Multi-hot encode convenience_ids:
     # Get all possible convenience IDs from the database to ensure consistent columns
+    # The list is frozen into the artifact's vocabulary, so serving never queries it.
     all_db_convenience_ids = sorted(list(Convenience.objects.values_list('id', flat=True)))
-    convenience_feature_cols = [f'convenience_{cid}' for cid in all_db_convenience_ids]
+    convenience_encoder = ConvenienceEncoder(all_db_convenience_ids)
 
-    # Create convenience columns in the DataFrame
-    for cid in all_db_convenience_ids:
-        df[f'convenience_{cid}'] = df['convenience_ids'].apply(lambda x: 1 if isinstance(x, list) and cid in x else 0)
+    # Create all convenience columns in one vectorized pass (sparse columns when there are many)
+    df = df.join(convenience_encoder.to_frame(df['convenience_ids'], index=df.index))
 
     # Combine all features
-    # Note: convenience_feature_cols are already 0/1, so they can be treated as numerical or passthrough.
+    # Note: convenience columns are already 0/1, so they can be treated as numerical or passthrough.
     # We'll pass them through as numerical.
-    all_numerical_features = numerical_direct_features + boolean_direct_features + convenience_feature_cols
+    all_numerical_features = rental_numerical_features(all_db_convenience_ids)
 
     # Fill NaN values
     for col in categorical_features:
         df[col] = df[col].fillna('None_CAT')  # Use a distinct string for missing categorical FKs
-    for col in all_numerical_features:
-        df[col] = df[col].fillna(0).astype(int)  # Ensure 0/1 for booleans and conveniences
+    for col in numerical_direct_features + boolean_direct_features:
+        df[col] = df[col].fillna(0).astype(int)  # Ensure 0/1 for booleans; conveniences are already 0/1
 
     X = df[categorical_features + all_numerical_features]
     y = df['price'].astype(float)
 
     if X.empty or y.empty:
-        print("Not enough data after processing for rental model training.")
         return None
+    return X, y, all_db_convenience_ids
+
 
+def rental_numerical_features(convenience_ids):
+    return ['num_rooms', 'has_house_basement'] + ConvenienceEncoder(convenience_ids).feature_names
+
+
+def rental_pipeline(convenience_ids):
+    """The unfitted rental pipeline for a design matrix built by rental_design_matrix()."""
     preprocessor = ColumnTransformer(
         transformers=[
-            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False, drop=None), categorical_features),
+            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False, drop=None),
+             RENTAL_FEATURE_SPEC.categorical),
             # drop=None to see all columns
-            ('num', 'passthrough', all_numerical_features)
+            ('num', 'passthrough', rental_numerical_features(convenience_ids))
         ],
         remainder='drop'  # Explicitly drop any other columns
     )
 
-    model_pipeline = Pipeline(steps=[
+    return Pipeline(steps=[
         ('preprocessor', preprocessor),
         ('regressor', LinearRegression())
     ])
 
+
+def publish_model(store, model_pipeline, X, categorical_features, convenience_ids=(), fingerprint=None):
+    """Compile a fitted pipeline, check it against sklearn and publish it as a new version of `store`."""
+    compiled = _compile_and_check(model_pipeline, X)
+    vocabulary = _freeze_vocabulary(model_pipeline, categorical_features, convenience_ids)
+    return store.publish(compiled, vocabulary, fingerprint=fingerprint,
+                         bundle={'pipeline': model_pipeline, 'compiled': compiled, 'vocabulary': vocabulary})
+
+
+def train_rental_model(rental_data_list_of_dicts, fingerprint=None):
+    if not rental_data_list_of_dicts:
+        print("No data provided to train rental model.")
+        return None
+
+    design = rental_design_matrix(rental_data_list_of_dicts)
+    if design is None:
+        print("Not enough data after processing for rental model training.")
+        return None
+    X, y, all_db_convenience_ids = design
+
+    model_pipeline = rental_pipeline(all_db_convenience_ids)
+
     try:
         model_pipeline.fit(X, y)
-        joblib.dump(model_pipeline, RENTAL_MODEL_PATH)
-        print(f"Rental model trained and saved to {RENTAL_MODEL_PATH}")
+        store = MODEL_VERSIONS['rental']
+        version = publish_model(store, model_pipeline, X, RENTAL_FEATURE_SPEC.categorical, all_db_convenience_ids,
+                                fingerprint=fingerprint)
+        model_registry.invalidate('rental')
+        print(f"Rental model version {version} trained and saved to {store.version_dir(version)}")
         # print("Features after preprocessing:", model_pipeline.named_steps['preprocessor'].get_feature_names_out()) # For debugging
     except Exception as e:
         print(f"Error during rental model training or saving: {e}")
@@ -85,82 +295,105 @@ def train_rental_model(rental_data_list_of_dicts):
     return model_pipeline
 
 
-def predict_rental_price(input_data_dict):
+RENTAL_BASE_FEATURES = ['town_id', 'access_type_id', 'property_type', 'apartment_type', 'house_type',
+                        'num_rooms', 'has_house_basement']
+
+
+def _rental_base_features(input_data_dict):
+    # Same encoding as training: missing categoricals become 'None_CAT' (handled by the compiled model),
+    # missing numericals become 0.
+    return {
+        'town_id': input_data_dict.get('town_id'),
+        'access_type_id': input_data_dict.get('access_type_id'),
+        'property_type': input_data_dict.get('property_type'),
+        'apartment_type': input_data_dict.get('apartment_type', MISSING_CATEGORY),
+        'house_type': input_data_dict.get('house_type', MISSING_CATEGORY),
+        'num_rooms': input_data_dict.get('num_rooms') or 0,
+        'has_house_basement': int(bool(input_data_dict.get('has_house_basement', False))),
+    }
+
+
+def _rental_features(input_data_dict, vocabulary):
+    # Each selected convenience known to the model switches on its column, through the training encoder
+    features = _rental_base_features(input_data_dict)
+    features.update(vocabulary.conveniences.encode_one(input_data_dict.get('convenience_ids')))
+    return features
+
+
+def _rental_columns(input_data_dicts, vocabulary):
+    # Column-oriented features for a batch; conveniences are encoded for all rows at once
+    rows = [_rental_base_features(d) for d in input_data_dicts]
+    columns = {feature: [row[feature] for row in rows] for feature in RENTAL_BASE_FEATURES}
+    encoder = vocabulary.conveniences
+    matrix = encoder.transform([d.get('convenience_ids') for d in input_data_dicts], sparse_output=False)
+    columns.update(zip(encoder.feature_names, matrix.T))
+    return columns
+
+
+def predict_rental_price(input_data_dict, return_version=False):
+    # With return_version=True the result is a (prediction, model_version) tuple
+    shard = _shard_for('rental', input_data_dict)
+    if shard is not None:
+        features = _rental_features(input_data_dict, shard.model['vocabulary'])
+        try:
+            return _with_version(shard.model['compiled'].predict_one(features), shard, return_version)
+        except Exception as e:
+            return _with_version(f"Error during prediction: {e}", shard, return_version)
+
     try:
-        model_pipeline = joblib.load(RENTAL_MODEL_PATH)
+        loaded_model = model_registry.get('rental')
     except FileNotFoundError:
-        return "Rental model not trained yet. Please run the training script."
+        return _with_version("Rental model not trained yet. Please run the training script.", None, return_version)
     except Exception as e:
-        return f"Error loading rental model: {e}"
-
-    # Prepare input DataFrame matching the training structure
-    all_db_convenience_ids = sorted(list(Convenience.objects.values_list('id', flat=True)))
+        return _with_version(f"Error loading rental model: {e}", None, return_version)
 
-    # Start with a copy of the input to avoid modifying the original dict
-    df_row = {}
-    df_row['town_id'] = input_data_dict.get('town_id')
-    df_row['access_type_id'] = input_data_dict.get('access_type_id')
-    df_row['property_type'] = input_data_dict.get('property_type')
-    df_row['apartment_type'] = input_data_dict.get('apartment_type', 'None_CAT')  # Default if not present
-    df_row['house_type'] = input_data_dict.get('house_type', 'None_CAT')  # Default if not present
-    df_row['num_rooms'] = input_data_dict.get('num_rooms', 0)
-    df_row['has_house_basement'] = int(input_data_dict.get('has_house_basement', False))
-
-    # One-hot encode conveniences
-    selected_convenience_ids = input_data_dict.get('convenience_ids', [])
-    for cid in all_db_convenience_ids:
-        df_row[f'convenience_{cid}'] = 1 if cid in selected_convenience_ids else 0
-
-    df_input = pd.DataFrame([df_row])
-
-    # Ensure all categorical features are present and handle None/NaN for them before prediction
-    categorical_features_expected = ['town_id', 'access_type_id', 'property_type', 'apartment_type', 'house_type']
-    for col in categorical_features_expected:
-        if col not in df_input.columns or pd.isna(df_input[col].iloc[0]):
-            df_input[col] = 'None_CAT'  # Must match fillna during training
-
-    # Ensure all numerical features are present and handle None/NaN for them
-    numerical_direct_features = ['num_rooms']
-    boolean_direct_features = ['has_house_basement']
-    convenience_feature_cols = [f'convenience_{cid}' for cid in all_db_convenience_ids]
-    all_numerical_features_expected = numerical_direct_features + boolean_direct_features + convenience_feature_cols
-
-    for col in all_numerical_features_expected:
-        if col not in df_input.columns or pd.isna(df_input[col].iloc[0]):
-            df_input[col] = 0  # Default for missing numerical/boolean/convenience features
-        else:  # Ensure it's int if it's a boolean/convenience feature
-            if col in boolean_direct_features or col in convenience_feature_cols:
-                df_input[col] = int(df_input[col].iloc[0])
-
-    # Ensure feature order matches training
-    ordered_feature_list = categorical_features_expected + all_numerical_features_expected
+    _log_unseen('rental', loaded_model, input_data_dict)
+    features = _rental_features(input_data_dict, loaded_model.model['vocabulary'])
     try:
-        df_input = df_input[ordered_feature_list]
-    except KeyError as e:
-        return f"Prediction error: Missing expected feature column: {e}. Check model training and prediction input consistency."
+        return _with_version(_predict_one_cached('rental', loaded_model, features), loaded_model, return_version)
+    except Exception as e:
+        return _with_version(f"Error during prediction: {e}", loaded_model, return_version)
+
+
+def predict_rental_prices(input_data_dicts, return_version=False):
+    """
+    Batch variant of predict_rental_price: featurize every row, then score them in one matrix product
+    per model (the global one, plus each town shard that answers some of the rows).
+    """
+    groups = _assign_shards('rental', input_data_dicts)
+    loaded_model = None
+    if any(shard is None for shard, _ in groups):
+        try:
+            loaded_model = model_registry.get('rental')
+        except FileNotFoundError:
+            return _with_version("Rental model not trained yet. Please run the training script.", None, return_version)
+        except Exception as e:
+            return _with_version(f"Error loading rental model: {e}", None, return_version)
+    version_model = loaded_model or groups[0][0]  # With shards, the version reported is the global model's
 
     try:
-        prediction = model_pipeline.predict(df_input)
-        return prediction[0]
+        if len(groups) == 1:
+            model = groups[0][0] or loaded_model
+            columns = _rental_columns(input_data_dicts, model.model['vocabulary'])
+            predictions = model.model['compiled'].predict_columns(columns, len(input_data_dicts))
+            return _with_version(predictions.tolist(), version_model, return_version)
+        predictions = np.empty(len(input_data_dicts))
+        for shard, indexes in groups:
+            model = shard or loaded_model
+            rows = [input_data_dicts[i] for i in indexes]
+            columns = _rental_columns(rows, model.model['vocabulary'])
+            predictions[indexes] = model.model['compiled'].predict_columns(columns, len(rows))
+        return _with_version(predictions.tolist(), version_model, return_version)
     except Exception as e:
-        # Try to get more info from the preprocessor if it fails there
-        # try:
-        #     transformed_features = model_pipeline.named_steps['preprocessor'].transform(df_input)
-        #     print("Transformed features for prediction:", transformed_features)
-        # except Exception as pe:
-        #     print("Error during preprocessor transform in prediction:", pe)
-        return f"Error during prediction: {e}"
+        return _with_version(f"Error during prediction: {e}", version_model, return_version)
 
 
-def train_land_model(land_data_list_of_dicts):  # For Option C: Price Per SqM
-    if not land_data_list_of_dicts:
-        print("No data provided to train land model.")
-        return None
-
+def land_design_matrix(land_data_list_of_dicts):
+    """Featurize land training rows. Returns (X, y), or None when there is nothing to train on."""
     df = pd.DataFrame(land_data_list_of_dicts)
 
-    categorical_features = ['town_id', 'paper_type_id', 'access_type_id']
-    boolean_features = ['is_fenced', 'is_ready_to_build']  # Will be 0/1
+    categorical_features = LAND_FEATURE_SPEC.categorical
+    boolean_features = LAND_FEATURE_SPEC.numeric  # Will be 0/1
 
     for col in categorical_features:
         df[col] = df[col].fillna('None_CAT')
@@ -171,68 +404,143 @@ def train_land_model(land_data_list_of_dicts):  # For Option C: Price Per SqM
     y = df['price_per_sqm'].astype(float)  # Target variable
 
     if X.empty or y.empty:
-        print("Not enough data after processing for land model training.")
         return None
+    return X, y
+
 
+def land_pipeline():
     preprocessor = ColumnTransformer(
         transformers=[
-            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_features),
-            ('bool', 'passthrough', boolean_features)
+            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), LAND_FEATURE_SPEC.categorical),
+            ('bool', 'passthrough', LAND_FEATURE_SPEC.numeric)
         ],
         remainder='drop'
     )
 
-    model_pipeline = Pipeline(steps=[
+    return Pipeline(steps=[
         ('preprocessor', preprocessor),
         ('regressor', LinearRegression())
     ])
+
+
+def train_land_model(land_data_list_of_dicts, fingerprint=None):  # For Option C: Price Per SqM
+    if not land_data_list_of_dicts:
+        print("No data provided to train land model.")
+        return None
+
+    design = land_design_matrix(land_data_list_of_dicts)
+    if design is None:
+        print("Not enough data after processing for land model training.")
+        return None
+    X, y = design
+
+    model_pipeline = land_pipeline()
     try:
         model_pipeline.fit(X, y)
-        joblib.dump(model_pipeline, LAND_MODEL_PATH)
-        print(f"Land (price per sqm) model trained and saved to {LAND_MODEL_PATH}")
+        store = MODEL_VERSIONS['land']
+        version = publish_model(store, model_pipeline, X, LAND_FEATURE_SPEC.categorical, fingerprint=fingerprint)
+        model_registry.invalidate('land')
+        print(f"Land (price per sqm) model version {version} trained and saved to {store.version_dir(version)}")
+        table = rebuild_land_price_table()
+        print(f"Land price table with {table.values.size} predictions saved to {LAND_TABLE_HEADER_PATH}")
     except Exception as e:
         print(f"Error during land model training or saving: {e}")
         return None
     return model_pipeline
 
 
-def predict_land_price_per_sqm(input_data_dict):  # For Option C
+def rebuild_land_price_table():
+    """
+    Materialize every land prediction for the current towns, paper types and access types.
+    Called after training and whenever one of those lookup tables gains or loses a row.
+    Returns None if no land model has been trained yet.
+    """
     try:
-        model_pipeline = joblib.load(LAND_MODEL_PATH)
+        loaded_model = model_registry.get('land')
     except FileNotFoundError:
-        return "Land model not trained yet. Please run the training script."
-    except Exception as e:
-        return f"Error loading land model: {e}"
+        return None
+    table = LandPriceTable.build(
+        loaded_model.model['compiled'],
+        Town.objects.values_list('id', flat=True),
+        PaperType.objects.values_list('id', flat=True),
+        AccessType.objects.values_list('id', flat=True),
+        model_version=loaded_model.version,
+    )
+    mapped_artifacts.write_land_table(LAND_TABLE_HEADER_PATH, table)
+    model_registry.invalidate('land_table')
+    return table
 
-    df_row = {
+
+def _land_price_table(loaded_model):
+    try:
+        table = model_registry.get('land_table').model
+    except FileNotFoundError:
+        return None
+    # A table computed from another model version is stale; the compiled model answers instead
+    return table if table.model_version == loaded_model.version else None
+
+
+def predict_land_price_per_sqm(input_data_dict, return_version=False):  # For Option C
+    features = {
         'town_id': input_data_dict.get('town_id'),
         'paper_type_id': input_data_dict.get('paper_type_id'),
         'access_type_id': input_data_dict.get('access_type_id'),
-        'is_fenced': int(input_data_dict.get('is_fenced', False)),
-        'is_ready_to_build': int(input_data_dict.get('is_ready_to_build', False)),
+        'is_fenced': int(bool(input_data_dict.get('is_fenced', False))),
+        'is_ready_to_build': int(bool(input_data_dict.get('is_ready_to_build', False))),
     }
-    df_input = pd.DataFrame([df_row])
+    shard = _shard_for('land', features)
+    if shard is not None:
+        try:
+            return _with_version(shard.model['compiled'].predict_one(features), shard, return_version)
+        except Exception as e:
+            return _with_version(f"Error during land prediction: {e}", shard, return_version)
 
-    categorical_features_expected = ['town_id', 'paper_type_id', 'access_type_id']
-    boolean_features_expected = ['is_fenced', 'is_ready_to_build']
-
-    for col in categorical_features_expected:
-        if col not in df_input.columns or pd.isna(df_input[col].iloc[0]):
-            df_input[col] = 'None_CAT'
-    for col in boolean_features_expected:
-        if col not in df_input.columns or pd.isna(df_input[col].iloc[0]):
-            df_input[col] = 0
-        else:
-            df_input[col] = int(df_input[col].iloc[0])
+    try:
+        loaded_model = model_registry.get('land')
+    except FileNotFoundError:
+        return _with_version("Land model not trained yet. Please run the training script.", None, return_version)
+    except Exception as e:
+        return _with_version(f"Error loading land model: {e}", None, return_version)
 
-    ordered_feature_list = categorical_features_expected + boolean_features_expected
+    _log_unseen('land', loaded_model, features)
     try:
-        df_input = df_input[ordered_feature_list]
-    except KeyError as e:
-        return f"Prediction error: Missing expected feature column for land model: {e}."
+        table = _land_price_table(loaded_model)
+        prediction = table.lookup(features) if table is not None else None
+        if prediction is None:  # No table yet, or an ID created after the table was built
+            prediction = _predict_one_cached('land', loaded_model, features)
+        return _with_version(prediction, loaded_model, return_version)
+    except Exception as e:
+        return _with_version(f"Error during land prediction: {e}", loaded_model, return_version)
+
+
+def predict_land_prices_per_sqm(input_columns, n_rows, return_version=False):
+    """
+    Vectorized land scoring. `input_columns` maps each land feature to a sequence of n_rows values
+    (None for a missing category); each model's block of rows is scored with one matrix product.
+    """
+    rows = [{feature: input_columns[feature][i] for feature in LAND_FEATURE_SPEC.categorical if feature in input_columns}
+            for i in range(n_rows)] if getattr(settings, 'MODEL_SHARDS_ENABLED', False) else [None] * n_rows
+    groups = _assign_shards('land', rows)
+    loaded_model = None
+    if any(shard is None for shard, _ in groups):
+        try:
+            loaded_model = model_registry.get('land')
+        except FileNotFoundError:
+            return _with_version("Land model not trained yet. Please run the training script.", None, return_version)
+        except Exception as e:
+            return _with_version(f"Error loading land model: {e}", None, return_version)
+    version_model = loaded_model or groups[0][0]  # With shards, the version reported is the global model's
 
     try:
-        prediction = model_pipeline.predict(df_input)
-        return prediction[0]
+        if len(groups) == 1:
+            model = groups[0][0] or loaded_model
+            return _with_version(model.model['compiled'].predict_columns(input_columns, n_rows), version_model,
+                                 return_version)
+        predictions = np.empty(n_rows)
+        for shard, indexes in groups:
+            model = shard or loaded_model
+            columns = {feature: [values[i] for i in indexes] for feature, values in input_columns.items()}
+            predictions[indexes] = model.model['compiled'].predict_columns(columns, len(indexes))
+        return _with_version(predictions, version_model, return_version)
     except Exception as e:
-        return f"Error during land prediction: {e}"
\ No newline at end of file
+        return _with_version(f"Error during land prediction: {e}", version_model, return_version)
@@ -0,0 +1,149 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel:
+    """A trained artifact held in memory, tagged with the version it was loaded from."""
+
+    def __init__(self, name, model, version, signature):
+        self.name = name
+        self.model = model
+        self.version = version
+        self.signature = signature  # (mtime_ns, size) of the file the model was read from; only detects changes
+
+    def __repr__(self):
+        return f"<LoadedModel {self.name} v{self.version}>"
+
+
+def artifact_signature(path):
+    """Cheap identity of an artifact on disk: a single stat() call, no file reads."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def version_from_signature(signature):
+    mtime_ns, _ = signature
+    return datetime.fromtimestamp(mtime_ns / 1e9).strftime('%Y%m%d%H%M%S%f')
+
+
+def artifact_version(model, signature):
+    """
+    The version an artifact was published as (see ModelVersionStore), the name rollback_model
+    lists and accepts. Artifacts written before versions existed fall back to their mtime.
+    """
+    metadata = model.get('metadata') if isinstance(model, dict) else None
+    return (metadata or {}).get('version') or version_from_signature(signature)
+
+
+def save_artifact(obj, path, dump=joblib.dump):
+    """
+    Dump an artifact next to its final location and rename it into place.
+    os.replace() is atomic, so a serving process never sees a half-written file.
+    `dump(obj, path)` writes the file; joblib by default.
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    os.close(fd)
+    try:
+        dump(obj, tmp_path)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600 files; serving workers may run as another user
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of trained models.
+
+    Each model is loaded once and kept in memory. On access, the artifact's
+    mtime/size is re-checked at most every `check_interval` seconds; when
+    train_models publishes a new file the model is reloaded and swapped in with
+    a single reference assignment, so concurrent requests see either the old or
+    the new model, never a mix.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._sources = {}
+        self._entries = {}
+        self._last_checked = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path, loader=joblib.load, fallbacks=()):
+        """
+        Register `name` to be loaded from `path` with `loader`. `fallbacks` is a sequence of
+        (path, loader) pairs tried in order when the primary file does not exist (older formats).
+        """
+        self._sources[name] = [(path, loader)] + list(fallbacks)
+
+    def path_for(self, name):
+        return self._sources[name][0][0]
+
+    def _resolve(self, name):
+        for path, loader in self._sources[name]:
+            try:
+                return path, loader, artifact_signature(path)
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(f"No artifact found for model '{name}'.")
+
+    def get(self, name):
+        """
+        Return the LoadedModel for `name`, loading or hot-reloading it if needed.
+        Raises FileNotFoundError if the model has never been trained.
+        """
+        entry = self._entries.get(name)
+        now = time.monotonic()
+        if entry is not None and now - self._last_checked.get(name, 0) < self.check_interval:
+            return entry
+
+        path, loader, signature = self._resolve(name)  # FileNotFoundError propagates to the caller
+        self._last_checked[name] = now
+        if entry is not None and entry.signature == signature:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.signature == signature:
+                return entry  # Another thread reloaded it while we waited
+            return self._load(name, path, loader, signature, previous=entry)
+
+    def _load(self, name, path, loader, signature, previous=None):
+        started = time.perf_counter()
+        try:
+            model = loader(path)
+        except Exception:
+            if previous is None:
+                raise
+            # Keep serving the model we already have rather than failing every request
+            logger.exception("Reloading model '%s' from %s failed; keeping version %s",
+                             name, path, previous.version)
+            return previous
+        entry = LoadedModel(name, model, artifact_version(model, signature), signature)
+        self._entries[name] = entry
+        logger.info("Loaded model '%s' version %s in %.1f ms", name, entry.version,
+                    (time.perf_counter() - started) * 1000)
+        return entry
+
+    def invalidate(self, name=None):
+        """Force the next get() to re-check the artifact on disk (all models if name is None)."""
+        names = [name] if name else list(self._last_checked)
+        for n in names:
+            self._last_checked.pop(n, None)
+
+    def loaded_versions(self):
+        return {name: entry.version for name, entry in self._entries.items()}
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,115 @@
+"""
+Per-town model shards.
+
+With settings.MODEL_SHARDS_ENABLED, train_models also fits one model per town that has at
+least MODEL_SHARD_MIN_ROWS training rows, next to the global model. Each shard is its own
+ModelVersionStore (shards/<model>/town-<id>.json pointing into shards/<model>/versions/),
+so it carries the fingerprint of its town's rows and is only refitted when they change.
+
+Serving asks the shard of the input's town first and falls back to the global model when the
+town has no shard or the shard never saw one of the input's categories. Shards are loaded
+on first use and kept in a bounded LRU (ShardCache), so memory does not grow with the number
+of towns.
+"""
+import glob
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from . import mapped_artifacts
+from .model_registry import LoadedModel, artifact_signature, artifact_version
+from .model_versions import ModelVersionStore
+
+logger = logging.getLogger(__name__)
+
+SHARD_FILE_RE = re.compile(r'^town-(\d+)\.json$')
+
+
+class ModelShards:
+    """The per-town shards of one model."""
+
+    def __init__(self, name, root, keep=2):
+        self.name = name
+        self.root = root
+        self.keep = keep  # Versions kept per shard
+
+    def pointer_path(self, town_id):
+        return os.path.join(self.root, f'town-{town_id}.json')
+
+    def store(self, town_id):
+        return ModelVersionStore(f'{self.name}/town-{town_id}', self.pointer_path(town_id),
+                                 os.path.join(self.root, 'versions', f'town-{town_id}'), keep=self.keep)
+
+    def town_ids(self):
+        """Towns that currently have an active shard."""
+        paths = glob.glob(os.path.join(glob.escape(self.root), 'town-*.json'))
+        matches = (SHARD_FILE_RE.match(os.path.basename(path)) for path in paths)
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    def retire(self, town_id):
+        """Remove a town's shard; its listings are served by the global model again."""
+        try:
+            os.remove(self.pointer_path(town_id))
+        except FileNotFoundError:
+            return
+        shutil.rmtree(os.path.join(self.root, 'versions', f'town-{town_id}'), ignore_errors=True)
+        logger.info("Retired shard %s/town-%s", self.name, town_id)
+
+
+class ShardCache:
+    """
+    Bounded LRU of loaded shards, keyed by (model, town). Like ModelRegistry, an entry's file is
+    re-checked at most every `check_interval` seconds and reloaded when a new version is published.
+    """
+
+    def __init__(self, max_entries=64, check_interval=1.0):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._entries = OrderedDict()  # (model, town_id) -> (LoadedModel or None, last checked)
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, shards, town_id):
+        """The LoadedModel of the town's shard, or None if the town has no shard."""
+        key = (shards.name, town_id)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                if now - cached[1] < self.check_interval:
+                    return cached[0]
+
+        path = shards.pointer_path(town_id)
+        try:
+            signature = artifact_signature(path)
+        except FileNotFoundError:
+            entry = None  # Remembered too, so towns without a shard cost one stat() per interval
+        else:
+            entry = cached[0] if cached is not None else None
+            if entry is None or entry.signature != signature:
+                model = mapped_artifacts.read_linear_model(path)
+                entry = LoadedModel(f'{shards.name}/town-{town_id}', model, artifact_version(model, signature),
+                                    signature)
+                self.loads += 1
+
+        with self._lock:
+            self._entries[key] = (entry, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'size': len(self._entries), 'max_entries': self.max_entries,
+                'loads': self.loads, 'evictions': self.evictions}
@@ -0,0 +1,100 @@
+"""
+Versioned model artifacts.
+
+Every training run publishes into its own directory, versions/<model>/<version>/, holding the
+joblib bundle and the memory-mapped header and arrays. Nothing in a version directory is
+modified after it is written. The live header that serving reads (e.g. rental_model.json) is a
+pointer: a copy of the active version's header, switched with an atomic rename, so activating
+a new version or rolling back to an older one is a single os.replace().
+
+Each version records a fingerprint of the data it was trained on, which lets train_models
+skip a refit when the data has not changed since the active version.
+"""
+import logging
+import os
+import shutil
+from datetime import datetime
+
+from . import mapped_artifacts
+from .model_registry import save_artifact
+
+logger = logging.getLogger(__name__)
+
+HEADER_NAME = 'model.json'
+BUNDLE_NAME = 'model.joblib'
+
+
+class ModelVersionStore:
+    def __init__(self, name, pointer_path, root, keep=5):
+        self.name = name
+        self.pointer_path = pointer_path
+        self.root = root
+        self.keep = keep  # Versions kept for rollback, the active one included
+
+    def version_dir(self, version):
+        return os.path.join(self.root, version)
+
+    def header_path(self, version):
+        return os.path.join(self.version_dir(version), HEADER_NAME)
+
+    def bundle_path(self, version=None):
+        """Path of the joblib bundle (with the sklearn pipeline) of `version`, by default the active one."""
+        version = version or self.active_version()
+        return os.path.join(self.version_dir(version), BUNDLE_NAME) if version else None
+
+    def versions(self):
+        """Published versions, oldest first. Version names sort chronologically."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(v for v in os.listdir(self.root) if os.path.exists(self.header_path(v)))
+
+    def metadata(self, version=None):
+        """The metadata stored with `version` (the active one by default), or {} if there is none."""
+        path = self.header_path(version) if version else self.pointer_path
+        try:
+            return mapped_artifacts.read_header(path).get('metadata', {})
+        except FileNotFoundError:
+            return {}
+
+    def active_version(self):
+        return self.metadata().get('version')
+
+    def active_fingerprint(self):
+        return self.metadata().get('fingerprint')
+
+    def publish(self, compiled, vocabulary, bundle=None, fingerprint=None, source='train'):
+        """Write a new version, make it active and prune old versions. Returns the version name."""
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        os.makedirs(self.version_dir(version))
+        if bundle is not None:
+            save_artifact(bundle, self.bundle_path(version))
+        metadata = {'version': version, 'source': source, 'fingerprint': fingerprint,
+                    'created_at': datetime.now().isoformat(timespec='seconds')}
+        mapped_artifacts.write_linear_model(self.header_path(version), compiled, vocabulary, metadata)
+        self.activate(version)
+        self.prune()
+        return version
+
+    def activate(self, version):
+        if version not in self.versions():
+            raise ValueError(f"Model '{self.name}' has no version {version}.")
+        mapped_artifacts.point_to(self.pointer_path, self.header_path(version))
+        logger.info("Model '%s' now serves version %s", self.name, version)
+
+    def rollback(self, version=None):
+        """Activate `version`, or the version published before the active one. Returns the version activated."""
+        if version is None:
+            versions = self.versions()
+            active = self.active_version()
+            older = [v for v in versions if active is None or v < active]
+            if not older:
+                raise ValueError(f"Model '{self.name}' has no version older than {active} to roll back to.")
+            version = older[-1]
+        self.activate(version)
+        return version
+
+    def prune(self):
+        active = self.active_version()
+        for version in self.versions()[:-self.keep] if self.keep > 0 else []:
+            if version != active:
+                shutil.rmtree(self.version_dir(version), ignore_errors=True)
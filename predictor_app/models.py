@@ -12,9 +12,12 @@ class AccessType(models.Model):
     def __str__(self):
         return self.description if self.description else self.name.replace('_', ' ').title()
 
+    def default_description(self):
+        return self.name.replace('_', ' ').title()
+
     def save(self, *args, **kwargs):
         if not self.description:  # Auto-generate description if empty
-            self.description = self.name.replace('_', ' ').title()
+            self.description = self.default_description()
         super().save(*args, **kwargs)
 
     class Meta:
@@ -31,17 +34,21 @@ class PaperType(models.Model):  # Specific to Land
     def __str__(self):
         return self.description if self.description else self.name.replace('_', ' ').title()
 
+    def default_description(self):
+        # French descriptions for the known values
+        if self.name == 'titre_propriete':
+            return 'Titre de propriété'
+        elif self.name == 'acte_juridique':
+            return 'Acte juridique'
+        elif self.name == 'plan_cadastre':
+            return 'Plan cadastre'
+        else:  # Default auto-generation
+            return self.name.replace('_', ' ').title()
+
     def save(self, *args, **kwargs):
-        # Auto-populate French descriptions if name matches known values and description is blank
+        # Auto-populate the description if it is blank
         if not self.description:
-            if self.name == 'titre_propriete':
-                self.description = 'Titre de propriété'
-            elif self.name == 'acte_juridique':
-                self.description = 'Acte juridique'
-            elif self.name == 'plan_cadastre':
-                self.description = 'Plan cadastre'
-            else:  # Default auto-generation
-                self.description = self.name.replace('_', ' ').title()
+            self.description = self.default_description()
         super().save(*args, **kwargs)
 
     class Meta:
@@ -59,9 +66,12 @@ class Convenience(models.Model):  # Primarily for RentalProperty
     def __str__(self):
         return self.description if self.description else self.name.replace('has_', '').replace('_', ' ').title()
 
+    def default_description(self):
+        return self.name.replace('has_', '').replace('_', ' ').title()
+
     def save(self, *args, **kwargs):
         if not self.description:  # Auto-generate description if empty
-            self.description = self.name.replace('has_', '').replace('_', ' ').title()
+            self.description = self.default_description()
         super().save(*args, **kwargs)
 
     class Meta:
@@ -113,6 +123,10 @@ class RentalProperty(models.Model):
 
     conveniences = models.ManyToManyField(Convenience, blank=True)
 
+    content_hash = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False,
+                                    help_text="Hash of the CSV row the listing was imported from; "
+                                              "re-importing that row updates this listing")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -140,14 +154,22 @@ class LandForSale(models.Model):
     price_per_sqm = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False,
                                         help_text="Price per Square Meter (auto-calculated)")
 
+    content_hash = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False,
+                                    help_text="Hash of the CSV row the listing was imported from; "
+                                              "re-importing that row updates this listing")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @staticmethod
+    def compute_price_per_sqm(price, area_sqm):
+        """price / area_sqm, or None without a price or a positive area. The field rounds it when saved."""
+        if price and area_sqm and area_sqm > 0:
+            return price / area_sqm
+        return None
+
     def save(self, *args, **kwargs):
-        if self.price and self.area_sqm and self.area_sqm > 0:
-            self.price_per_sqm = self.price / self.area_sqm
-        else:
-            self.price_per_sqm = None
+        self.price_per_sqm = self.compute_price_per_sqm(self.price, self.area_sqm)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -156,4 +178,138 @@ class LandForSale(models.Model):
     class Meta:
         verbose_name = "Land For Sale"
         verbose_name_plural = "Lands For Sale"
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+
+class ModelStatistics(models.Model):
+    """
+    Sufficient statistics (XᵀX, Xᵀy, Σy²) of one linear model's training rows, kept up to date
+    as listings change so the model can be refreshed without re-reading every listing.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    columns = models.JSONField(help_text="Design-matrix column layout")
+    gram = models.BinaryField(help_text="XᵀX as raw float64")
+    moment = models.BinaryField(help_text="Xᵀy as raw float64")
+    target_sq_sum = models.FloatField(default=0.0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Statistics for the {self.name} model"
+
+    class Meta:
+        verbose_name = "Model Statistics"
+        verbose_name_plural = "Model Statistics"
+
+
+class TrainingRun(models.Model):
+    """
+    A queued or finished background retrain, processed by the run_training_worker command.
+    At most one run is queued at a time; further retrain requests are folded into it.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    request_count = models.PositiveIntegerField(default=1, help_text="Retrain requests collapsed into this run")
+    jobs_total = models.PositiveIntegerField(default=0)
+    jobs_done = models.PositiveIntegerField(default=0)
+    results = models.JSONField(default=dict, blank=True, help_text="Per-model status, duration and error")
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Training run #{self.pk} ({self.get_status_display()})"
+
+    def as_dict(self):
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'request_count': self.request_count,
+            'jobs_total': self.jobs_total,
+            'jobs_done': self.jobs_done,
+            'results': self.results,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['status'], condition=models.Q(status='queued'),
+                                    name='unique_queued_training_run'),
+        ]
+
+
+class ImportJob(models.Model):
+    """
+    A CSV upload imported in the background by the run_import_worker command. The file is
+    processed in chunks of rows, each committed in its own transaction together with the
+    progress below, so rows_done is always the number of rows that are in the database.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    ERRORS_KEPT = 100  # Row error messages stored; error_count counts them all
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    model_type = models.CharField(max_length=20)
+    csv_file = models.FileField(upload_to='csv_uploads/', blank=True, help_text="Removed once the import succeeds")
+    file_name = models.CharField(max_length=255, blank=True, help_text="Name of the uploaded file")
+    rows_done = models.PositiveIntegerField(default=0, help_text="CSV rows processed in committed chunks")
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0, help_text="Rows already imported unchanged")
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="The first row error messages")
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import job #{self.pk} ({self.model_type}, {self.get_status_display()})"
+
+    def as_dict(self):
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'model_type': self.model_type,
+            'file_name': self.file_name,
+            'rows_done': self.rows_done,
+            'created_count': self.created_count,
+            'updated_count': self.updated_count,
+            'skipped_count': self.skipped_count,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    class Meta:
+        ordering = ['-created_at']
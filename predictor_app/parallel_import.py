@@ -0,0 +1,115 @@
+"""
+Parallel parsing of large CSV files on the server, for the import_csv command.
+
+The file is cut into byte ranges of about RANGE_BYTES that end on line boundaries. A process
+pool first counts the CSV rows of every range, so each range knows the number of its first row,
+then parses the ranges with the importer's parse_row(), which needs no database. The parsed
+records come back in file order to the calling process, the single writer, which inserts them
+in batches exactly as an upload would be.
+
+Ranges start at the beginning of a line, so a quoted value with a line break in it would be cut
+in two. The counting pass also counts the quote characters of every range: an odd number of them
+before a cut means the cut is inside a quoted value, and the file is then parsed as a stream by
+this process instead, with a warning. A stray quote in an unquoted value (5" tiles) looks the
+same and also costs the parallel parsing, never correctness.
+"""
+import csv
+import io
+import itertools
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+RANGE_BYTES = 4 * 1024 * 1024
+
+
+def read_header(path):
+    """(fieldnames, byte offset of the first data row)."""
+    with open(path, 'rb') as f:
+        line = f.readline()
+    return next(csv.reader([line.decode('utf-8-sig')]), []), len(line)
+
+
+def split_ranges(path, data_start, range_bytes=RANGE_BYTES):
+    """[(start, end), ...] byte ranges covering the data rows, each ending after a newline."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        start = data_start
+        while start < size:
+            f.seek(min(start + range_bytes, size))
+            f.readline()  # Move the cut to the end of the line
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return io.StringIO(f.read(end - start).decode('utf-8'), newline='')
+
+
+def _scan_range(path, start, end):
+    # (rows as csv.DictReader counts them, blank lines skipped; quote characters)
+    text = _read_range(path, start, end)
+    return sum(1 for row in csv.reader(text) if row), text.getvalue().count('"')
+
+
+# Spawned workers unpickle their tasks before Django is set up, so this module must not import
+# the models at import time; the importers are imported where they are used
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _parse_range(model_type, path, fieldnames, start, end, first_index):
+    from .importers import IMPORTERS
+
+    importer = IMPORTERS[model_type]()
+    rows = csv.DictReader(_read_range(path, start, end), fieldnames=fieldnames)
+    return list(importer.parse_rows(rows, first_index))
+
+
+def iter_parsed_file(path, model_type, workers):
+    """
+    parse_rows() output for the CSV file at `path`, in file order. With workers > 1 the
+    parsing runs in that many processes, at most 2 x workers ranges ahead of the consumer.
+    """
+    if workers <= 1:
+        yield from _parse_stream(path, model_type)
+        return
+
+    fieldnames, data_start = read_header(path)
+    ranges = split_ranges(path, data_start)
+    if not ranges:
+        return
+    # Spawned, not forked: the writer may be inside a transaction, so its database connection can
+    # neither be shared with the workers nor closed before forking
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker) as pool:
+        counts, quotes = zip(*pool.map(_scan_range, itertools.repeat(path), *zip(*ranges)))
+        if not any(total % 2 for total in itertools.accumulate(quotes[:-1])):
+            first_indexes = itertools.accumulate(counts, initial=0)
+            pending = deque()
+            for (start, end), first_index in zip(ranges, first_indexes):
+                pending.append(pool.submit(_parse_range, model_type, path, fieldnames, start, end, first_index))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+            return
+    logger.warning("%s has line breaks inside quoted values; parsing it in one process", path)
+    yield from _parse_stream(path, model_type)
+
+
+def _parse_stream(path, model_type):
+    from .importers import IMPORTERS, iter_csv_rows
+
+    with open(path, 'rb') as f:
+        yield from IMPORTERS[model_type]().parse_rows(iter_csv_rows(f))
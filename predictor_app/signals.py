@@ -0,0 +1,122 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Town, PaperType, AccessType, Convenience, RentalProperty, LandForSale
+
+
+def _rebuild_land_table():
+    from .ml_utils import rebuild_land_price_table
+    rebuild_land_price_table()
+
+
+def schedule_land_table_rebuild():
+    # Several lookup rows changed in one transaction only trigger one rebuild, after commit.
+    # Also called by writers that bypass the signals below (bulk imports).
+    # Django discards the callbacks of rolled-back transactions and savepoints, so a rebuild found
+    # in this connection's pending callbacks is one that still runs on commit.
+    connection = transaction.get_connection()
+    if any(func is _rebuild_land_table for _, func, _ in connection.run_on_commit):
+        return
+    transaction.on_commit(_rebuild_land_table)
+
+
+@receiver(post_save, sender=Town)
+@receiver(post_save, sender=PaperType)
+@receiver(post_save, sender=AccessType)
+def land_lookup_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:  # Edits keep the same ID, so the table is still valid
+        schedule_land_table_rebuild()
+
+
+@receiver(post_delete, sender=Town)
+@receiver(post_delete, sender=PaperType)
+@receiver(post_delete, sender=AccessType)
+def land_lookup_deleted(sender, instance, **kwargs):
+    schedule_land_table_rebuild()
+
+
+# --- Sufficient statistics of the linear models (see incremental.py) ---
+LISTING_STATISTICS = {RentalProperty: 'rental', LandForSale: 'land'}
+
+
+def _capture(instance, name, ids, new=False):
+    # Remember the listings' training rows before the change; _apply_captured() folds in the difference
+    from .incremental import ListingSnapshot
+    snapshot = ListingSnapshot.capture(name, ids, new=new)
+    if snapshot is not None:
+        instance.__dict__.setdefault('_statistics_snapshots', []).append(snapshot)
+
+
+def _apply_captured(instance):
+    for snapshot in instance.__dict__.pop('_statistics_snapshots', []):
+        snapshot.apply()
+
+
+@receiver(pre_save, sender=RentalProperty)
+@receiver(pre_save, sender=LandForSale)
+def listing_saving(sender, instance, raw=False, **kwargs):
+    instance.__dict__.pop('_statistics_snapshots', None)  # Left over from a save that failed
+    if not raw and instance.pk is not None:
+        _capture(instance, LISTING_STATISTICS[sender], [instance.pk])
+
+
+@receiver(post_save, sender=RentalProperty)
+@receiver(post_save, sender=LandForSale)
+def listing_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created and '_statistics_snapshots' not in instance.__dict__:
+        _capture(instance, LISTING_STATISTICS[sender], [instance.pk], new=True)
+    _apply_captured(instance)
+
+
+@receiver(pre_delete, sender=RentalProperty)
+@receiver(pre_delete, sender=LandForSale)
+def listing_deleting(sender, instance, **kwargs):
+    instance.__dict__.pop('_statistics_snapshots', None)
+    _capture(instance, LISTING_STATISTICS[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=RentalProperty)
+@receiver(post_delete, sender=LandForSale)
+def listing_deleted(sender, instance, **kwargs):
+    _apply_captured(instance)
+
+
+@receiver(m2m_changed, sender=RentalProperty.conveniences.through)
+def rental_conveniences_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('pre_'):
+        if not reverse:
+            ids = [instance.pk]
+        elif pk_set is not None:
+            ids = pk_set
+        else:  # convenience.rentalproperty_set.clear()
+            ids = list(instance.rentalproperty_set.values_list('id', flat=True))
+        _capture(instance, 'rental', ids)
+    else:
+        _apply_captured(instance)
+
+
+# Deleting a lookup row nulls (SET_NULL) or unlinks listings without sending their own signals
+@receiver(pre_delete, sender=AccessType)
+def access_type_deleting(sender, instance, **kwargs):
+    _capture(instance, 'rental', list(RentalProperty.objects.filter(access_type=instance).values_list('id', flat=True)))
+    _capture(instance, 'land', list(LandForSale.objects.filter(access_type=instance).values_list('id', flat=True)))
+
+
+@receiver(pre_delete, sender=PaperType)
+def paper_type_deleting(sender, instance, **kwargs):
+    _capture(instance, 'land', list(LandForSale.objects.filter(paper_type=instance).values_list('id', flat=True)))
+
+
+@receiver(pre_delete, sender=Convenience)
+def convenience_deleting(sender, instance, **kwargs):
+    _capture(instance, 'rental', list(instance.rentalproperty_set.values_list('id', flat=True)))
+
+
+@receiver(post_delete, sender=AccessType)
+@receiver(post_delete, sender=PaperType)
+@receiver(post_delete, sender=Convenience)
+def listing_lookup_deleted(sender, instance, **kwargs):
+    _apply_captured(instance)
@@ -0,0 +1,151 @@
+import numpy as np
+
+from .compiled_model import CompiledLinearModel, FeatureVocabulary, MISSING_CATEGORY
+
+CONSTANT = ('__constant__', None)  # Column 0 of the statistics: always 1, so row 0 of the Gram matrix holds n and the column sums
+
+
+class LinearFeatureSpec:
+    """
+    How a training row dict becomes design-matrix columns, mirroring the train_* functions:
+    one-hot `categorical` features (None becomes 'None_CAT'), `numeric` passthrough features
+    (None becomes 0) and an optional `multi_hot` (input key, column prefix) list feature.
+    """
+
+    def __init__(self, categorical, numeric, target, multi_hot=None):
+        self.categorical = list(categorical)
+        self.numeric = list(numeric)
+        self.target = target
+        self.multi_hot = multi_hot
+
+    def encode(self, row):
+        """Return ([column keys], [values], target) for one row. Keys are (feature, value) or (feature, None)."""
+        keys = [CONSTANT]
+        values = [1.0]
+        for feature in self.categorical:
+            value = row.get(feature)
+            keys.append((feature, MISSING_CATEGORY if value is None else value))
+            values.append(1.0)
+        for feature in self.numeric:
+            keys.append((feature, None))
+            values.append(float(row.get(feature) or 0))
+        if self.multi_hot:
+            key, prefix = self.multi_hot
+            for item in set(row.get(key) or ()):
+                keys.append((f'{prefix}{item}', None))
+                values.append(1.0)
+        return keys, values, float(row[self.target])
+
+
+class SufficientStatistics:
+    """
+    Normal-equation statistics of a linear model: XᵀX and Xᵀy over an intercept column plus
+    every one-hot/numeric column seen so far, and Σy². Rows can be added and retracted in
+    O(columns²) each, and solve() recovers the least-squares fit without touching the rows.
+
+    The column layout only grows. A column first seen in a new row starts from all-zero
+    statistics, which is exactly what it would have been had it existed all along.
+    """
+
+    SOLVE_RCOND = 1e-10  # Eigenvalues below this fraction of the largest are treated as zero (collinear one-hot columns)
+    CHUNK_SIZE = 4096
+
+    def __init__(self, spec, columns=(), gram=None, moment=None, target_sq_sum=0.0):
+        self.spec = spec
+        self.columns = [CONSTANT]
+        self._index = {CONSTANT: 0}
+        self.gram = np.zeros((1, 1))
+        self.moment = np.zeros(1)
+        self.target_sq_sum = float(target_sq_sum)
+        self._ensure_columns([tuple(c) for c in columns if tuple(c) != CONSTANT])
+        if gram is not None:
+            self.gram = np.array(gram, dtype=np.float64).reshape(len(self.columns), len(self.columns))
+            self.moment = np.array(moment, dtype=np.float64)
+        self._ensure_columns([(feature, None) for feature in spec.numeric])
+
+    @property
+    def n_rows(self):
+        return int(round(self.gram[0, 0]))
+
+    def _ensure_columns(self, keys):
+        new = [key for key in dict.fromkeys(keys) if key not in self._index]
+        if not new:
+            return
+        for key in new:
+            self._index[key] = len(self.columns)
+            self.columns.append(key)
+        size = len(self.columns)
+        gram = np.zeros((size, size))
+        gram[:len(self.gram), :len(self.gram)] = self.gram
+        self.gram = gram
+        self.moment = np.concatenate([self.moment, np.zeros(len(new))])
+
+    def ensure_numeric_columns(self, features):
+        """Add (all-zero) numeric columns, e.g. conveniences no listing has yet, so the model knows them."""
+        self._ensure_columns([(feature, None) for feature in features])
+
+    def update(self, rows, sign=1):
+        """Add rows (sign=1) or retract rows added earlier (sign=-1)."""
+        rows = list(rows)
+        for start in range(0, len(rows), self.CHUNK_SIZE):
+            encoded = [self.spec.encode(row) for row in rows[start:start + self.CHUNK_SIZE]]
+            self._ensure_columns(key for keys, _, _ in encoded for key in keys)
+            X = np.zeros((len(encoded), len(self.columns)))
+            y = np.empty(len(encoded))
+            for i, (keys, values, target) in enumerate(encoded):
+                X[i, [self._index[key] for key in keys]] = values
+                y[i] = target
+            self.gram += sign * (X.T @ X)
+            self.moment += sign * (X.T @ y)
+            self.target_sq_sum += sign * float(y @ y)
+
+    def solve(self):
+        """Least-squares fit as (CompiledLinearModel, FeatureVocabulary); same model as LinearRegression on the rows."""
+        n = self.gram[0, 0]
+        if n < 1:
+            raise ValueError("No rows in the sufficient statistics.")
+        # Categories no remaining row has are left out, like OneHotEncoder categories_; numeric columns stay
+        keep = [i for i, (feature, value) in enumerate(self.columns)
+                if i > 0 and (value is None or self.gram[i, i] > 0.5)]
+        S = self.gram[np.ix_(keep, keep)]
+        mean = self.gram[0, keep] / n
+        target_mean = self.moment[0] / n
+        # Centering removes the intercept from the system, as LinearRegression(fit_intercept=True) does
+        C = S - n * np.outer(mean, mean)
+        b = self.moment[keep] - n * mean * target_mean
+        eigenvalues, eigenvectors = np.linalg.eigh(C)
+        usable = eigenvalues > max(eigenvalues.max(initial=0.0), 0.0) * self.SOLVE_RCOND
+        V = eigenvectors[:, usable]
+        coef = V @ ((V.T @ b) / eigenvalues[usable])  # Minimum-norm solution of the normal equations
+        intercept = target_mean - mean @ coef
+        return self._compile(keep, coef, intercept)
+
+    def _compile(self, keep, coef, intercept):
+        position = {self.columns[i]: j for j, i in enumerate(keep)}
+        categorical = []
+        for feature in self.spec.categorical:
+            values = [value for f, value in position if f == feature and value is not None]
+            categorical.append((feature, {value: position[(feature, value)] for value in values}))
+        numeric = [(feature, column) for (feature, value), column in position.items() if value is None]
+        compiled = CompiledLinearModel(intercept, categorical, numeric, coef)
+
+        categories = {feature: [v for v in index if v != MISSING_CATEGORY] for feature, index in categorical}
+        convenience_ids = []
+        if self.spec.multi_hot:
+            _, prefix = self.spec.multi_hot
+            convenience_ids = [int(feature[len(prefix):]) for feature, _ in numeric if feature.startswith(prefix)]
+        return compiled, FeatureVocabulary(categories, convenience_ids)
+
+    def to_record(self):
+        """JSON-able column layout plus the raw float64 bytes of XᵀX and Xᵀy."""
+        return {
+            'columns': [list(key) for key in self.columns],
+            'gram': self.gram.tobytes(),
+            'moment': self.moment.tobytes(),
+            'target_sq_sum': self.target_sq_sum,
+        }
+
+    @classmethod
+    def from_record(cls, spec, columns, gram, moment, target_sq_sum):
+        return cls(spec, columns, np.frombuffer(bytes(gram), dtype=np.float64),
+                   np.frombuffer(bytes(moment), dtype=np.float64), target_sq_sum)
@@ -0,0 +1,137 @@
+"""
+Synthetic listings for benchmarks, seeded from the reference CSV files in data/csv.
+
+Each generated listing starts from a reference listing and perturbs it: another town now and
+then, a room more or less, a different area, multiplicative price noise. The generated tables
+keep the reference categories and their rough price structure, so models trained on them have
+the same shape (one-hot widths, convenience columns) as the real ones at any row count.
+"""
+import csv
+import math
+import os
+import random
+from decimal import Decimal
+
+from .models import AccessType, PaperType, Convenience, Town, RentalProperty, LandForSale
+
+REFERENCE_FILES = {
+    'towns': 'madagascar_towns.csv',
+    'access_types': 'madagascar_access_types.csv',
+    'paper_types': 'madagascar_paper_types.csv',
+    'conveniences': 'madagascar_conveniences.csv',
+    'rentals': 'madagascar_rental_properties.csv',
+    'lands': 'madagascar_land_for_sale.csv',
+}
+
+TWO_PLACES = Decimal('0.01')
+
+
+def read_reference_csv(directory, kind):
+    with open(os.path.join(directory, REFERENCE_FILES[kind]), newline='', encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+
+def _is_true(value):
+    return str(value).strip().lower() in ('true', '1', 'yes')
+
+
+class SyntheticListingGenerator:
+    TOWN_SWAP_RATE = 0.25  # Share of listings moved to a random town, so every town gets data
+    CONVENIENCE_DROP_RATE = 0.1
+    CONVENIENCE_ADD_RATE = 0.05
+
+    def __init__(self, reference_dir, seed=0):
+        self.reference_dir = reference_dir
+        self.random = random.Random(seed)
+        self.rental_templates = read_reference_csv(reference_dir, 'rentals')
+        self.land_templates = read_reference_csv(reference_dir, 'lands')
+        self.town_ids = self.access_type_ids = self.paper_type_ids = self.convenience_ids = None
+
+    def ensure_lookups(self):
+        """Create the reference towns and lookup rows that are missing, and map their names to IDs."""
+        for row in read_reference_csv(self.reference_dir, 'towns'):
+            Town.objects.get_or_create(name=row['name'], defaults={
+                'latitude': float(row['latitude']) if row.get('latitude') else None,
+                'longitude': float(row['longitude']) if row.get('longitude') else None,
+            })
+        for model, kind in ((AccessType, 'access_types'), (PaperType, 'paper_types'), (Convenience, 'conveniences')):
+            for row in read_reference_csv(self.reference_dir, kind):
+                model.objects.get_or_create(name=row['name'], defaults={'description': row.get('description', '')})
+
+        self.town_ids = dict(Town.objects.values_list('name', 'id'))
+        self.access_type_ids = dict(AccessType.objects.values_list('name', 'id'))
+        self.paper_type_ids = dict(PaperType.objects.values_list('name', 'id'))
+        self.convenience_ids = dict(Convenience.objects.values_list('name', 'id'))
+
+    def _noise(self, sigma):
+        return math.exp(self.random.gauss(0.0, sigma))
+
+    def _town_id(self, name):
+        if name not in self.town_ids or self.random.random() < self.TOWN_SWAP_RATE:
+            return self.random.choice(list(self.town_ids.values()))
+        return self.town_ids[name]
+
+    def rental(self):
+        """An unsaved RentalProperty and the IDs of its conveniences."""
+        template = self.random.choice(self.rental_templates)
+        base_rooms = int(template['num_rooms'])
+        num_rooms = max(1, min(6, base_rooms + self.random.randint(-1, 1)))
+        price = float(template['price']) * (num_rooms / base_rooms) ** 0.8 * self._noise(0.15)
+        property_type = template['property_type']
+
+        names = {name.strip() for name in template['conveniences_names'].split(',') if name.strip()}
+        names = {name for name in names if self.random.random() >= self.CONVENIENCE_DROP_RATE}
+        names |= {name for name in self.convenience_ids if self.random.random() < self.CONVENIENCE_ADD_RATE}
+
+        rental = RentalProperty(
+            town_id=self._town_id(template['town_name']),
+            access_type_id=self.access_type_ids.get(template['access_type_name']),
+            property_type=property_type,
+            num_rooms=num_rooms,
+            price=Decimal(price).quantize(TWO_PLACES),
+            apartment_type=f'T{num_rooms}' if property_type == 'apartment' else None,
+            house_type=f'F{num_rooms}' if property_type == 'house' else None,
+            has_house_basement=property_type == 'house' and _is_true(template['has_house_basement']),
+        )
+        return rental, sorted(self.convenience_ids[name] for name in names if name in self.convenience_ids)
+
+    def land(self):
+        """An unsaved LandForSale, with price_per_sqm filled in as save() would."""
+        template = self.random.choice(self.land_templates)
+        base_area = float(template['area_sqm'])
+        area = max(50.0, round(base_area * self._noise(0.35)))
+        price = float(template['price']) / base_area * area * self._noise(0.2)
+        is_fenced = _is_true(template['is_fenced'])
+        if self.random.random() < 0.1:
+            is_fenced = not is_fenced
+
+        land = LandForSale(
+            town_id=self._town_id(template['town_name']),
+            paper_type_id=self.paper_type_ids.get(template['paper_type_name']),
+            access_type_id=self.access_type_ids.get(template['access_type_name']),
+            is_fenced=is_fenced,
+            is_ready_to_build=_is_true(template['is_ready_to_build']),
+            area_sqm=Decimal(area).quantize(TWO_PLACES),
+            price=Decimal(price).quantize(TWO_PLACES),
+        )
+        land.price_per_sqm = LandForSale.compute_price_per_sqm(land.price, land.area_sqm)  # bulk_create skips save()
+        return land
+
+    def bulk_create_rentals(self, count, batch_size=5000):
+        """
+        Insert `count` generated rentals and their conveniences with bulk_create.
+        Model signals do not fire, so the incremental model statistics do not see these rows.
+        """
+        through = RentalProperty.conveniences.through
+        for start in range(0, count, batch_size):
+            generated = [self.rental() for _ in range(min(batch_size, count - start))]
+            rentals = RentalProperty.objects.bulk_create([rental for rental, _ in generated])
+            through.objects.bulk_create([
+                through(rentalproperty_id=rental.pk, convenience_id=convenience_id)
+                for rental, (_, convenience_ids) in zip(rentals, generated)
+                for convenience_id in convenience_ids
+            ], batch_size=batch_size)
+
+    def bulk_create_lands(self, count, batch_size=5000):
+        for start in range(0, count, batch_size):
+            LandForSale.objects.bulk_create([self.land() for _ in range(min(batch_size, count - start))])
@@ -0,0 +1,338 @@
+import functools
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import mapped_artifacts
+from .compiled_model import CompiledLinearModel, FeatureVocabulary
+from .ml_utils import (
+    LAND_FEATURE_SPEC, RENTAL_FEATURE_SPEC, land_design_matrix, land_pipeline, rental_design_matrix, rental_pipeline,
+)
+from .import_queue import _heartbeat, process_job, requeue_stale_jobs
+from .incremental import load_statistics, reset_statistics
+from .importers import RentalImporter, TownImporter
+from .model_registry import ModelRegistry
+from .parallel_import import iter_parsed_file, split_ranges
+from .model_versions import ModelVersionStore
+from .models import Convenience, ImportJob, LandForSale, RentalProperty, Town
+from .sufficient_stats import SufficientStatistics
+from .training_data import iter_land_training_rows, iter_rental_training_rows
+
+
+def land_rows(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return [{
+        'town_id': int(rng.integers(1, 6)),
+        'paper_type_id': int(rng.integers(1, 4)),
+        'access_type_id': int(rng.integers(1, 4)),
+        'is_fenced': bool(rng.integers(2)),
+        'is_ready_to_build': bool(rng.integers(2)),
+        'price_per_sqm': float(rng.uniform(1000, 50000)),
+    } for _ in range(n)]
+
+
+def rental_rows(n, convenience_ids, seed=11):
+    rng = np.random.default_rng(seed)
+    return [{
+        'town_id': int(rng.integers(1, 6)),
+        'access_type_id': int(rng.integers(1, 4)),
+        'property_type': ['apartment', 'house'][i % 2],
+        'apartment_type': ['studio', 'T2', 'T3'][i % 3] if i % 2 == 0 else None,
+        'house_type': ['villa', 'traditional'][i % 4 // 2] if i % 2 else None,
+        'num_rooms': int(rng.integers(1, 7)),
+        'has_house_basement': bool(i % 2 and rng.integers(2)),
+        'convenience_ids': [cid for cid in convenience_ids if rng.integers(2)],
+        'price': float(rng.uniform(100000, 3000000)),
+    } for i in range(n)]
+
+
+class CompiledModelParityTests(TestCase):
+    """The coefficient table must score exactly like the sklearn pipeline it was compiled from."""
+
+    TOLERANCE = {'rtol': 1e-9, 'atol': 1e-6}
+
+    def assert_parity(self, spec, rows, pipeline, X, extra_rows):
+        compiled = CompiledLinearModel.from_pipeline(pipeline)
+        expected = pipeline.predict(X)
+        np.testing.assert_allclose(compiled.predict_many(rows), expected, **self.TOLERANCE)
+        np.testing.assert_allclose([compiled.predict_one(row) for row in rows], expected, **self.TOLERANCE)
+
+        # The normal-equation solution is the same least-squares fit
+        statistics = SufficientStatistics(spec)
+        statistics.update(rows)
+        solved, _ = statistics.solve()
+        np.testing.assert_allclose(solved.predict_many(rows), expected, **self.TOLERANCE)
+
+        # Category values never seen in training carry no weight, as with handle_unknown='ignore'
+        np.testing.assert_allclose(compiled.predict_many(extra_rows),
+                                   pipeline.predict(pd.DataFrame(extra_rows)[X.columns]), **self.TOLERANCE)
+
+    def test_land_model(self):
+        rows = land_rows(80)
+        X, y = land_design_matrix(rows)
+        pipeline = land_pipeline().fit(X, y)
+        self.assert_parity(LAND_FEATURE_SPEC, rows, pipeline, X, [dict(rows[0], town_id=99, paper_type_id=99)])
+
+    def test_rental_model(self):
+        convenience_ids = [Convenience.objects.create(name=f'convenience {i}').id for i in range(4)]
+        rows = rental_rows(80, convenience_ids)
+        X, y, all_convenience_ids = rental_design_matrix(rows)
+        pipeline = rental_pipeline(all_convenience_ids).fit(X, y)
+        # Rows as the compiled model scores them, with one 0/1 feature per convenience
+        encoded = [dict(row, **features) for row, features in zip(rows, X.to_dict('records'))]
+        self.assert_parity(RENTAL_FEATURE_SPEC, encoded, pipeline, X,
+                           [dict(encoded[0], town_id=99, property_type='castle')])
+
+
+class UnseenInputTests(SimpleTestCase):
+    def test_batch_matches_rows(self):
+        vocabulary = FeatureVocabulary({'town_id': [1, 2], 'property_type': ['apartment', 'house']}, [10, 11])
+        rows = [
+            {'town_id': 1, 'property_type': 'house', 'convenience_ids': [10]},
+            {'town_id': 3, 'property_type': 'castle', 'convenience_ids': [12, 10, 13]},
+            {'town_id': None, 'property_type': 'None_CAT'},
+            {'town_id': 3, 'property_type': 'apartment', 'convenience_ids': [13]},
+        ]
+        expected = {i: vocabulary.unseen(row) for i, row in enumerate(rows) if vocabulary.unseen(row)}
+        self.assertEqual(vocabulary.unseen_many(rows), expected)
+        self.assertEqual(list(expected), [1, 3])
+
+
+class _Rollback(Exception):
+    pass
+
+
+@mock.patch('predictor_app.ml_utils.rebuild_land_price_table')
+class LandTableRebuildTests(TransactionTestCase):
+    """New towns, paper types and access types rebuild the land price table once per committed transaction."""
+
+    def test_one_rebuild_per_transaction(self, rebuild):
+        with transaction.atomic():
+            Town.objects.create(name='Antsirabe')
+            Town.objects.create(name='Fianarantsoa')
+            rebuild.assert_not_called()
+        rebuild.assert_called_once_with()
+
+    def test_rolled_back_transaction_does_not_block_later_rebuilds(self, rebuild):
+        with self.assertRaises(_Rollback), transaction.atomic():
+            Town.objects.create(name='Antsirabe')
+            raise _Rollback
+        rebuild.assert_not_called()
+
+        with transaction.atomic():
+            Town.objects.create(name='Fianarantsoa')
+        rebuild.assert_called_once_with()
+
+    def test_rolled_back_savepoint_does_not_block_the_rebuild(self, rebuild):
+        with transaction.atomic():
+            with self.assertRaises(_Rollback), transaction.atomic():
+                Town.objects.create(name='Antsirabe')
+                raise _Rollback
+            Town.objects.create(name='Fianarantsoa')
+        rebuild.assert_called_once_with()
+
+
+class TrainingRowQueryTests(TestCase):
+    """Extracting training rows costs the same queries for 5 listings as for 50."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.town = Town.objects.create(name='Antsirabe')
+        cls.conveniences = [Convenience.objects.create(name=f'convenience {i}') for i in range(3)]
+
+    def create_listings(self, n):
+        # bulk_create, so the listing signals add no queries of their own
+        rentals = RentalProperty.objects.bulk_create(
+            RentalProperty(town=self.town, property_type='apartment', num_rooms=2, price=100000 + i) for i in range(n))
+        through = RentalProperty.conveniences.through
+        through.objects.bulk_create(
+            through(rentalproperty_id=rental.id, convenience_id=convenience.id)
+            for i, rental in enumerate(rentals) for convenience in self.conveniences[:i % 4])
+        LandForSale.objects.bulk_create(
+            LandForSale(town=self.town, area_sqm=300, price=3000000 + i) for i in range(n))
+
+    def count_queries(self, iter_rows, expected_rows):
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(iter_rows(chunk_size=7))
+        self.assertEqual(len(rows), expected_rows)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_listings(5)
+        rental_queries = self.count_queries(iter_rental_training_rows, 5)
+        land_queries = self.count_queries(iter_land_training_rows, 5)
+
+        self.create_listings(45)
+        self.assertEqual(self.count_queries(iter_rental_training_rows, 50), rental_queries)
+        self.assertEqual(self.count_queries(iter_land_training_rows, 50), land_queries)
+        self.assertEqual(rental_queries, 2)  # Rentals and their conveniences
+        self.assertEqual(land_queries, 1)
+
+    def test_conveniences_are_joined_to_their_rentals(self):
+        self.create_listings(8)
+        rows = list(iter_rental_training_rows(chunk_size=3))
+        expected = [sorted(c.id for c in rental.conveniences.all()) for rental in RentalProperty.objects.order_by('id')]
+        self.assertEqual([sorted(row['convenience_ids']) for row in rows], expected)
+
+
+class ServedModelVersionTests(SimpleTestCase):
+    """The registry reports the version names that rollback_model lists and accepts."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = ModelVersionStore('land', os.path.join(directory.name, 'land.json'),
+                                       os.path.join(directory.name, 'versions'))
+        self.registry = ModelRegistry(check_interval=0)
+        self.registry.register('land', self.store.pointer_path, loader=mapped_artifacts.read_linear_model)
+
+    def publish(self, seed):
+        rows = land_rows(40, seed=seed)
+        X, y = land_design_matrix(rows)
+        compiled = CompiledLinearModel.from_pipeline(land_pipeline().fit(X, y))
+        return self.store.publish(compiled, FeatureVocabulary({}))
+
+    def test_served_version_is_the_published_version(self):
+        first = self.publish(seed=1)
+        self.assertEqual(self.registry.get('land').version, first)
+        second = self.publish(seed=2)
+        self.assertEqual(self.registry.get('land').version, second)
+
+        self.store.rollback()
+        self.assertEqual(self.registry.get('land').version, first)
+        self.assertEqual(self.store.active_version(), first)
+
+
+class ImportLookupLengthTests(TestCase):
+    """A lookup name too long for its column is one row error, not a failed import."""
+
+    def test_town_name_too_long(self):
+        result = TownImporter().import_rows([{'name': 'x' * 101}, {'name': 'Antsirabe'}])
+        self.assertEqual((result.created, result.error_count), (1, 1))
+        self.assertIn('longer than 100 characters', result.errors[0])
+        self.assertEqual(list(Town.objects.values_list('name', flat=True)), ['Antsirabe'])
+
+    def test_listing_lookup_names_too_long(self):
+        row = {'town_name': 'Antsirabe', 'access_type_name': 'road', 'property_type': 'apartment',
+               'num_rooms': '2', 'price': '250000', 'apartment_type': 'T2', 'conveniences_names': 'parking'}
+        rows = [row, dict(row, access_type_name='a' * 51, price='1'), dict(row, conveniences_names='c' * 51, price='2')]
+        result = RentalImporter().import_rows(rows)
+        self.assertEqual((result.created, result.error_count), (1, 2))
+        self.assertTrue(result.errors[0].startswith('Rental Row 3 (Town: Antsirabe): AccessType name'))
+        self.assertTrue(result.errors[1].startswith('Rental Row 4 (Town: Antsirabe): Convenience name'))
+        self.assertEqual(list(Convenience.objects.values_list('name', flat=True)), ['parking'])
+
+
+class ImportJobHeartbeatTests(TransactionTestCase):
+    """A job whose chunk is still being imported is not requeued as stale."""
+
+    def test_running_job_is_not_stale(self):
+        job = ImportJob.objects.create(file_name='rentals.csv', model_type='rental', status=ImportJob.RUNNING)
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=30))
+
+        with _heartbeat(job, interval=0.05):
+            time.sleep(0.3)  # A chunk still being imported
+        self.assertEqual(requeue_stale_jobs(older_than=60), 0)
+
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=30))
+        self.assertEqual(requeue_stale_jobs(older_than=60), 1)
+
+
+class ImportJobStatisticsLockTests(TransactionTestCase):
+    """An import job releases the model statistics after every batch, so listing saves do not wait for the job."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        reset_statistics('rental', rows=[])
+        self.town = Town.objects.create(name='Antsirabe')
+        lines = ['town_name,access_type_name,property_type,num_rooms,price,apartment_type,conveniences_names']
+        lines += [f'Antsirabe,road,apartment,2,{250000 + i},T2,parking' for i in range(6)]
+        self.job = ImportJob.objects.create(
+            csv_file=SimpleUploadedFile('rentals.csv', '\n'.join(lines).encode()), file_name='rentals.csv',
+            model_type='rental', status=ImportJob.RUNNING)
+
+    def process_job(self, during_batch):
+        write_batch = RentalImporter.write_batch
+
+        def traced_write_batch(importer, records):
+            during_batch()
+            write_batch(importer, records)
+
+        with mock.patch.object(RentalImporter, 'batch_size', 2), \
+                mock.patch.object(RentalImporter, 'write_batch', traced_write_batch):
+            job = process_job(self.job)
+        self.assertEqual((job.status, job.created_count), (ImportJob.SUCCEEDED, 6))
+
+    def test_every_batch_commits(self):
+        events = []
+
+        def during_batch():
+            events.append('batch')
+            transaction.on_commit(lambda: events.append('commit'))
+
+        self.process_job(during_batch)
+        self.assertEqual(events, ['batch', 'commit'] * 3)
+        self.assertEqual(load_statistics('rental').n_rows, 6)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_listing_save_during_import(self):
+        saved = []
+
+        def save_listing():
+            try:
+                RentalProperty.objects.create(town=self.town, property_type='apartment', num_rooms=3, price=300000)
+                saved.append(len(saved))
+            finally:
+                connection.close()
+
+        def during_batch():
+            # The previous batch folded its listings into the statistics; a save must not wait for the job
+            thread = threading.Thread(target=save_listing)
+            thread.start()
+            thread.join(timeout=10)
+            self.assertFalse(thread.is_alive())
+
+        self.process_job(during_batch)
+        self.assertEqual(len(saved), 3)
+        self.assertEqual(load_statistics('rental').n_rows, 9)
+
+
+@mock.patch('predictor_app.parallel_import.split_ranges', functools.partial(split_ranges, range_bytes=40))
+class ParallelImportTests(SimpleTestCase):
+    """Parsing a file in byte ranges gives the same records as reading it as a stream."""
+
+    def parse(self, names):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'towns.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write('name,latitude,longitude\r\n')
+            f.writelines(f'"{name}",-19.{i},47.{i}\r\n' for i, name in enumerate(names))
+        return list(iter_parsed_file(path, 'town', workers=1)), path
+
+    def test_ranges(self):
+        expected, path = self.parse([f'Town {i}' for i in range(30)])
+        with self.assertNoLogs('predictor_app.parallel_import'):
+            self.assertEqual(list(iter_parsed_file(path, 'town', workers=2)), expected)
+
+    def test_line_breaks_in_quoted_values(self):
+        expected, path = self.parse([f'Town {i}\nsur mer' if i % 3 else f'Town {i}' for i in range(30)])
+        with self.assertLogs('predictor_app.parallel_import', 'WARNING'):
+            self.assertEqual(list(iter_parsed_file(path, 'town', workers=2)), expected)
+        self.assertEqual(len(expected), 30)
@@ -0,0 +1,139 @@
+"""
+Compact columnar training sets.
+
+The pandas training path holds every row as a Python dict, then as a DataFrame of object
+columns, then as a dense float64 one-hot matrix; its peak is many times the data itself.
+TrainingArrays instead streams rows into preallocated numpy arrays (int32 category codes,
+uint8 flags, float32 targets, a CSR-style list of convenience IDs) and builds the design
+matrix from them a chunk of rows at a time, accumulating only XᵀX and Xᵀy. Memory is a few
+bytes per listing plus O(chunk x columns), and the least-squares solution is the one
+SufficientStatistics.solve() gives, i.e. the same model LinearRegression fits.
+"""
+import numpy as np
+
+from .compiled_model import MISSING_CATEGORY
+from .sufficient_stats import CONSTANT, SufficientStatistics
+
+NUMERIC_DTYPES = {'num_rooms': np.int32}  # Every other numeric feature is a 0/1 flag, stored as uint8
+ITEMS_PER_ROW = 4  # Initial multi-hot capacity per row; grows as needed
+
+
+class TrainingArrays:
+    """Training rows of one LinearFeatureSpec, held column-wise in compact arrays."""
+
+    def __init__(self, spec, capacity=1024):
+        self.spec = spec
+        self.n_rows = 0
+        capacity = max(int(capacity), 1)
+        self.category_codes = [{} for _ in spec.categorical]  # Per feature: value -> code, in first-seen order
+        self.codes = np.empty((capacity, len(spec.categorical)), dtype=np.int32)
+        self.numeric = {feature: np.empty(capacity, dtype=NUMERIC_DTYPES.get(feature, np.uint8))
+                        for feature in spec.numeric}
+        self.target = np.empty(capacity, dtype=np.float32)
+        self.n_items = 0
+        self.item_offsets = np.zeros(capacity + 1, dtype=np.int64) if spec.multi_hot else None
+        self.item_ids = np.empty(capacity * ITEMS_PER_ROW, dtype=np.int32) if spec.multi_hot else None
+
+    @classmethod
+    def from_rows(cls, spec, rows, capacity=1024):
+        arrays = cls(spec, capacity)
+        arrays.extend(rows)
+        return arrays
+
+    @property
+    def capacity(self):
+        return len(self.target)
+
+    @property
+    def nbytes(self):
+        total = self.codes.nbytes + self.target.nbytes + sum(values.nbytes for values in self.numeric.values())
+        if self.spec.multi_hot:
+            total += self.item_offsets.nbytes + self.item_ids.nbytes
+        return total
+
+    def _grow(self, capacity):
+        # Doubling keeps appends amortized O(1) when the row count estimate was too low
+        self.codes = np.resize(self.codes, (capacity, self.codes.shape[1]))
+        self.numeric = {feature: np.resize(values, capacity) for feature, values in self.numeric.items()}
+        self.target = np.resize(self.target, capacity)
+        if self.spec.multi_hot:
+            self.item_offsets = np.resize(self.item_offsets, capacity + 1)
+
+    def append(self, row):
+        i = self.n_rows
+        if i == self.capacity:
+            self._grow(2 * self.capacity)
+        for j, (feature, codes) in enumerate(zip(self.spec.categorical, self.category_codes)):
+            value = row.get(feature)
+            if value is None:
+                value = MISSING_CATEGORY
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(codes)
+            self.codes[i, j] = code
+        for feature, values in self.numeric.items():
+            values[i] = row.get(feature) or 0
+        self.target[i] = row[self.spec.target]
+        if self.spec.multi_hot:
+            items = set(row.get(self.spec.multi_hot[0]) or ())
+            end = self.n_items + len(items)
+            if end > len(self.item_ids):
+                self.item_ids = np.resize(self.item_ids, max(2 * len(self.item_ids), end))
+            self.item_ids[self.n_items:end] = sorted(items)
+            self.n_items = end
+            self.item_offsets[i + 1] = end
+        self.n_rows = i + 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def columns(self):
+        """Column keys of the design matrix, in SufficientStatistics form."""
+        keys = [CONSTANT]
+        for feature, codes in zip(self.spec.categorical, self.category_codes):
+            keys.extend((feature, value) for value in codes)
+        keys.extend((feature, None) for feature in self.spec.numeric)
+        if self.spec.multi_hot:
+            prefix = self.spec.multi_hot[1]
+            keys.extend((f'{prefix}{item}', None) for item in self._item_vocabulary())
+        return keys
+
+    def _item_vocabulary(self):
+        return np.unique(self.item_ids[:self.n_items])
+
+    def iter_design_chunks(self, chunk_size=SufficientStatistics.CHUNK_SIZE):
+        """Yield (X, y) float64 blocks of at most `chunk_size` rows, with the columns() layout."""
+        offsets = np.cumsum([1] + [len(codes) for codes in self.category_codes])
+        numeric_start = offsets[-1]
+        items = self._item_vocabulary() if self.spec.multi_hot else None
+        items_start = numeric_start + len(self.spec.numeric)
+        n_columns = items_start + (len(items) if items is not None else 0)
+
+        for start in range(0, self.n_rows, chunk_size):
+            stop = min(start + chunk_size, self.n_rows)
+            rows = np.arange(stop - start)
+            X = np.zeros((stop - start, n_columns))
+            X[:, 0] = 1.0
+            for j in range(len(self.category_codes)):
+                X[rows, offsets[j] + self.codes[start:stop, j]] = 1.0
+            for k, values in enumerate(self.numeric.values()):
+                X[:, numeric_start + k] = values[start:stop]
+            if items is not None:
+                bounds = self.item_offsets[start:stop + 1]
+                item_rows = np.repeat(rows, np.diff(bounds))
+                item_columns = items_start + np.searchsorted(items, self.item_ids[bounds[0]:bounds[-1]])
+                X[item_rows, item_columns] = 1.0
+            yield X, self.target[start:stop].astype(np.float64)
+
+    def sufficient_statistics(self, chunk_size=SufficientStatistics.CHUNK_SIZE):
+        """XᵀX, Xᵀy and Σy² of the rows, accumulated chunk by chunk."""
+        columns = self.columns()
+        gram = np.zeros((len(columns), len(columns)))
+        moment = np.zeros(len(columns))
+        target_sq_sum = 0.0
+        for X, y in self.iter_design_chunks(chunk_size):
+            gram += X.T @ X
+            moment += X.T @ y
+            target_sq_sum += float(y @ y)
+        return SufficientStatistics(self.spec, columns, gram, moment, target_sq_sum)
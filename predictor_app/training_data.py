@@ -0,0 +1,123 @@
+"""
+Bulk extraction of training rows.
+
+Rows are read with values() (no model instances) through .iterator(), so they stream from the
+database in chunks. The rental conveniences come from the many-to-many through table in a
+single ordered query and are merge-joined in memory, so extraction costs a constant number
+of queries however many listings there are.
+"""
+import hashlib
+import json
+
+from django.db.models import Max
+
+from .models import RentalProperty, LandForSale
+
+TRAINING_CHUNK_SIZE = 2000
+
+RENTAL_TRAINING_FIELDS = ('id', 'town_id', 'access_type_id', 'property_type', 'num_rooms', 'price',
+                          'apartment_type', 'house_type', 'has_house_basement')
+
+
+def rental_training_queryset(town_id=None):
+    rentals = RentalProperty.objects.filter(price__isnull=False)
+    return rentals if town_id is None else rentals.filter(town_id=town_id)
+
+
+def land_training_queryset(town_id=None):
+    lands = LandForSale.objects.filter(price__isnull=False, area_sqm__isnull=False, area_sqm__gt=0)
+    return lands if town_id is None else lands.filter(town_id=town_id)
+
+
+class TrainingFingerprint:
+    """
+    Identity of a training set: row count, latest updated_at of the queryset and a SHA-256 of the
+    extracted rows. The hash also covers changes that do not touch updated_at (conveniences
+    of a rental, queryset.update()). Rows are hashed as they stream past, so they never need
+    to be held all at once.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._digest = hashlib.sha256()
+
+    def update(self, row):
+        self._digest.update(json.dumps(row, sort_keys=True, default=str).encode('utf-8'))
+        self._digest.update(b'\n')
+        self.rows += 1
+
+    def result(self, queryset):
+        max_updated_at = queryset.aggregate(max_updated_at=Max('updated_at'))['max_updated_at']
+        return {
+            'rows': self.rows,
+            'max_updated_at': max_updated_at.isoformat() if max_updated_at else None,
+            'sha256': self._digest.hexdigest(),
+        }
+
+
+def training_fingerprint(rows, queryset):
+    fingerprint = TrainingFingerprint()
+    for row in rows:
+        fingerprint.update(row)
+    return fingerprint.result(queryset)
+
+
+def _iter_rental_convenience_ids(chunk_size, ids=None, town_id=None):
+    # Yields (rental_id, [convenience_id, ...]) in rental ID order, only for rentals that have conveniences
+    through = RentalProperty.conveniences.through.objects.all()
+    if ids is not None:
+        through = through.filter(rentalproperty_id__in=ids)
+    if town_id is not None:
+        through = through.filter(rentalproperty__town_id=town_id)
+    rows = (through.order_by('rentalproperty_id', 'convenience_id')
+            .values_list('rentalproperty_id', 'convenience_id').iterator(chunk_size=chunk_size))
+    current_id, current = None, []
+    for rental_id, convenience_id in rows:
+        if rental_id != current_id:
+            if current:
+                yield current_id, current
+            current_id, current = rental_id, []
+        current.append(convenience_id)
+    if current:
+        yield current_id, current
+
+
+def iter_rental_training_rows(chunk_size=TRAINING_CHUNK_SIZE, ids=None, town_id=None):
+    """
+    Yield one dict per priced rental, in the shape train_rental_model expects. Two queries in total.
+    `ids` restricts the extraction to those rentals, `town_id` to the rentals of one town.
+    """
+    rentals = rental_training_queryset(town_id)
+    if ids is not None:
+        rentals = rentals.filter(id__in=ids)
+    rentals = rentals.order_by('id').values(*RENTAL_TRAINING_FIELDS).iterator(chunk_size=chunk_size)
+    conveniences = _iter_rental_convenience_ids(chunk_size, ids, town_id)
+    next_id, next_ids = next(conveniences, (None, None))
+    for row in rentals:
+        rental_id = row.pop('id')
+        # Both streams are ordered by rental ID; skip conveniences of rentals filtered out above
+        while next_id is not None and next_id < rental_id:
+            next_id, next_ids = next(conveniences, (None, None))
+        if next_id == rental_id:
+            row['convenience_ids'] = next_ids
+            next_id, next_ids = next(conveniences, (None, None))
+        else:
+            row['convenience_ids'] = []
+        row['apartment_type'] = row['apartment_type'] or 'None'  # String 'None' for ml_utils
+        row['house_type'] = row['house_type'] or 'None'  # String 'None' for ml_utils
+        yield row
+
+
+def iter_land_training_rows(chunk_size=TRAINING_CHUNK_SIZE, ids=None, town_id=None):
+    """Yield one dict per land listing with a price and a positive area, with its price per sqm target."""
+    lands = land_training_queryset(town_id)
+    if ids is not None:
+        lands = lands.filter(id__in=ids)
+    lands = (lands.order_by('id')
+             .values('town_id', 'paper_type_id', 'access_type_id', 'is_fenced', 'is_ready_to_build',
+                     'price', 'area_sqm')
+             .iterator(chunk_size=chunk_size))
+    for row in lands:
+        # Target variable; area_sqm is NOT an input feature here
+        row['price_per_sqm'] = row.pop('price') / row.pop('area_sqm')
+        yield row
@@ -0,0 +1,269 @@
+"""
+Runs independent training jobs (one per model today; per-segment models or cross-validation
+folds later) either in-process or in a process pool. Every job is timed and isolated: an
+exception in one job is recorded in its JobResult and never stops the others.
+"""
+import time
+import tracemalloc
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.db import connections
+
+
+class JobSkipped(Exception):
+    """Raised by a job that has nothing to do; reported as skipped rather than failed."""
+
+
+class NoTrainingData(JobSkipped):
+    pass
+
+
+class DataUnchanged(JobSkipped):
+    pass
+
+
+class TrainingJob:
+    """A named call of a module-level function (it must be picklable to run in a worker process)."""
+
+    def __init__(self, name, func, *args, **kwargs):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+
+class JobResult:
+    SUCCEEDED = 'succeeded'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+
+    def __init__(self, name, status, seconds, value=None, error=None, peak_memory=None):
+        self.name = name
+        self.status = status
+        self.seconds = seconds
+        self.value = value
+        self.error = error  # Message for skipped jobs, traceback for failed ones
+        self.peak_memory = peak_memory  # Bytes, when the job ran under tracemalloc
+
+    @property
+    def succeeded(self):
+        return self.status == self.SUCCEEDED
+
+    def __repr__(self):
+        return f"<JobResult {self.name} {self.status} {self.seconds:.2f}s>"
+
+
+def _run_job(job, trace_memory=False):
+    # tracemalloc sees Python objects and numpy buffers, not memory held by the database driver
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        value = job.func(*job.args, **job.kwargs)
+        result = JobResult(job.name, JobResult.SUCCEEDED, time.perf_counter() - started, value=value)
+    except JobSkipped as e:
+        result = JobResult(job.name, JobResult.SKIPPED, time.perf_counter() - started, error=str(e))
+    except Exception:
+        result = JobResult(job.name, JobResult.FAILED, time.perf_counter() - started, error=traceback.format_exc())
+    finally:
+        connections.close_all()  # Pool workers are reused; do not keep idle connections around
+        if tracing:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    if tracing:
+        result.peak_memory = peak_memory
+    return result
+
+
+def _init_worker():
+    # Under the spawn/forkserver start methods the worker starts from a fresh interpreter
+    import django
+    django.setup()
+
+
+def run_training_jobs(jobs, n_jobs=1, on_result=None, trace_memory=False):
+    """
+    Run `jobs` and return their JobResults in the order given. With n_jobs > 1 they run in a pool
+    of that many processes. `on_result(result)` is called as each job finishes. With
+    `trace_memory`, each result records the job's peak traced memory.
+    """
+    if n_jobs <= 1 or len(jobs) <= 1:
+        results = []
+        for job in jobs:
+            results.append(_run_job(job, trace_memory))
+            if on_result:
+                on_result(results[-1])
+        return results
+
+    # Forked workers must not inherit (and share) the parent's database sockets
+    connections.close_all()
+    results = {}
+    broken = []
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(jobs)), initializer=_init_worker) as pool:
+        futures = {pool.submit(_run_job, job, trace_memory): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                broken.append(job)  # A worker died; every unfinished job in the pool fails with it
+                continue
+            results[job.name] = result
+            if on_result:
+                on_result(result)
+
+    # Re-run the jobs lost with the pool one at a time, so only the job that kills its worker fails
+    for job in broken:
+        with ProcessPoolExecutor(max_workers=1, initializer=_init_worker) as pool:
+            try:
+                result = pool.submit(_run_job, job, trace_memory).result()
+            except BrokenProcessPool:
+                result = JobResult(job.name, JobResult.FAILED, 0.0, error=traceback.format_exc())
+        results[job.name] = result
+        if on_result:
+            on_result(result)
+    return [results[job.name] for job in jobs]
+
+
+# --- Model training jobs ---
+TRAINING_ENGINES = ('streaming', 'pandas')
+
+
+def _stream_training_arrays(spec, rows, queryset):
+    """Read `rows` once into TrainingArrays while fingerprinting them. Returns (arrays, fingerprint)."""
+    from .training_arrays import TrainingArrays
+    from .training_data import TrainingFingerprint
+
+    # Size the arrays from a COUNT; they still grow if listings are added meanwhile
+    arrays = TrainingArrays(spec, capacity=queryset.count())
+    tracker = TrainingFingerprint()
+    for row in rows:
+        tracker.update(row)
+        arrays.append(row)
+    return arrays, tracker.result(queryset)
+
+
+def _train_model_job(name, label, iter_rows, queryset, train, no_data_message, force, engine='streaming'):
+    """
+    Train model `name` unless its data is unchanged since the active version. The 'streaming' engine
+    reads the rows once into compact TrainingArrays and solves the normal equations; 'pandas' fits
+    the sklearn pipeline on a DataFrame of every row.
+    """
+    from .incremental import STATISTICS_SOURCES, publish_solution, reset_statistics, save_statistics
+    from .ml_utils import MODEL_VERSIONS
+    from .training_data import training_fingerprint
+
+    if engine not in TRAINING_ENGINES:
+        raise ValueError(f"Unknown training engine '{engine}'.")
+    if engine == 'pandas':
+        rows = list(iter_rows())
+        fingerprint = training_fingerprint(rows, queryset)
+    else:
+        arrays, fingerprint = _stream_training_arrays(STATISTICS_SOURCES[name][0], iter_rows(), queryset)
+
+    n_rows = fingerprint['rows']
+    if not n_rows:
+        raise NoTrainingData(no_data_message)
+    store = MODEL_VERSIONS[name]
+    if not force and fingerprint == store.active_fingerprint():
+        raise DataUnchanged(f"{label} training data unchanged since version {store.active_version()} "
+                            f"({n_rows} records); skipping the refit. Use --force to retrain anyway.")
+    print(f"Training {label.lower()} model with {n_rows} records...")
+
+    if engine == 'pandas':
+        if train(rows, fingerprint=fingerprint) is None:
+            raise RuntimeError(f"{label} model training failed; see the output above.")
+        reset_statistics(name, rows)  # Baseline for refresh_models
+        return n_rows
+
+    print(f"{label} training arrays: {arrays.nbytes / 2 ** 20:.1f} MB")
+    stats = arrays.sufficient_statistics()
+    version = publish_solution(name, stats, source='train', fingerprint=fingerprint)
+    save_statistics(name, stats)  # Baseline for refresh_models
+    print(f"{label} model version {version} trained and saved to {store.version_dir(version)}")
+    return n_rows
+
+
+def train_rental_job(force=False, engine='streaming'):
+    from .ml_utils import train_rental_model
+    from .training_data import iter_rental_training_rows, rental_training_queryset
+
+    return _train_model_job('rental', 'Rental', iter_rental_training_rows, rental_training_queryset(),
+                            train_rental_model, 'No rental data with price found to train the model.', force,
+                            engine)
+
+
+def train_land_job(force=False, engine='streaming'):
+    from .ml_utils import train_land_model
+    from .training_data import iter_land_training_rows, land_training_queryset
+
+    # train_land_model expects price_per_sqm
+    return _train_model_job('land', 'Land (price per sqm)', iter_land_training_rows, land_training_queryset(),
+                            train_land_model, 'No valid land data (price and area_sqm > 0) found to train the model.',
+                            force, engine)
+
+
+MODEL_TRAINING_JOBS = {
+    'rental': train_rental_job,
+    'land': train_land_job,
+}
+
+def _shard_queryset(name, town_id=None):
+    from .training_data import rental_training_queryset, land_training_queryset
+
+    querysets = {'rental': rental_training_queryset, 'land': land_training_queryset}
+    return querysets[name](town_id)
+
+
+def train_shard_job(name, town_id, force=False):
+    """Fit the town shard of model `name`, unless the town's rows are unchanged since its active version."""
+    from .incremental import STATISTICS_SOURCES, solve
+    from .ml_utils import MODEL_SHARDS
+
+    spec, iter_rows = STATISTICS_SOURCES[name]
+    arrays, fingerprint = _stream_training_arrays(spec, iter_rows(town_id=town_id), _shard_queryset(name, town_id))
+    if not arrays.n_rows:
+        raise NoTrainingData(f"No {name} training data left in town {town_id}.")
+    store = MODEL_SHARDS[name].store(town_id)
+    if not force and fingerprint == store.active_fingerprint():
+        raise DataUnchanged(f"{store.name}: unchanged since version {store.active_version()} ({arrays.n_rows} records).")
+    compiled, vocabulary = solve(name, arrays.sufficient_statistics())
+    store.publish(compiled, vocabulary, fingerprint=fingerprint, source='train')
+    return arrays.n_rows
+
+
+def shard_training_jobs(force=False, min_rows=50):
+    """
+    One job per (model, town) with at least `min_rows` training rows. Shards of towns that fell
+    below the threshold are retired, so the global model serves those towns again.
+    """
+    from django.db.models import Count
+    from .ml_utils import MODEL_SHARDS
+
+    jobs = []
+    for name, shards in MODEL_SHARDS.items():
+        counts = _shard_queryset(name).order_by().values_list('town_id').annotate(n=Count('id'))
+        town_ids = sorted(town_id for town_id, n in counts if n >= min_rows)
+        for town_id in set(shards.town_ids()) - set(town_ids):
+            shards.retire(town_id)
+        jobs.extend(TrainingJob(f'{name}/town-{town_id}', train_shard_job, name, town_id, force=force)
+                    for town_id in town_ids)
+    return jobs
+
+
+def model_training_jobs(force=False, engine='streaming', shards=None):
+    """
+    The jobs of a full training run: the global models, plus the per-town shards when `shards`
+    (by default settings.MODEL_SHARDS_ENABLED) is true.
+    """
+    from django.conf import settings
+
+    jobs = [TrainingJob(name, func, force=force, engine=engine) for name, func in MODEL_TRAINING_JOBS.items()]
+    if shards is None:
+        shards = getattr(settings, 'MODEL_SHARDS_ENABLED', False)
+    if shards:
+        jobs.extend(shard_training_jobs(force=force, min_rows=getattr(settings, 'MODEL_SHARD_MIN_ROWS', 50)))
+    return jobs
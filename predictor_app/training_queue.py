@@ -0,0 +1,80 @@
+"""
+Database-backed queue of background retrains. The web UI enqueues a TrainingRun and the
+run_training_worker command (a plain local process, no broker) picks it up.
+
+Requests collapse: while a run is queued, further requests only bump its request_count, so a
+burst of imports leads to one retrain. A partial unique index on status='queued' enforces
+this across concurrent requests.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TrainingRun
+from .training_jobs import JobResult, model_training_jobs, run_training_jobs
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_training_run():
+    """Return (run, created): the queued run, created now unless one was already waiting."""
+    try:
+        with transaction.atomic():
+            return TrainingRun.objects.create(), True
+    except IntegrityError:  # Another run is already queued
+        pass
+    run = TrainingRun.objects.filter(status=TrainingRun.QUEUED).first()
+    if run is None:  # It was claimed by a worker in the meantime; queue a fresh one
+        return enqueue_training_run()
+    TrainingRun.objects.filter(pk=run.pk).update(request_count=F('request_count') + 1)
+    run.refresh_from_db()
+    return run, False
+
+
+def claim_next_run():
+    """Move the oldest queued run to running and return it, or None. Safe with several workers."""
+    for run in TrainingRun.objects.filter(status=TrainingRun.QUEUED).order_by('created_at')[:5]:
+        started_at = timezone.now()
+        claimed = TrainingRun.objects.filter(pk=run.pk, status=TrainingRun.QUEUED).update(
+            status=TrainingRun.RUNNING, started_at=started_at)
+        if claimed:
+            run.status, run.started_at = TrainingRun.RUNNING, started_at
+            return run
+    return None
+
+
+def fail_stale_runs(older_than):
+    """Mark runs left 'running' by a worker that died more than `older_than` seconds ago as failed."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return TrainingRun.objects.filter(status=TrainingRun.RUNNING, started_at__lt=cutoff).update(
+        status=TrainingRun.FAILED, finished_at=timezone.now(), error="The worker stopped before the run finished.")
+
+
+def process_run(run, n_jobs=1):
+    """Train every model for a claimed run, recording progress after each model."""
+    jobs = model_training_jobs()
+    run.jobs_total = len(jobs)
+    run.save(update_fields=['jobs_total'])
+
+    def record(result):
+        run.results[result.name] = {'status': result.status, 'seconds': round(result.seconds, 3),
+                                    'records': result.value, 'error': result.error}
+        run.jobs_done += 1
+        run.save(update_fields=['results', 'jobs_done'])
+
+    try:
+        results = run_training_jobs(jobs, n_jobs=n_jobs, on_result=record)
+    except Exception as e:
+        logger.exception("Training run #%s crashed", run.pk)
+        run.status, run.error = TrainingRun.FAILED, str(e)
+    else:
+        failed = [result.name for result in results if result.status == JobResult.FAILED]
+        run.status = TrainingRun.FAILED if failed else TrainingRun.SUCCEEDED
+        run.error = f"Training failed for: {', '.join(failed)}." if failed else ''
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'error', 'finished_at'])
+    logger.info("Training run #%s %s", run.pk, run.status)
+    return run
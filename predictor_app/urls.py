@@ -1,9 +1,11 @@
 from django.urls import path
 from .views import (
-    HomePageView, PredictRentalView, PredictLandView,
+    HomePageView, PredictRentalView, PredictLandView, ScoreLandCSVView,
+    AsyncPredictRentalView, AsyncPredictLandView, get_towns_for_map_async,
     RentalPropertyListView, RentalPropertyCreateView, RentalPropertyUpdateView, RentalPropertyDeleteView,
     LandForSaleListView, LandForSaleCreateView, LandForSaleUpdateView, LandForSaleDeleteView,
-    ImportCSVView, get_towns_for_map,
+    ImportCSVView, get_towns_for_map, predict_rental_batch, get_prediction_cache_stats,
+    enqueue_training, get_training_run_status, get_import_job_status,
     # CRUD for Lookup Tables
     AccessTypeListView, AccessTypeCreateView, AccessTypeUpdateView, AccessTypeDeleteView,
     PaperTypeListView, PaperTypeCreateView, PaperTypeUpdateView, PaperTypeDeleteView,
@@ -14,6 +16,9 @@ urlpatterns = [
     path('', HomePageView.as_view(), name='home'),
     path('predict/rental/', PredictRentalView.as_view(), name='predict_rental'),
     path('predict/land/', PredictLandView.as_view(), name='predict_land'),
+    path('async/predict/rental/', AsyncPredictRentalView.as_view(), name='predict_rental_async'),
+    path('async/predict/land/', AsyncPredictLandView.as_view(), name='predict_land_async'),
+    path('predict/land/bulk/', ScoreLandCSVView.as_view(), name='score_land_csv'),
 
     path('crud/rentals/', RentalPropertyListView.as_view(), name='rentalproperty_list'),
     path('crud/rentals/new/', RentalPropertyCreateView.as_view(), name='rentalproperty_new'),
@@ -26,7 +31,15 @@ urlpatterns = [
     path('crud/lands/<int:pk>/delete/', LandForSaleDeleteView.as_view(), name='landforsale_delete'),
 
     path('import-csv/', ImportCSVView.as_view(), name='import_csv'),
+    path('api/import-jobs/latest/', get_import_job_status, name='import_job_latest'),
+    path('api/import-jobs/<int:pk>/', get_import_job_status, name='import_job_status'),
+    path('training/retrain/', enqueue_training, name='enqueue_training'),
+    path('api/training-runs/latest/', get_training_run_status, name='training_run_latest'),
+    path('api/training-runs/<int:pk>/', get_training_run_status, name='training_run_status'),
     path('api/get-towns-for-map/', get_towns_for_map, name='get_towns_for_map'),
+    path('api/async/get-towns-for-map/', get_towns_for_map_async, name='get_towns_for_map_async'),
+    path('api/predict/rental/batch/', predict_rental_batch, name='predict_rental_batch'),
+    path('api/prediction-cache/stats/', get_prediction_cache_stats, name='prediction_cache_stats'),
 
     # CRUD URLs for AccessType
     path('crud/access-types/', AccessTypeListView.as_view(), name='accesstype_list'),
@@ -1,24 +1,38 @@
-import csv
-import io
+import itertools
+import json
+import logging
 import pandas as pd
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy, reverse
+from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, FormView, TemplateView
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.db.models import Avg  # For Land Prediction Option A (if you revert)
 
 from .models import (
     RentalProperty, LandForSale, Town,
-    AccessType, PaperType, Convenience
+    AccessType, PaperType, Convenience, TrainingRun, ImportJob
 )
 from .forms import (
     RentalPredictionForm, LandPredictionForm,
     RentalPropertyForm, LandForSaleForm, CSVImportForm,
-    AccessTypeForm, PaperTypeForm, ConvenienceForm
+    AccessTypeForm, PaperTypeForm, ConvenienceForm, LandBulkScoreForm
 )
 # Ensure correct prediction function name is imported for land
-from .ml_utils import predict_rental_price, predict_land_price_per_sqm
+from .ml_utils import (
+    predict_rental_price, predict_rental_prices, predict_land_price_per_sqm, find_unseen_inputs,
+    find_unseen_inputs_many, prediction_cache_stats,
+)
+from .bulk_scoring import iter_scored_land_csv, LandScoringError
+from .inference_pool import run_inference
+from .import_queue import enqueue_import_job
+from .training_queue import enqueue_training_run
+
+logger = logging.getLogger(__name__)
 
 
 # --- Helper for map data ---
@@ -27,6 +41,158 @@ def get_towns_for_map(request):
     return JsonResponse(list(towns), safe=False)
 
 
+def get_training_run_status(request, pk=None):
+    # Latest (or a given) background training run, polled by the retrain panel
+    if pk is None:
+        run = TrainingRun.objects.first()
+    else:
+        run = get_object_or_404(TrainingRun, pk=pk)
+    return JsonResponse({'run': run.as_dict() if run else None})
+
+
+def get_import_job_status(request, pk=None):
+    # Latest (or a given) background CSV import, polled by the import page
+    if pk is None:
+        job = ImportJob.objects.first()
+    else:
+        job = get_object_or_404(ImportJob, pk=pk)
+    return JsonResponse({'job': job.as_dict() if job else None})
+
+
+@require_POST
+def enqueue_training(request):
+    run, created = enqueue_training_run()
+    if created:
+        messages.success(request, f"Retraining queued (run #{run.pk}). The models update when it finishes.")
+    else:
+        messages.info(request, f"A retrain is already queued (run #{run.pk}); your request was added to it.")
+    return redirect('import_csv')
+
+
+def get_prediction_cache_stats(request):
+    # Hit/miss/eviction counters of this worker process's prediction caches
+    return JsonResponse(prediction_cache_stats())
+
+
+# --- Batch prediction API ---
+MAX_BATCH_SIZE = 10000
+APARTMENT_TYPES = {value for value, _ in RentalProperty.APARTMENT_TYPE_CHOICES if value}
+HOUSE_TYPES = {value for value, _ in RentalProperty.HOUSE_TYPE_CHOICES if value}
+PROPERTY_TYPES = {value for value, _ in RentalProperty.PROPERTY_TYPE_CHOICES}
+
+
+def _validate_rental_batch_row(row, town_ids, access_type_ids, convenience_ids):
+    """
+    Apply the RentalPredictionForm rules to one JSON row without touching the DB.
+    Returns (input_features, errors); exactly one of them is None.
+    """
+    if not isinstance(row, dict):
+        return None, {'__all__': 'Each item must be a JSON object.'}
+    errors = {}
+
+    def as_int(field):
+        value = row.get(field)
+        if isinstance(value, bool) or value in (None, ''):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    town_id = as_int('town_id')
+    if town_id not in town_ids:
+        errors['town_id'] = 'Select a valid town.'
+    access_type_id = as_int('access_type_id')
+    if access_type_id not in access_type_ids:
+        errors['access_type_id'] = 'Select a valid access type.'
+    property_type = row.get('property_type')
+    if property_type not in PROPERTY_TYPES:
+        errors['property_type'] = f"Must be one of: {', '.join(sorted(PROPERTY_TYPES))}."
+    num_rooms = as_int('num_rooms')
+    if num_rooms is None or num_rooms < 1:
+        errors['num_rooms'] = 'Must be an integer >= 1.'
+    if property_type == 'apartment' and row.get('apartment_type') not in APARTMENT_TYPES:
+        errors['apartment_type'] = 'This field is required for apartments.'
+    if property_type == 'house' and row.get('house_type') not in HOUSE_TYPES:
+        errors['house_type'] = 'This field is required for houses.'
+    has_house_basement = row.get('has_house_basement', False)
+    if not isinstance(has_house_basement, bool):
+        errors['has_house_basement'] = 'Must be true or false.'
+    row_convenience_ids = row.get('convenience_ids') or []
+    if not isinstance(row_convenience_ids, list):
+        errors['convenience_ids'] = 'Must be a list of convenience IDs.'
+    else:
+        unknown = [cid for cid in row_convenience_ids if isinstance(cid, bool) or cid not in convenience_ids]
+        if unknown:
+            errors['convenience_ids'] = f"Unknown convenience IDs: {unknown}"
+
+    if errors:
+        return None, errors
+    return {
+        'town_id': town_id,
+        'access_type_id': access_type_id,
+        'property_type': property_type,
+        'num_rooms': num_rooms,
+        # Same encoding as PredictRentalView: the unused type is passed as the string 'None'
+        'apartment_type': row.get('apartment_type') if property_type == 'apartment' else 'None',
+        'house_type': row.get('house_type') if property_type == 'house' else 'None',
+        'has_house_basement': has_house_basement,
+        'convenience_ids': row_convenience_ids,
+    }, None
+
+
+@csrf_exempt
+@require_POST
+def predict_rental_batch(request):
+    """
+    POST a JSON array of rental feature dicts; returns one result per item, in order.
+    Invalid items get an 'errors' dict instead of a prediction and do not abort the batch.
+    """
+    try:
+        rows = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Request body must be valid JSON.'}, status=400)
+    if not isinstance(rows, list):
+        return JsonResponse({'error': 'Request body must be a JSON array.'}, status=400)
+    if len(rows) > MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'At most {MAX_BATCH_SIZE} items per batch.'}, status=400)
+
+    # Three queries for the whole batch instead of per-row form validation
+    town_ids = set(Town.objects.values_list('id', flat=True))
+    access_type_ids = set(AccessType.objects.values_list('id', flat=True))
+    convenience_ids = set(Convenience.objects.values_list('id', flat=True))
+
+    results = [None] * len(rows)
+    valid_indexes = []
+    valid_features = []
+    for index, row in enumerate(rows):
+        features, errors = _validate_rental_batch_row(row, town_ids, access_type_ids, convenience_ids)
+        if errors:
+            results[index] = {'index': index, 'errors': errors}
+        else:
+            valid_indexes.append(index)
+            valid_features.append(features)
+
+    model_version = None
+    if valid_features:
+        predictions, model_version = predict_rental_prices(valid_features, return_version=True)
+        if isinstance(predictions, str):  # Model missing or failed; nothing in the batch can be scored
+            return JsonResponse({'error': predictions}, status=503)
+        # Values added after training carry no weight in the prediction
+        unseen = find_unseen_inputs_many('rental', valid_features)
+        for position, (index, price) in enumerate(zip(valid_indexes, predictions)):
+            results[index] = {'index': index, 'predicted_price': price}
+            if position in unseen:
+                results[index]['unseen'] = unseen[position]
+
+    return JsonResponse({
+        'model_version': model_version,
+        'count': len(rows),
+        'error_count': len(rows) - len(valid_indexes),
+        'results': results,
+    })
+
+
 # --- Main Pages ---
 class HomePageView(TemplateView):
     template_name = 'predictor_app/home.html'
@@ -42,14 +208,14 @@ class PredictRentalView(FormView):
         context['towns_json_url'] = reverse('get_towns_for_map')
         return context
 
-    def form_valid(self, form):
-        data = form.cleaned_data
-
+    @staticmethod
+    def input_features(data):
+        """Turn the cleaned form data into the feature dict expected by predict_rental_price."""
         convenience_ids_list = []
         if 'conveniences' in data and data['conveniences']:
             convenience_ids_list = [c.id for c in data['conveniences']]
 
-        input_features = {
+        return {
             'town_id': data['town'].id if data.get('town') else None,
             'access_type_id': data['access_type'].id if data.get('access_type') else None,
             'property_type': data['property_type'],
@@ -62,12 +228,18 @@ class PredictRentalView(FormView):
             'convenience_ids': convenience_ids_list,
         }
 
-        predicted_price = predict_rental_price(input_features)
+    def form_valid(self, form):
+        data = form.cleaned_data
+        input_features = self.input_features(data)
+
+        predicted_price, model_version = predict_rental_price(input_features, return_version=True)
 
         if data.get('town'):
             form.fields['town_name_display'].initial = data['town'].name
 
-        return self.render_to_response(self.get_context_data(form=form, predicted_price=predicted_price))
+        return self.render_to_response(
+            self.get_context_data(form=form, predicted_price=predicted_price, model_version=model_version,
+                                  unseen_inputs=find_unseen_inputs('rental', input_features)))
 
 
 class PredictLandView(FormView):  # Option C: Price Per SqM
@@ -79,36 +251,144 @@ class PredictLandView(FormView):  # Option C: Price Per SqM
         context['towns_json_url'] = reverse('get_towns_for_map')
         return context
 
-    def form_valid(self, form):
-        data = form.cleaned_data
-        input_features = {
+    @staticmethod
+    def input_features(data):
+        """Turn the cleaned form data into the feature dict expected by predict_land_price_per_sqm."""
+        return {
             'town_id': data['town'].id if data.get('town') else None,
             'paper_type_id': data['paper_type'].id if data.get('paper_type') else None,
             'access_type_id': data['access_type'].id if data.get('access_type') else None,
             'is_fenced': data.get('is_fenced', False),
             'is_ready_to_build': data.get('is_ready_to_build', False),
         }
-        print(f"DEBUG: Land input_features: {input_features}")  # <-- ADD THIS
-        predicted_price_sqm_result = predict_land_price_per_sqm(input_features)
-        print(f"DEBUG: Predicted Price SqM Result: {predicted_price_sqm_result}")  # <-- ADD
-
-        if data.get('town'):
-            form.fields['town_name_display'].initial = data['town'].name
-
-        context_data = self.get_context_data(form=form, predicted_price_sqm=predicted_price_sqm_result)
 
+    @staticmethod
+    def example_total_prices(predicted_price_sqm_result):
         # Add example plot sizes for price range display
         if isinstance(predicted_price_sqm_result, (int, float)):  # Check if prediction is a number
-            example_sizes = {
+            return {
                 "Small Plot (e.g., 100 sqm)": predicted_price_sqm_result * 100,
                 "Medium Plot (e.g., 300 sqm)": predicted_price_sqm_result * 300,
                 "Large Plot (e.g., 500 sqm)": predicted_price_sqm_result * 500,
             }
+        return None
+
+    def form_valid(self, form):
+        data = form.cleaned_data
+        input_features = self.input_features(data)
+        predicted_price_sqm_result, model_version = predict_land_price_per_sqm(input_features, return_version=True)
+        logger.debug("Land prediction for %s: %s (model version %s)",
+                     input_features, predicted_price_sqm_result, model_version)
+
+        if data.get('town'):
+            form.fields['town_name_display'].initial = data['town'].name
+
+        context_data = self.get_context_data(form=form, predicted_price_sqm=predicted_price_sqm_result,
+                                             model_version=model_version,
+                                             unseen_inputs=find_unseen_inputs('land', input_features))
+
+        example_sizes = self.example_total_prices(predicted_price_sqm_result)
+        if example_sizes:
             context_data['example_total_prices'] = example_sizes
 
         return self.render_to_response(context_data)
 
 
+class ScoreLandCSVView(FormView):
+    """Upload a CSV of parcels and stream back a CSV with predicted prices, scored chunk by chunk."""
+    template_name = 'predictor_app/score_land_csv.html'
+    form_class = LandBulkScoreForm
+
+    def form_valid(self, form):
+        csv_file = form.cleaned_data['csv_file']
+        chunks = iter_scored_land_csv(csv_file)
+        try:
+            # Score the first chunk up front so bad headers or a missing model are reported on the form
+            first_chunk = next(chunks)
+        except StopIteration:
+            messages.error(self.request, "The CSV file contains no rows to score.")
+            return self.form_invalid(form)
+        except LandScoringError as e:
+            messages.error(self.request, str(e))
+            return self.form_invalid(form)
+        except (ValueError, UnicodeDecodeError) as e:  # pandas parser errors are ValueErrors
+            messages.error(self.request, f"Could not read CSV file: {e}")
+            return self.form_invalid(form)
+
+        response = StreamingHttpResponse(itertools.chain([first_chunk], chunks), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="land_price_predictions.csv"'
+        return response
+
+
+# --- Async Prediction Views (ASGI) ---
+async def get_towns_for_map_async(request):
+    towns = [town async for town in Town.objects.all().values('id', 'name', 'latitude', 'longitude')]
+    return JsonResponse(towns, safe=False)
+
+
+def _predict_rental(input_features):
+    predicted_price, model_version = predict_rental_price(input_features, return_version=True)
+    return {'predicted_price': predicted_price, 'model_version': model_version,
+            'unseen_inputs': find_unseen_inputs('rental', input_features)}
+
+
+def _predict_land(input_features):
+    predicted_price_sqm, model_version = predict_land_price_per_sqm(input_features, return_version=True)
+    context = {'predicted_price_sqm': predicted_price_sqm, 'model_version': model_version,
+               'unseen_inputs': find_unseen_inputs('land', input_features)}
+    example_sizes = PredictLandView.example_total_prices(predicted_price_sqm)
+    if example_sizes:
+        context['example_total_prices'] = example_sizes
+    return context
+
+
+class AsyncPredictionView(View):
+    """
+    Async counterpart of the prediction FormViews, for deployments served through asgi.py.
+
+    The event loop is never blocked: form validation and template rendering (which query the
+    lookup tables) run through sync_to_async in the request's own thread, and model inference
+    runs on the bounded inference pool. Subclasses set the template, form, feature builder
+    and the prediction function.
+    """
+    template_name = None
+    form_class = None
+    input_features = None
+    predict = None
+
+    async def get(self, request, *args, **kwargs):
+        return await self.render(self.form_class())
+
+    async def post(self, request, *args, **kwargs):
+        form = self.form_class(request.POST)
+        if not await sync_to_async(form.is_valid)():
+            return await self.render(form)
+
+        data = form.cleaned_data
+        prediction = await run_inference(self.predict, self.input_features(data))
+        if data.get('town'):
+            form.fields['town_name_display'].initial = data['town'].name
+        return await self.render(form, **prediction)
+
+    async def render(self, form, **context):
+        context.update(form=form, view=self, towns_json_url=reverse('get_towns_for_map_async'))
+        return await sync_to_async(render)(self.request, self.template_name, context)
+
+
+class AsyncPredictRentalView(AsyncPredictionView):
+    template_name = 'predictor_app/predict_rental.html'
+    form_class = RentalPredictionForm
+    input_features = staticmethod(PredictRentalView.input_features)
+    predict = staticmethod(_predict_rental)
+
+
+class AsyncPredictLandView(AsyncPredictionView):
+    template_name = 'predictor_app/predict_land.html'
+    form_class = LandPredictionForm
+    input_features = staticmethod(PredictLandView.input_features)
+    predict = staticmethod(_predict_land)
+
+
 # --- CRUD Views for Main Models ---
 class RentalPropertyListView(ListView):
     model = RentalProperty
@@ -290,213 +570,12 @@ class ConvenienceDeleteView(DeleteView):
 class ImportCSVView(FormView):
     template_name = 'predictor_app/import_csv.html'
     form_class = CSVImportForm
-    success_url = reverse_lazy('home')
+    success_url = reverse_lazy('import_csv')
 
     def form_valid(self, form):
-        csv_file = form.cleaned_data['csv_file']
-        model_type = form.cleaned_data['model_type']
-
-        try:
-            decoded_file = csv_file.read().decode('utf-8-sig')  # Use utf-8-sig to handle potential BOM
-        except UnicodeDecodeError:
-            messages.error(self.request, "Invalid file encoding. Please use UTF-8.")
-            return self.form_invalid(form)
-
-        io_string = io.StringIO(decoded_file)
-        reader = csv.DictReader(io_string)
-
-        created_count = 0
-        updated_count = 0
-        error_count = 0
-        errors = []
-
-        try:
-            if model_type == 'town':
-                for row in reader:
-                    try:
-                        name = row.get('name', '').strip()
-                        if not name: continue  # Skip empty rows
-                        _, created = Town.objects.update_or_create(
-                            name=name,
-                            defaults={
-                                'latitude': float(row['latitude']) if row.get('latitude') else None,
-                                'longitude': float(row['longitude']) if row.get('longitude') else None
-                            }
-                        )
-                        if created:
-                            created_count += 1
-                        else:
-                            updated_count += 1
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Town '{row.get('name', 'N/A')}': {str(e)}")
-
-            elif model_type == 'access_type':
-                for row in reader:
-                    try:
-                        name = row.get('name', '').strip()
-                        if not name: continue
-                        obj, created = AccessType.objects.get_or_create(name=name)
-                        # Update description if provided in CSV, or let model's save() handle default
-                        if row.get('description',
-                                   obj.description) != obj.description:  # Check if description needs update or is new
-                            obj.description = row.get('description', '')  # If CSV has blank, use blank
-                            obj.save()  # Triggers model's save logic if description was blank
-                        if created:
-                            created_count += 1
-                        else:
-                            updated_count += 1 if row.get('description', obj.description) != obj.description else 0
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"AccessType '{row.get('name', 'N/A')}': {str(e)}")
-
-            elif model_type == 'paper_type':
-                for row in reader:
-                    try:
-                        name = row.get('name', '').strip()
-                        if not name: continue
-                        obj, created = PaperType.objects.get_or_create(name=name)
-                        if row.get('description', obj.description) != obj.description:
-                            obj.description = row.get('description', '')
-                            obj.save()
-                        if created:
-                            created_count += 1
-                        else:
-                            updated_count += 1 if row.get('description', obj.description) != obj.description else 0
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"PaperType '{row.get('name', 'N/A')}': {str(e)}")
-
-            elif model_type == 'convenience':
-                for row in reader:
-                    try:
-                        name = row.get('name', '').strip()
-                        if not name: continue
-                        obj, created = Convenience.objects.get_or_create(name=name)
-                        if row.get('description', obj.description) != obj.description:
-                            obj.description = row.get('description', '')
-                            obj.save()
-                        if created:
-                            created_count += 1
-                        else:
-                            updated_count += 1 if row.get('description', obj.description) != obj.description else 0
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Convenience '{row.get('name', 'N/A')}': {str(e)}")
-
-            elif model_type == 'rental':
-                for row_idx, row in enumerate(reader):
-                    try:
-                        town_name = row.get('town_name', '').strip()
-                        if not town_name:
-                            errors.append(f"Rental Row {row_idx + 2}: Missing town_name")
-                            error_count += 1
-                            continue
-                        town, _ = Town.objects.get_or_create(name=town_name)
-
-                        access_type_name = row.get('access_type_name', '').strip()
-                        if not access_type_name:
-                            errors.append(f"Rental Row {row_idx + 2} (Town: {town_name}): Missing access_type_name")
-                            error_count += 1
-                            continue
-                        access_type_obj, _ = AccessType.objects.get_or_create(name=access_type_name)
-
-                        convenience_names_str = row.get('conveniences_names', '')
-                        convenience_objs_to_add = []
-                        if convenience_names_str:
-                            for conv_name_raw in convenience_names_str.split(','):
-                                conv_name = conv_name_raw.strip()
-                                if conv_name:
-                                    conv_obj, _ = Convenience.objects.get_or_create(name=conv_name)
-                                    convenience_objs_to_add.append(conv_obj)
-
-                        price_str = str(row.get('price', '0')).replace(',', '')
-                        price = float(price_str) if price_str else 0.0
-
-                        has_basement = row.get('has_house_basement', 'False').lower() in ['true', '1', 'yes', 'oui']
-
-                        rental_prop = RentalProperty.objects.create(
-                            town=town,
-                            access_type=access_type_obj,
-                            property_type=row.get('property_type', '').strip(),
-                            num_rooms=int(row.get('num_rooms', 1)),
-                            price=price,
-                            apartment_type=row.get('apartment_type') if row.get(
-                                'property_type') == 'apartment' else None,
-                            house_type=row.get('house_type') if row.get('property_type') == 'house' else None,
-                            has_house_basement=has_basement,
-                        )
-                        if convenience_objs_to_add:
-                            rental_prop.conveniences.add(*convenience_objs_to_add)
-                        created_count += 1
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Rental Row {row_idx + 2} (Town: {row.get('town_name', 'N/A')}): {str(e)}")
-
-
-            elif model_type == 'land':
-                for row_idx, row in enumerate(reader):
-                    try:
-                        town_name = row.get('town_name', '').strip()
-                        if not town_name:
-                            errors.append(f"Land Row {row_idx + 2}: Missing town_name")
-                            error_count += 1
-                            continue
-                        town, _ = Town.objects.get_or_create(name=town_name)
-
-                        access_type_name = row.get('access_type_name', '').strip()
-                        paper_type_name = row.get('paper_type_name', '').strip()
-
-                        if not access_type_name:
-                            errors.append(f"Land Row {row_idx + 2} (Town: {town_name}): Missing access_type_name")
-                            error_count += 1;
-                            continue
-                        if not paper_type_name:
-                            errors.append(f"Land Row {row_idx + 2} (Town: {town_name}): Missing paper_type_name")
-                            error_count += 1;
-                            continue
-
-                        access_type_obj, _ = AccessType.objects.get_or_create(name=access_type_name)
-                        paper_type_obj, _ = PaperType.objects.get_or_create(name=paper_type_name)
-
-                        area_sqm_str = str(row.get('area_sqm', '0')).replace(',', '')
-                        price_str = str(row.get('price', '0')).replace(',', '')
-
-                        area_sqm = float(area_sqm_str) if area_sqm_str else 0.0
-                        price = float(price_str) if price_str else 0.0
-
-                        LandForSale.objects.create(
-                            town=town, paper_type=paper_type_obj, access_type=access_type_obj,
-                            is_fenced=row.get('is_fenced', 'False').lower() in ['true', '1', 'yes', 'oui'],
-                            is_ready_to_build=row.get('is_ready_to_build', 'False').lower() in ['true', '1', 'yes',
-                                                                                                'oui'],
-                            area_sqm=area_sqm, price=price
-                        )
-                        created_count += 1
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Land Row {row_idx + 2} (Town: {row.get('town_name', 'N/A')}): {str(e)}")
-
-            msg = ""
-            if created_count > 0: msg += f"{created_count} records created. "
-            if updated_count > 0: msg += f"{updated_count} records updated. "  # For lookup tables
-            if not msg and error_count == 0: msg = "No new data to import."
-
-            if error_count > 0:
-                detailed_errors = '; '.join(errors[:5])
-                final_msg = f"Processed for {model_type}. {msg}Encountered {error_count} errors. First few: {detailed_errors}"
-                messages.warning(self.request, final_msg)
-                print(f"Full list of CSV import errors for {model_type}: {errors}")
-            else:
-                final_msg = f"Successfully processed for {model_type}. {msg}"
-                messages.success(self.request, final_msg.strip())
-
-        except csv.Error as e:  # Catch errors related to CSV parsing itself
-            messages.error(self.request, f"CSV formatting error for {model_type}: {str(e)}")
-            return self.form_invalid(form)
-        except Exception as e:  # Catch other unexpected errors
-            messages.error(self.request,
-                           f"An unexpected error occurred during CSV processing for {model_type}: {str(e)}")
-            return self.form_invalid(form)
-
+        # Imported by the run_import_worker command in committed chunks (see import_queue.py), so
+        # large files do not hold the request open; the page polls the job's progress
+        job = enqueue_import_job(form.cleaned_data['csv_file'], form.cleaned_data['model_type'])
+        messages.success(self.request, f"Import of {job.file_name} queued (job #{job.pk}). "
+                                       f"Its progress is shown below.")
         return super().form_valid(form)
\ No newline at end of file
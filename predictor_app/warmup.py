@@ -0,0 +1,82 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEMPLATES = [
+    'predictor_app/home.html',
+    'predictor_app/predict_rental.html',
+    'predictor_app/predict_land.html',
+]
+
+
+def _import_views():
+    # The URLconf is imported lazily on the first request; it pulls in views, ml_utils, pandas and sklearn
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def _load_models():
+    from .ml_utils import model_registry
+    for name in ('rental', 'land', 'land_table'):
+        try:
+            logger.info("Warm-up: model '%s' version %s ready", name, model_registry.get(name).version)
+        except FileNotFoundError:
+            logger.warning("Warm-up: model '%s' is not trained yet", name)
+
+
+def _exercise_predictors():
+    # First calls build the per-process featurizer state (vocabulary sets, weight lists, convenience encoder).
+    # The compiled models are called directly: predict_*() would put these dummy rows in the prediction
+    # caches and count them as misses.
+    from .ml_utils import _land_price_table, _rental_features, model_registry
+    try:
+        rental = model_registry.get('rental')
+    except FileNotFoundError:
+        pass
+    else:
+        features = _rental_features({'property_type': 'apartment', 'num_rooms': 1}, rental.model['vocabulary'])
+        rental.model['compiled'].predict_one(features)
+    try:
+        land = model_registry.get('land')
+    except FileNotFoundError:
+        pass
+    else:
+        features = {'town_id': None, 'paper_type_id': None, 'access_type_id': None,
+                    'is_fenced': 0, 'is_ready_to_build': 0}
+        land.model['compiled'].predict_one(features)
+        table = _land_price_table(land)
+        if table is not None:
+            table.lookup(features)
+
+
+def _compile_templates():
+    from django.template.loader import get_template
+    for template_name in WARMUP_TEMPLATES:
+        get_template(template_name)
+
+
+WARMUP_STEPS = [
+    ('import views and ML stack', _import_views),
+    ('load models', _load_models),
+    ('exercise predictors', _exercise_predictors),
+    ('compile templates', _compile_templates),
+]
+
+
+def warm_up():
+    """
+    Pay the first-request costs before the worker accepts traffic. Enabled with the
+    PREDICTOR_WARMUP setting and called from the WSGI/ASGI entry points. A failing
+    step is logged and skipped; it never prevents the worker from starting.
+    """
+    started = time.perf_counter()
+    for label, step in WARMUP_STEPS:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up step '%s' failed", label)
+            continue
+        logger.info("Warm-up step '%s' took %.1f ms", label, (time.perf_counter() - step_started) * 1000)
+    logger.info("Worker warm-up finished in %.1f ms", (time.perf_counter() - started) * 1000)